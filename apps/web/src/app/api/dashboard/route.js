@@ -0,0 +1,14 @@
+import { pythonApiFetch } from "@/app/api/utils/pythonClient";
+
+export async function GET(request) {
+  try {
+    const { searchParams } = new URL(request.url);
+    const query = searchParams.toString();
+    const path = query ? `/dashboard?${query}` : "/dashboard";
+    const { data } = await pythonApiFetch(path);
+    return Response.json(data);
+  } catch (error) {
+    console.error("Error fetching dashboard:", error);
+    return Response.json({ error: "Failed to fetch dashboard" }, { status: 500 });
+  }
+}
@@ -0,0 +1,12 @@
+import { pythonApiFetch } from "@/app/api/utils/pythonClient";
+
+export async function GET(request, { params }) {
+  try {
+    const { id } = params;
+    const { data } = await pythonApiFetch(`/jobs/${id}`);
+    return Response.json(data);
+  } catch (error) {
+    console.error("Error fetching job status:", error);
+    return Response.json({ error: "Failed to fetch job status" }, { status: 500 });
+  }
+}
@@ -1,10 +1,11 @@
-import { pythonApiFetch } from "@/app/api/utils/pythonClient";
+import { idempotencyHeaders, pythonApiFetch } from "@/app/api/utils/pythonClient";
 
 export async function POST(request) {
   try {
     const payload = await request.json();
     const { data } = await pythonApiFetch("/meals/log", {
       method: "POST",
+      headers: idempotencyHeaders(request),
       body: JSON.stringify(payload),
     });
     return Response.json(data);
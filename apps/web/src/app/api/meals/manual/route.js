@@ -1,13 +1,14 @@
-import { pythonApiFetch } from "@/app/api/utils/pythonClient";
+import { idempotencyHeaders, pythonApiFetch } from "@/app/api/utils/pythonClient";
 
 export async function POST(request) {
   try {
     const payload = await request.json();
-    const { data } = await pythonApiFetch("/meals/manual", {
+    const { status, data } = await pythonApiFetch("/meals/manual", {
       method: "POST",
+      headers: idempotencyHeaders(request),
       body: JSON.stringify(payload),
     });
-    return Response.json(data);
+    return Response.json(data, { status });
   } catch (error) {
     console.error("Error logging manual meal via Python backend:", error);
     return Response.json(
@@ -26,4 +26,9 @@ export async function pythonApiFetch(path, init = {}) {
   return { status: response.status, data };
 }
 
+export function idempotencyHeaders(request) {
+  const key = request.headers.get("Idempotency-Key");
+  return key ? { "Idempotency-Key": key } : {};
+}
+
 export { PYTHON_API_BASE_URL };
@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import {
   ChefHat,
   Target,
@@ -137,12 +137,73 @@ export default function NutritionDashboard() {
   const activeError = Object.values(errors)[0] || null;
 
   // Load initial data
+  const progressStreamLive = useRef(false);
+
   useEffect(() => {
-    loadNutritionProgress();
-    loadRecentMeals();
-    loadPreferences();
+    loadDashboard();
   }, []);
 
+  // Weekly progress is pushed by the backend while this stream is open;
+  // EventSource reconnects on its own and resumes from the last event id.
+  useEffect(() => {
+    if (typeof EventSource === "undefined") {
+      return undefined;
+    }
+    const source = new EventSource(`${API_BASE}/nutrition/progress/stream`);
+    source.onopen = () => {
+      progressStreamLive.current = true;
+    };
+    source.onerror = () => {
+      progressStreamLive.current = false;
+    };
+    source.addEventListener("snapshot", (event) => {
+      const { progress } = JSON.parse(event.data);
+      setWeeklyProgress(progress);
+      clearError("progress");
+    });
+    source.addEventListener("delta", (event) => {
+      const { changes } = JSON.parse(event.data);
+      setWeeklyProgress((current) => {
+        const next = { ...current };
+        Object.entries(changes).forEach(([key, fields]) => {
+          next[key] = { ...current[key], ...fields };
+        });
+        return next;
+      });
+    });
+    return () => {
+      progressStreamLive.current = false;
+      source.close();
+    };
+  }, []);
+
+  const refreshNutritionProgress = () => {
+    if (!progressStreamLive.current) {
+      loadNutritionProgress();
+    }
+  };
+
+  const loadDashboard = async () => {
+    try {
+      const response = await fetch(`${API_BASE}/dashboard?limit=5`);
+      if (!response.ok) {
+        throw new Error("Failed to load dashboard");
+      }
+      const dashboard = await response.json();
+      setWeeklyProgress(dashboard.progress);
+      setRecentLogs(dashboard.recent_meals);
+      setPreferences(dashboard.preferences);
+      clearError("progress");
+      clearError("recentMeals");
+      clearError("preferences");
+    } catch (error) {
+      console.error("Error loading dashboard, falling back to separate requests:", error);
+      loadNutritionProgress();
+      loadRecentMeals();
+      loadPreferences();
+    }
+  };
+
   const loadNutritionProgress = async () => {
     try {
       const response = await fetch(`${API_BASE}/nutrition/progress`);
@@ -273,7 +334,7 @@ export default function NutritionDashboard() {
       }
 
       // Refresh data after logging
-      loadNutritionProgress();
+      refreshNutritionProgress();
       loadRecentMeals();
       clearError("logMeal");
     } catch (error) {
@@ -295,7 +356,7 @@ export default function NutritionDashboard() {
         throw new Error("Failed to delete meal");
       }
       // Refresh after delete
-      loadNutritionProgress();
+      refreshNutritionProgress();
       loadRecentMeals();
       if (isMealDetailOpen && mealDetail?.id === log.id) {
         closeMealDetail();
@@ -340,6 +401,23 @@ export default function NutritionDashboard() {
     }
   };
 
+  const waitForJob = async (jobId, timeoutMs = 120000) => {
+    const deadline = Date.now() + timeoutMs;
+    while (Date.now() < deadline) {
+      const response = await fetch(`${API_BASE}/jobs/${jobId}`);
+      if (!response.ok) {
+        throw new Error("Failed to check job status");
+      }
+      const job = await response.json();
+      if (job.status === "succeeded") return job.result;
+      if (job.status === "failed") {
+        throw new Error(job.error || "Job failed");
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+    throw new Error("Timed out waiting for job");
+  };
+
   const handleManualSubmit = async (event) => {
     event.preventDefault();
     if (
@@ -371,11 +449,15 @@ export default function NutritionDashboard() {
       if (!response.ok) {
         throw new Error("Failed to log manual meal");
       }
+      if (response.status === 202) {
+        const { job_id: jobId } = await response.json();
+        await waitForJob(jobId);
+      }
 
       setManualMeal(getDefaultManualMeal());
       setShowManualLog(false);
       clearError("manualLog");
-      loadNutritionProgress();
+      refreshNutritionProgress();
       loadRecentMeals();
     } catch (error) {
       console.error("Error logging manual meal:", error);
@@ -570,7 +652,7 @@ export default function NutritionDashboard() {
       }
       setNutritionDraft(newDraft);
       clearError("mealDetail");
-      loadNutritionProgress();
+      refreshNutritionProgress();
       loadRecentMeals();
     } catch (error) {
       console.error("Error saving overrides:", error);
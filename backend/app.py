@@ -2,27 +2,75 @@
 
 from __future__ import annotations
 
-import json
-from typing import List
-from datetime import datetime
-
-from fastapi import FastAPI, HTTPException, Query
+import asyncio
+import hmac
+import itertools
+import os
+import sqlite3
+from typing import List, Optional
+from datetime import date, timedelta
+
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 
+from . import (
+    archive,
+    backups,
+    dedupe,
+    food_db,
+    jobs,
+    json_codec,
+    live_progress,
+    llm_replay,
+    meal_library,
+    metrics,
+    profiling,
+    search,
+    shards,
+    speculation,
+    sync,
+    write_queue,
+)
 from .database import (
+    add_change_listener,
+    database_summary,
+    for_each_shard,
     fetch_meal_log_by_id,
     fetch_recent_meals,
+    get_changes,
+    get_daily_totals,
+    get_job,
     get_preferences,
     init_db,
     log_meal,
     delete_meal_log,
+    purge_idempotency_keys,
+    remove_change_listener,
     save_preferences,
     update_meal_override,
 )
 from .custom_meals import generate_and_store_custom_meal
-from .manual_meals import log_manual_meal
-from .meal_logic import build_weekly_progress, generate_meal_plan
+from .idempotency import IdempotencyMiddleware
+from .manual_meals import (
+    log_local_manual_meal,
+    log_manual_meal,
+    run_manual_meal_job,
+    stamp_reported_time,
+)
+from .meal_logic import (
+    build_dashboard,
+    build_weekly_progress,
+    format_meal_logs,
+    generate_meal_plan,
+    plan_week,
+    precompute_meal_plan,
+    recommend_meals,
+    speculation_inputs,
+)
+from .openai_utils import LLMQueueTimeout, scheduler_metrics
+from .plan_cache import cache_stats, prune_expired as prune_expired_plans
 from .schemas import (
     CustomMealRequest,
     ManualMealRequest,
@@ -30,12 +78,29 @@ from .schemas import (
     MealLogRequest,
     MealOverrideRequest,
     PreferencesPayload,
+    WeekPlanRequest,
 )
 
 
 load_dotenv()
 
-app = FastAPI(title="Nutrition Planner API", version="1.0.0")
+MANUAL_MEAL_JOB = "manual_meal"
+
+app = FastAPI(
+    title="Nutrition Planner API",
+    version="1.0.0",
+    default_response_class=json_codec.JSONResponse,
+)
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=[
+        "/api/preferences",
+        "/api/meals/log",
+        "/api/meals/generate",
+        "/api/meals/custom",
+        "/api/meals/manual",
+    ],
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -43,11 +108,45 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if profiling.ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+if shards.ENABLED:
+    # Outermost, so idempotency keys and everything below use the user's shard.
+    app.add_middleware(shards.ShardMiddleware)
 
 
 @app.on_event("startup")
-def _startup() -> None:
+async def _startup() -> None:
     init_db()
+    food_db.load()
+    prune_expired_plans()
+    purge_idempotency_keys()
+    if llm_replay.replay_mode() in ("replay", "cache"):
+        llm_replay.load()
+    if speculation.start(
+        asyncio.get_running_loop(), speculation_inputs, precompute_meal_plan
+    ):
+        add_change_listener(speculation.notify_change)
+    if live_progress.start(asyncio.get_running_loop()):
+        add_change_listener(live_progress.notify_change)
+    jobs.start({MANUAL_MEAL_JOB: run_manual_meal_job})
+    backups.start(asyncio.get_running_loop())
+    archive.start(asyncio.get_running_loop())
+    sync.start(asyncio.get_running_loop())
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    remove_change_listener(speculation.notify_change)
+    speculation.stop()
+    remove_change_listener(live_progress.notify_change)
+    live_progress.stop()
+    await jobs.stop()
+    backups.stop()
+    archive.stop()
+    sync.stop()
+    write_queue.stop()
 
 
 @app.get("/health")
@@ -55,6 +154,107 @@ def healthcheck() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics() -> Response:
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def _require_profile_token(token: Optional[str]) -> None:
+    if not profiling.ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not profiling.token_matches(token):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+
+@app.get("/api/admin/profiles")
+def list_profiles(x_profile_token: Optional[str] = Header(None)) -> dict:
+    _require_profile_token(x_profile_token)
+    return {"profiles": profiling.list_profiles()}
+
+
+@app.get("/api/admin/profiles/{profile_id}")
+def read_profile(
+    profile_id: str,
+    format: str = Query("json", pattern="^(json|pstats)$"),
+    x_profile_token: Optional[str] = Header(None),
+) -> Response:
+    _require_profile_token(x_profile_token)
+    path = profiling.artifact_path(profile_id, ".prof" if format == "pstats" else ".json")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "pstats":
+        return FileResponse(path, media_type="application/octet-stream", filename=path.name)
+    return FileResponse(path, media_type="application/json")
+
+
+def _require_admin_token(token: Optional[str]) -> None:
+    expected = os.getenv("ADMIN_TOKEN", "")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if token is None or not hmac.compare_digest(token, expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.get("/api/db/writer/stats")
+def read_writer_stats(x_admin_token: Optional[str] = Header(None)) -> dict:
+    _require_admin_token(x_admin_token)
+    return write_queue.stats()
+
+
+@app.get("/api/db/backups")
+def read_backups(x_admin_token: Optional[str] = Header(None)) -> dict:
+    _require_admin_token(x_admin_token)
+    return backups.stats()
+
+
+@app.get("/api/db/shards")
+def read_shards(
+    limit: int = Query(100, ge=1, le=1000),
+    after: Optional[str] = Query(None, description="Last user id of the previous page."),
+    x_admin_token: Optional[str] = Header(None),
+) -> dict:
+    _require_admin_token(x_admin_token)
+    page = [
+        {"user_id": user_id, **summary}
+        for user_id, summary in itertools.islice(for_each_shard(database_summary, after=after), limit)
+    ]
+    return {
+        "enabled": shards.ENABLED,
+        "shards": page,
+        # The default database sorts first as "".
+        "next": (page[-1]["user_id"] or "") if len(page) == limit else None,
+    }
+
+
+@app.get("/api/db/archive")
+def read_archive(x_admin_token: Optional[str] = Header(None)) -> dict:
+    _require_admin_token(x_admin_token)
+    return archive.stats()
+
+
+@app.get("/api/sync")
+def read_changes(
+    since: int = Query(0, ge=0, description="`next` from the previous sync, or 0 to get a starting cursor."),
+    limit: int = Query(500, ge=1, le=1000),
+) -> dict:
+    return get_changes(since, limit)
+
+
+@app.get("/api/sync/stats")
+def read_sync_stats() -> dict:
+    return sync.stats()
+
+
+@app.get("/api/llm/scheduler")
+def read_llm_scheduler() -> dict:
+    return scheduler_metrics()
+
+
+@app.get("/api/llm/replay")
+def read_llm_replay() -> dict:
+    return llm_replay.stats()
+
+
 @app.get("/api/preferences")
 def read_preferences() -> dict:
     return get_preferences()
@@ -76,6 +276,48 @@ def read_weekly_progress() -> dict:
     return progress
 
 
+@app.get("/api/nutrition/daily")
+def read_daily_totals(
+    start: Optional[date] = Query(None, description="First day (default: 30 days ago)."),
+    end: Optional[date] = Query(None, description="Last day (default: today)."),
+) -> List[dict]:
+    end = end or date.today()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return get_daily_totals(start, end)
+
+
+@app.get("/api/dashboard")
+def read_dashboard(
+    limit: int = Query(5, ge=1, le=100),
+    days: int = Query(7, ge=1, le=36500),
+    offset: int = Query(0, ge=0),
+) -> dict:
+    return build_dashboard(limit=limit, days=days, offset=offset)
+
+
+@app.get("/api/nutrition/progress/stream")
+def stream_weekly_progress(
+    since: Optional[str] = Query(None, description="Resume token from a previous event id."),
+    last_event_id: Optional[str] = Header(None),
+) -> StreamingResponse:
+    if not live_progress.active():
+        raise HTTPException(status_code=503, detail="Live progress updates are disabled")
+    if shards.current_user() is not None:
+        raise HTTPException(status_code=503, detail="Live progress updates are not available for user shards")
+    return StreamingResponse(
+        live_progress.progress_events(last_event_id or since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/nutrition/progress/stream/stats")
+def read_live_progress_stats() -> dict:
+    return live_progress.stats()
+
+
 @app.post("/api/meals/log")
 def create_meal_log(payload: MealLogRequest) -> dict:
     try:
@@ -92,67 +334,147 @@ def list_meal_logs(
     offset: int = Query(0, ge=0),
 ) -> List[dict]:
     meals = fetch_recent_meals(limit=limit, days=days, offset=offset)
-    formatted = []
-    for meal in meals:
-        try:
-            base_nutrition = json.loads(meal.get("nutrition") or "{}")
-        except (TypeError, json.JSONDecodeError):
-            base_nutrition = {}
-        override_raw = meal.get("override_nutrition")
-        override_nutrition = {}
-        if override_raw:
-            try:
-                override_nutrition = json.loads(override_raw)
-            except (TypeError, json.JSONDecodeError):
-                override_nutrition = {}
-        effective_nutrition = base_nutrition.copy()
-        effective_nutrition.update(override_nutrition)
-        calories = effective_nutrition.get("calories", meal.get("calories", 0))
-        meal_date_str = meal.get("meal_date")
-        if meal_date_str:
-            parsed_date = datetime.strptime(meal_date_str, "%Y-%m-%d")
-            day_label = parsed_date.strftime("%a")
-            date_label = parsed_date.strftime("%b %d")
-        else:
-            day_label = ""
-            date_label = ""
-        formatted.append(
-            {
-                "id": meal["id"],
-                "time": meal.get("meal_time", "00:00"),
-                "meal": meal.get("meal_name"),
-                "calories": calories,
-                "type": (meal.get("meal_type") or "meal").capitalize(),
-                "day": day_label,
-                "date": date_label,
-                "hasOverride": bool(override_nutrition),
-            }
-        )
-    return formatted
+    return format_meal_logs(meals)
 
 
 @app.post("/api/meals/generate")
-async def generate_meals(payload: MealGenerationRequest) -> dict:
+async def generate_meals(
+    payload: MealGenerationRequest,
+    deadline_ms: Optional[float] = Query(
+        None,
+        gt=0,
+        le=120000,
+        description="Serve a local fallback plan if the model has not answered in time.",
+    ),
+) -> dict:
     try:
-        return await generate_meal_plan(payload)
+        return await generate_meal_plan(payload, deadline_ms=deadline_ms)
+    except LLMQueueTimeout as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
 
+@app.get("/api/search")
+def search_meals(
+    q: str = Query(..., min_length=1, max_length=200),
+    scope: str = Query("all", pattern="^(all|logs|recipes)$"),
+    limit: int = Query(20, ge=1, le=100),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    meal_type: Optional[str] = Query(None, pattern="^[a-z]+$"),
+) -> dict:
+    try:
+        results = search.search(q, scope, limit, start_date, end_date, meal_type)
+    except sqlite3.OperationalError as exc:
+        raise HTTPException(status_code=503, detail=f"Search is unavailable: {exc}") from exc
+    return {"query": q, **results}
+
+
+@app.get("/api/meals/recommend")
+def read_meal_recommendations(
+    limit: int = Query(5, ge=1, le=50),
+    meal_type: Optional[str] = Query(None, pattern="^(lunch|dinner)$"),
+) -> dict:
+    return recommend_meals(limit=limit, meal_type=meal_type)
+
+
+@app.get("/api/meals/custom")
+def read_custom_meals(
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+) -> dict:
+    total, items = meal_library.page(limit, offset)
+    return {
+        "items": items,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "next": offset + limit if offset + limit < total else None,
+    }
+
+
+@app.get("/api/meals/custom/cache/stats")
+def read_custom_meal_cache_stats() -> dict:
+    return meal_library.stats()
+
+
+@app.get("/api/meals/custom/dedupe/stats")
+def read_custom_meal_dedupe_stats() -> dict:
+    return dedupe.stats()
+
+
+@app.get("/api/meals/plan-cache/stats")
+def read_plan_cache_stats() -> dict:
+    return cache_stats()
+
+
+@app.get("/api/meals/speculation/stats")
+def read_speculation_stats() -> dict:
+    return speculation.stats()
+
+
+@app.post("/api/meals/week-plan")
+def create_week_plan(payload: WeekPlanRequest) -> dict:
+    return plan_week(payload)
+
+
 @app.post("/api/meals/custom")
 async def create_custom_meal(payload: CustomMealRequest) -> dict:
     try:
         return await generate_and_store_custom_meal(payload)
+    except LLMQueueTimeout as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc)) from exc
 
 
-@app.post("/api/meals/manual")
-async def create_manual_meal(payload: ManualMealRequest) -> dict:
-    try:
-        return await log_manual_meal(payload)
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=str(exc)) from exc
+@app.post("/api/meals/manual", status_code=202)
+async def create_manual_meal(
+    payload: ManualMealRequest,
+    wait: bool = Query(False, description="Estimate inline instead of queueing a job."),
+):
+    if wait:
+        try:
+            return json_codec.JSONResponse(await log_manual_meal(payload))
+        except LLMQueueTimeout as exc:
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
+        except Exception as exc:
+            raise HTTPException(status_code=500, detail=str(exc)) from exc
+    local = await asyncio.to_thread(log_local_manual_meal, payload)
+    if local is not None:
+        return json_codec.JSONResponse(local)
+    job = jobs.submit(MANUAL_MEAL_JOB, stamp_reported_time(payload).model_dump(mode="json"))
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/api/jobs/{job['id']}",
+        "events_url": f"/api/jobs/{job['id']}/events",
+    }
+
+
+@app.get("/api/meals/manual/stats")
+def read_manual_meal_stats() -> dict:
+    return food_db.stats()
+
+
+@app.get("/api/jobs/{job_id}")
+def read_job(job_id: str) -> dict:
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.public_job(job)
+
+
+@app.get("/api/jobs/{job_id}/events")
+def stream_job_events(job_id: str) -> StreamingResponse:
+    if get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        jobs.job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/api/meals/log/{log_id}")
@@ -177,3 +499,6 @@ def remove_meal_log(log_id: int) -> dict:
     if not deleted:
         raise HTTPException(status_code=404, detail="Meal not found")
     return {"success": True, "id": log_id, "message": "Meal deleted"}
+
+
+profiling.instrument_routes(app)
@@ -0,0 +1,136 @@
+"""Tiered storage for old meal logs: monthly archive partitions.
+
+Logs dated more than ``ARCHIVE_HORIZON_DAYS`` ago are moved out of the main
+database into one SQLite file per month under ``<db name>-archive/`` next to
+it, and each archived day keeps a row in ``meal_log_daily`` with its meal
+count and nutrient totals. The main file then only holds recent logs, so
+the weekly and recent-log queries, their indexes and the page cache stay
+small however long the history gets.
+
+Reads that reach past the horizon (``fetch_recent_meals`` with a long
+``days``, ``get_weekly_logs`` for an old week, a log fetched by id) attach
+the partitions they need and UNION them with the main table; everything
+newer never looks at them. Each partition has its own full-text index,
+which ``/api/search`` queries after the main one. Overrides and deletes of
+archived logs are applied to their partition and refresh that day's rollup.
+
+A run is one write-queue task that moves a month at a time and commits
+queued writes between months. ``ARCHIVE_INTERVAL_MINUTES`` runs archival on
+a schedule inside the app, over ``DB_PATH`` and every user shard, and the
+CLI covers cron jobs::
+
+    python -m backend.archive run [--horizon-days 180] [--user ID | --all-shards]
+    python -m backend.archive list [--user ID]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import database, shards
+from .env import env_float
+from .periodic import PeriodicTask, start_every
+
+logger = logging.getLogger("archive")
+
+# Keeps the current week and the default dashboard window in the main file.
+MIN_HORIZON_DAYS = 14
+
+
+def horizon_days() -> int:
+    return max(int(env_float("ARCHIVE_HORIZON_DAYS", 180)), MIN_HORIZON_DAYS)
+
+
+def run(horizon: Optional[int] = None) -> Dict[str, Any]:
+    """Archive every log older than ``horizon`` days (default ``ARCHIVE_HORIZON_DAYS``)."""
+    days = max(horizon if horizon is not None else horizon_days(), MIN_HORIZON_DAYS)
+    started = time.perf_counter()
+    result = database.archive_meal_logs(
+        date.today() - timedelta(days=days),
+        pause_seconds=env_float("ARCHIVE_MONTH_PAUSE_MS", 5.0) / 1000,
+    )
+    result["horizon_days"] = days
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    if result["rows"]:
+        logger.info("Archived %s meal logs from %s months", result["rows"], len(result["months"]))
+    return result
+
+
+def run_all_shards(horizon: Optional[int] = None) -> List[Dict[str, Any]]:
+    """``run`` against ``DB_PATH`` and then each user shard in turn."""
+    results = []
+    for user_id, result in database.for_each_shard(lambda: run(horizon)):
+        results.append({"user_id": user_id, **result})
+    return results
+
+
+def _summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "shards": len(results),
+        "rows": sum(result["rows"] for result in results),
+        "seconds": round(sum(result["seconds"] for result in results), 3),
+    }
+
+
+_scheduler: Optional[PeriodicTask] = None
+
+
+def start(loop: asyncio.AbstractEventLoop) -> bool:
+    global _scheduler
+    _scheduler = start_every(
+        "ARCHIVE_INTERVAL_MINUTES", 0.0, "archival", run_all_shards, loop, summarize=_summarize
+    )
+    return _scheduler is not None
+
+
+def stop() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+    _scheduler = None
+
+
+def stats() -> Dict[str, Any]:
+    partitions = database.list_meal_log_partitions()
+    return {
+        "scheduled": _scheduler.snapshot() if _scheduler is not None else None,
+        "horizon_days": horizon_days(),
+        "directory": str(database.archive_dir()),
+        "archived_rows": sum(partition["rows"] for partition in partitions),
+        "partitions": partitions,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", type=Path, help="database file (default: DB_PATH)")
+    parser.add_argument("--user", help="use this user's shard instead")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="archive logs past the horizon now")
+    run_parser.add_argument("--horizon-days", type=int)
+    run_parser.add_argument("--all-shards", action="store_true", help="DB_PATH and every user shard")
+    commands.add_parser("list", help="list archive partitions")
+    args = parser.parse_args()
+
+    if args.db:
+        database.DB_PATH = args.db
+    with shards.user_scope(args.user):
+        database.init_db()
+        if args.command == "run" and args.all_shards:
+            result: Any = run_all_shards(args.horizon_days)
+        elif args.command == "run":
+            result = run(args.horizon_days)
+        else:
+            result = database.list_meal_log_partitions()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
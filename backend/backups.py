@@ -0,0 +1,509 @@
+"""Online snapshots of the nutrition database through the SQLite backup API.
+
+Snapshots are copied ``BACKUP_STEP_PAGES`` pages at a time on the
+write-queue thread, from the same connection that commits meal-log writes.
+Between steps that thread commits queued writes for
+``BACKUP_STEP_PAUSE_MS``, so writers wait at most one step. Writes made
+through the backup's own connection are copied into the snapshot as they
+happen instead of restarting it.
+
+A write from another connection (jobs, preferences, saved recipes) does
+restart a stepped backup. After ``BACKUP_MAX_RESTARTS`` restarts the copy
+is finished in a single step instead, so a busy database still gets backed
+up; in WAL mode that step blocks no other connection.
+
+Every snapshot is checked (``PRAGMA quick_check`` and row counts) before it
+is kept, and is optionally gzipped. A JSON manifest next to it records the
+checksum, page counts and timings. Archive partitions are copied in the
+same write-queue task into ``<snapshot>-archive/``, listed in the manifest
+with their own checksums and row counts, and verified and restored with
+the main file. The newest ``BACKUP_KEEP`` snapshots are
+kept. ``BACKUP_INTERVAL_MINUTES`` backs up ``DB_PATH`` and every user shard
+on a schedule inside the app, and the CLI covers cron jobs and restores::
+
+    python -m backend.backups create [--compress] [--all-shards]
+    python -m backend.backups list
+    python -m backend.backups verify <snapshot>
+    python -m backend.backups restore <snapshot> [--target path]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from . import database, shards
+from .env import env_float
+from .periodic import PeriodicTask, start_every
+
+logger = logging.getLogger("backups")
+
+DEFAULT_DIR = Path(__file__).resolve().parent / "backups"
+# Row counts recorded at backup time and compared on verify/restore.
+COUNTED_TABLES = ("meal_logs", "user_meals", "user_preferences", "nutrition_goals")
+
+
+def backup_dir() -> Path:
+    """``BACKUP_DIR``, or a directory per user inside it for a user shard."""
+    root = Path(os.getenv("BACKUP_DIR", str(DEFAULT_DIR)))
+    user_id = shards.current_user()
+    return root if user_id is None else root / "users" / user_id
+
+
+class BackupError(RuntimeError):
+    """Raised when a snapshot fails verification or cannot be restored."""
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+@dataclass
+class _StepLog:
+    step_pages: int
+    pause: float
+    max_restarts: int
+    wait: Callable[[float], None] = time.sleep
+    steps: int = 0
+    restarts: int = 0
+    total_pages: int = 0
+    remaining: Optional[int] = None
+    step_seconds: float = 0.0
+    max_step_seconds: float = 0.0
+    last: float = 0.0
+
+    def __call__(self, status: int, remaining: int, pagecount: int) -> None:
+        now = time.perf_counter()
+        step = now - self.last
+        self.steps += 1
+        self.step_seconds += step
+        self.max_step_seconds = max(self.max_step_seconds, step)
+        self.total_pages = pagecount
+        if self.remaining is not None and remaining > self.remaining:
+            self.restarts += 1
+            if self.restarts > self.max_restarts:
+                raise _TooManyRestarts()
+        self.remaining = remaining
+        if remaining:
+            self.wait(self.pause)
+        self.last = time.perf_counter()
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _check(path: Path, full: bool = False) -> Dict[str, int]:
+    """Integrity-check a database file and return its row counts."""
+    conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        pragma = "integrity_check" if full else "quick_check"
+        result = [row[0] for row in conn.execute(f"PRAGMA {pragma}").fetchall()]
+        if result != ["ok"]:
+            raise BackupError(f"{path.name} failed {pragma}: {'; '.join(result[:5])}")
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in COUNTED_TABLES
+            if table in tables
+        }
+    finally:
+        conn.close()
+
+
+def _copy(source: sqlite3.Connection, destination: Path, log: _StepLog) -> None:
+    target = sqlite3.connect(destination)
+    try:
+        log.last = time.perf_counter()
+        try:
+            source.backup(target, pages=log.step_pages, progress=log)
+        except _TooManyRestarts:
+            logger.info("Backup restarted %s times; finishing in one step", log.restarts)
+            log.last = time.perf_counter()
+            source.backup(target, pages=-1, progress=log)
+        # The copy inherits WAL mode; a snapshot should be one self-contained file.
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        target.close()
+
+
+def _registered_partitions(snapshot: Path) -> List[sqlite3.Row]:
+    """Archive partitions recorded in a copied database, with their row counts."""
+    conn = sqlite3.connect(f"{snapshot.resolve().as_uri()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        return conn.execute("SELECT file, rows FROM meal_log_partitions ORDER BY month").fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+
+
+def _copy_partitions(source: Path, files: List[str], destination: Path, log: _StepLog) -> None:
+    destination.mkdir()
+    for file in files:
+        if not (source / file).exists():
+            raise BackupError(f"Archive partition {file} is registered but missing from {source}")
+        conn = sqlite3.connect(f"{(source / file).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            _copy(conn, destination / file, _StepLog(log.step_pages, log.pause, log.max_restarts, log.wait))
+        finally:
+            conn.close()
+
+
+def _store(partial: Path, name: str, compress: bool) -> Dict[str, Any]:
+    """Checksum a checked copy and move it to ``name`` next to it, gzipped if ``compress``."""
+    entry: Dict[str, Any] = {"bytes": partial.stat().st_size, "sha256": _sha256(partial)}
+    stored = partial.with_name(name)
+    if compress:
+        with partial.open("rb") as raw, gzip.open(stored, "wb", compresslevel=6) as packed:
+            shutil.copyfileobj(raw, packed, 1 << 20)
+        partial.unlink()
+        entry["compressed_bytes"] = stored.stat().st_size
+    else:
+        partial.rename(stored)
+    return entry
+
+
+def create_snapshot(
+    directory: Optional[Path] = None,
+    compress: Optional[bool] = None,
+    step_pages: Optional[int] = None,
+    pause_ms: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Back up the current database (``DB_PATH`` or a user shard) and return its manifest."""
+    directory = directory or backup_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    if compress is None:
+        compress = os.getenv("BACKUP_COMPRESS", "0").lower() in ("1", "true", "yes")
+    log = _StepLog(
+        step_pages=max(int(step_pages or env_float("BACKUP_STEP_PAGES", 256)), 1),
+        pause=(pause_ms if pause_ms is not None else env_float("BACKUP_STEP_PAUSE_MS", 5.0)) / 1000,
+        max_restarts=int(env_float("BACKUP_MAX_RESTARTS", 3)),
+    )
+    created = datetime.utcnow()
+    stem = f"{database.db_path().stem}-{created:%Y%m%dT%H%M%S%f}"
+    partial = directory / f"{stem}.db.partial"
+    partial_archive = directory / f"{stem}-archive.partial"
+    # Resolved here: the writer thread runs outside the caller's user scope.
+    archive = database.archive_dir()
+    partitions: List[sqlite3.Row] = []
+    started = time.perf_counter()
+
+    def copy(conn: sqlite3.Connection, pump: Callable[[float], None]) -> None:
+        # Partitions only change on the writer thread, so copying them in the
+        # same task keeps them in step with the registry in the main copy.
+        log.wait = pump
+        _copy(conn, partial, log)
+        partitions.extend(_registered_partitions(partial))
+        if partitions:
+            _copy_partitions(archive, [row["file"] for row in partitions], partial_archive, log)
+
+    def discard() -> None:
+        partial.unlink(missing_ok=True)
+        shutil.rmtree(partial_archive, ignore_errors=True)
+
+    try:
+        database.run_with_writer(copy)
+    except Exception:
+        discard()
+        raise
+    copy_seconds = time.perf_counter() - started
+    try:
+        counts = _check(partial)
+        partition_counts = [_check(partial_archive / row["file"]) for row in partitions]
+        for row, partition_count in zip(partitions, partition_counts):
+            if partition_count.get("meal_logs") != row["rows"]:
+                raise BackupError(
+                    f"Archive partition {row['file']} has {partition_count.get('meal_logs')} logs,"
+                    f" the registry records {row['rows']}"
+                )
+    except Exception:
+        discard()
+        raise
+    suffix = ".gz" if compress else ""
+    stored = _store(partial, f"{stem}.db{suffix}", compress)
+    manifest: Dict[str, Any] = {
+        "snapshot": f"{stem}.db{suffix}",
+        "source": str(database.db_path()),
+        "created_at": created.isoformat(timespec="seconds"),
+        "bytes": stored["bytes"],
+        "sha256": stored["sha256"],
+        "row_counts": counts,
+        "pages": log.total_pages,
+        "step_pages": log.step_pages,
+        "steps": log.steps,
+        "restarts": log.restarts,
+        "copy_seconds": round(copy_seconds, 3),
+        "avg_step_ms": round(log.step_seconds / max(log.steps, 1) * 1000, 3),
+        "max_step_ms": round(log.max_step_seconds * 1000, 3),
+        "compressed": compress,
+    }
+    if compress:
+        manifest["compressed_bytes"] = stored["compressed_bytes"]
+    if partitions:
+        manifest["archive"] = f"{stem}-archive"
+        manifest["partitions"] = [
+            {
+                "file": row["file"],
+                "snapshot": row["file"] + suffix,
+                **_store(partial_archive / row["file"], row["file"] + suffix, compress),
+                "row_counts": partition_count,
+            }
+            for row, partition_count in zip(partitions, partition_counts)
+        ]
+        partial_archive.rename(directory / manifest["archive"])
+    manifest["seconds"] = round(time.perf_counter() - started, 3)
+    (directory / f"{stem}.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    prune(directory, int(env_float("BACKUP_KEEP", 7)))
+    return manifest
+
+
+def list_snapshots(directory: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """Manifests of the snapshots in ``directory``, newest first."""
+    directory = directory or backup_dir()
+    manifests = []
+    for path in sorted(directory.glob("*.json"), reverse=True):
+        try:
+            manifest = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            continue
+        if (directory / manifest.get("snapshot", "")).exists():
+            manifests.append(manifest)
+    return manifests
+
+
+def prune(directory: Path, keep: int) -> int:
+    removed = 0
+    for manifest in list_snapshots(directory)[max(keep, 1):]:
+        snapshot = directory / manifest["snapshot"]
+        snapshot.unlink(missing_ok=True)
+        if manifest.get("archive"):
+            shutil.rmtree(directory / manifest["archive"], ignore_errors=True)
+        snapshot.with_name(snapshot.name.split(".db")[0] + ".json").unlink(missing_ok=True)
+        removed += 1
+    return removed
+
+
+def _manifest_for(snapshot: Path) -> Dict[str, Any]:
+    manifest_path = snapshot.with_name(snapshot.name.split(".db")[0] + ".json")
+    if not manifest_path.exists():
+        raise BackupError(f"No manifest next to {snapshot}")
+    return json.loads(manifest_path.read_text(encoding="utf-8"))
+
+
+def _unpack(snapshot: Path, workdir: Path) -> Path:
+    if snapshot.suffix != ".gz":
+        return snapshot
+    unpacked = workdir / snapshot.name[: -len(".gz")]
+    with gzip.open(snapshot, "rb") as packed, unpacked.open("wb") as raw:
+        shutil.copyfileobj(packed, raw, 1 << 20)
+    return unpacked
+
+
+def _verify_file(path: Path, manifest: Dict[str, Any]) -> Dict[str, int]:
+    if _sha256(path) != manifest["sha256"]:
+        raise BackupError(f"{path.name} does not match the checksum in its manifest")
+    counts = _check(path, full=True)
+    if counts != manifest["row_counts"]:
+        raise BackupError(f"Row counts {counts} differ from the manifest {manifest['row_counts']}")
+    return counts
+
+
+def _verify_partitions(snapshot: Path, manifest: Dict[str, Any], workdir: Path) -> Dict[str, Path]:
+    """Check every archive partition in a snapshot; unpacked paths by partition file name."""
+    verified = {}
+    for entry in manifest.get("partitions", []):
+        stored = snapshot.parent / manifest["archive"] / entry["snapshot"]
+        if not stored.exists():
+            raise BackupError(f"Archive partition {entry['file']} is missing from {stored.parent}")
+        path = _unpack(stored, workdir)
+        _verify_file(path, entry)
+        verified[entry["file"]] = path
+    return verified
+
+
+def verify_snapshot(snapshot: Path) -> Dict[str, Any]:
+    """Checksum, full integrity check and row counts against the manifest, archive partitions included."""
+    manifest = _manifest_for(snapshot)
+    with tempfile.TemporaryDirectory(dir=snapshot.parent) as workdir:
+        counts = _verify_file(_unpack(snapshot, Path(workdir)), manifest)
+        partitions = _verify_partitions(snapshot, manifest, Path(workdir))
+    return {"snapshot": snapshot.name, "verified": True, "row_counts": counts, "partitions": len(partitions)}
+
+
+def _restore_file(source_path: Path, target: Path) -> None:
+    source = sqlite3.connect(f"{source_path.resolve().as_uri()}?mode=ro", uri=True)
+    destination = sqlite3.connect(target)
+    try:
+        source.backup(destination)
+    finally:
+        destination.close()
+        source.close()
+
+
+def restore_snapshot(snapshot: Path, target: Optional[Path] = None) -> Dict[str, Any]:
+    """Verify ``snapshot`` and copy it over ``target`` (default: the current database).
+
+    The copy goes through the backup API into a connection on the target,
+    so a running app sees the restored data instead of a file swapped under
+    its open connections. Archive partitions are restored into the target's
+    archive directory first, and partition files the snapshot does not have
+    are removed, so the restored registry matches the files next to it. The
+    target is checked against the manifest again afterwards.
+    """
+    target = Path(target or database.db_path())
+    archive = database.archive_dir(target)
+    manifest = _manifest_for(snapshot)
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory(dir=snapshot.parent) as workdir:
+        source_path = _unpack(snapshot, Path(workdir))
+        _verify_file(source_path, manifest)
+        partitions = _verify_partitions(snapshot, manifest, Path(workdir))
+        if partitions:
+            archive.mkdir(parents=True, exist_ok=True)
+        for file, partition_path in partitions.items():
+            _restore_file(partition_path, archive / file)
+        if archive.is_dir():
+            for stale in archive.glob("meal_logs_*.db"):
+                if stale.name not in partitions:
+                    stale.unlink()
+        _restore_file(source_path, target)
+    counts = _check(target, full=True)
+    if counts != manifest["row_counts"]:
+        raise BackupError(f"Restored row counts {counts} differ from the manifest {manifest['row_counts']}")
+    for entry in manifest.get("partitions", []):
+        partition_counts = _check(archive / entry["file"], full=True)
+        if partition_counts != entry["row_counts"]:
+            raise BackupError(
+                f"Restored partition {entry['file']} has row counts {partition_counts},"
+                f" the manifest records {entry['row_counts']}"
+            )
+    return {
+        "snapshot": snapshot.name,
+        "target": str(target),
+        "row_counts": counts,
+        "partitions": len(partitions),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def create_all_shards(
+    compress: Optional[bool] = None, step_pages: Optional[int] = None, pause_ms: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """``create_snapshot`` for ``DB_PATH`` and then each user shard, each into its own ``backup_dir()``.
+
+    A shard that fails is logged and reported with its error, and the rest
+    are still backed up.
+    """
+
+    def backup() -> Dict[str, Any]:
+        try:
+            manifest = create_snapshot(None, compress, step_pages, pause_ms)
+        except Exception as exc:
+            logger.exception("Backup of %s failed", database.db_path())
+            return {"error": str(exc)}
+        return {key: manifest[key] for key in ("snapshot", "bytes", "row_counts", "seconds")}
+
+    return [{"user_id": user_id, **result} for user_id, result in database.for_each_shard(backup)]
+
+
+def _summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "shards": len(results),
+        "failed": sum(1 for result in results if "error" in result),
+        "seconds": round(sum(result.get("seconds", 0.0) for result in results), 3),
+        "results": results,
+    }
+
+
+_scheduler: Optional[PeriodicTask] = None
+
+
+def start(loop: asyncio.AbstractEventLoop) -> bool:
+    global _scheduler
+    _scheduler = start_every(
+        "BACKUP_INTERVAL_MINUTES", 0.0, "backup", create_all_shards, loop, summarize=_summarize
+    )
+    return _scheduler is not None
+
+
+def stop() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+    _scheduler = None
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "scheduled": _scheduler.snapshot() if _scheduler is not None else None,
+        "directory": str(backup_dir()),
+        "snapshots": list_snapshots() if backup_dir().exists() else [],
+    }
+
+
+def _run_command(args: argparse.Namespace) -> Any:
+    if args.command == "create" and args.all_shards:
+        if args.dir or args.user:
+            raise ValueError("--all-shards backs up every shard into BACKUP_DIR; drop --dir and --user")
+        return create_all_shards(args.compress, args.step_pages, args.pause_ms)
+    if args.command == "create":
+        return create_snapshot(args.dir, args.compress, args.step_pages, args.pause_ms)
+    if args.command == "list":
+        return list_snapshots(args.dir)
+    if args.command == "verify":
+        return verify_snapshot(args.snapshot)
+    return restore_snapshot(args.snapshot, args.target)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", type=Path, help="database file (default: DB_PATH)")
+    parser.add_argument("--dir", type=Path, help="snapshot directory (default: BACKUP_DIR)")
+    parser.add_argument("--user", help="back up or restore this user's shard instead")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create_parser = commands.add_parser("create", help="take a snapshot now")
+    create_parser.add_argument("--compress", action="store_true", default=None)
+    create_parser.add_argument("--step-pages", type=int)
+    create_parser.add_argument("--pause-ms", type=float)
+    create_parser.add_argument("--all-shards", action="store_true", help="DB_PATH and every user shard")
+    commands.add_parser("list", help="list snapshots, newest first")
+    verify_parser = commands.add_parser("verify", help="check a snapshot against its manifest")
+    verify_parser.add_argument("snapshot", type=Path)
+    restore_parser = commands.add_parser("restore", help="verify a snapshot and restore it")
+    restore_parser.add_argument("snapshot", type=Path)
+    restore_parser.add_argument("--target", type=Path, help="restore here instead of DB_PATH")
+    args = parser.parse_args()
+
+    if args.db:
+        database.DB_PATH = args.db
+    try:
+        with shards.user_scope(args.user):
+            result = _run_command(args)
+    except (BackupError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""
+Standalone performance benchmarks for the backend hot paths.
+
+Each module is runnable on its own, e.g. `python -m backend.benchmarks.week_planner`,
+and never touches `backend/nutrition.db` or the OpenAI API.
+"""
@@ -0,0 +1,99 @@
+"""Hot and history query latency before and after archiving old meal logs.
+
+Seeds a synthetic history, times the queries the app runs on every page
+load plus a few that reach into old months, archives everything past the
+horizon into monthly partitions, and times them again:
+
+    python -m backend.benchmarks.archive --rows 100000 --horizon-days 180
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from .. import archive, database, write_queue
+from .synthetic import DatasetSpec, populate
+
+
+def _time(fn: Callable[[], object], repeats: int) -> Dict[str, float]:
+    fn()
+    timings = []
+    for _ in range(repeats):
+        began = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - began) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+    }
+
+
+def _live_megabytes(path: Path) -> float:
+    """Size of the pages in use, ignoring free pages left behind by deletes."""
+    conn = sqlite3.connect(path)
+    try:
+        pages = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return pages * conn.execute("PRAGMA page_size").fetchone()[0] / 1e6
+    finally:
+        conn.close()
+
+
+def _cases() -> List[Tuple[str, Callable[[], object]]]:
+    today = date.today()
+    return [
+        ("recent page (7 days)", lambda: database.fetch_recent_meals(limit=20, days=7)),
+        ("weekly logs", lambda: database.get_weekly_logs(database.get_week_start())),
+        ("dashboard snapshot", lambda: database.get_dashboard_snapshot(limit=5, days=7)),
+        ("history page (1 year)", lambda: database.fetch_recent_meals(limit=20, days=365, offset=2000)),
+        ("daily totals (1 year)", lambda: database.get_daily_totals(today - timedelta(days=364), today)),
+        ("old log by id", lambda: database.fetch_meal_log_by_id(1)),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="meal_logs rows in the seeded database")
+    parser.add_argument("--horizon-days", type=int, default=180)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--dir", type=Path, help="put the database and partitions here (default: a temp dir)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.dir or Path(tmp)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / "archive-bench.db"
+        path.unlink(missing_ok=True)
+        populate(path, DatasetSpec.scaled(args.rows, seed=args.seed))
+        database.init_db()
+        cases = _cases()
+
+        before = {name: _time(fn, args.repeats) for name, fn in cases}
+        live_before = _live_megabytes(path)
+        result = archive.run(args.horizon_days)
+        after = {name: _time(fn, args.repeats) for name, fn in cases}
+        live_after = _live_megabytes(path)
+        write_queue.stop()
+
+        print(
+            f"{args.rows:,} meal logs; archived {result['rows']:,} into {len(result['months'])} monthly "
+            f"partitions in {result['seconds']:.1f}s; main database {live_before:.1f} -> {live_after:.1f} MB in use"
+        )
+        print(f"{'query':<24} {'before p50':>11} {'p95':>9} {'after p50':>11} {'p95':>9}")
+        for name, _ in cases:
+            print(
+                f"{name:<24} {before[name]['p50_ms']:>11.3f} {before[name]['p95_ms']:>9.3f} "
+                f"{after[name]['p50_ms']:>11.3f} {after[name]['p95_ms']:>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
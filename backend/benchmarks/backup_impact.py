@@ -0,0 +1,77 @@
+"""Write latency while online backups run, against a seeded database.
+
+Runs the ``write_load`` logger threads twice over the same synthetic
+history: once alone and once with snapshots taken back to back. It reports
+both latency distributions and what each backup cost:
+
+    python -m backend.benchmarks.backup_impact --rows 200000 --loggers 100 --seconds 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .. import backups, database, write_queue
+from .synthetic import DatasetSpec, populate
+from .write_load import drive
+
+
+def _backup_loop(directory: Path, stop: threading.Event, args: argparse.Namespace, runs: List[Dict[str, Any]]) -> None:
+    while not stop.is_set():
+        runs.append(backups.create_snapshot(directory, args.compress, args.step_pages, args.pause_ms))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="meal_logs rows in the seeded database")
+    parser.add_argument("--loggers", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--step-pages", type=int, default=256)
+    parser.add_argument("--pause-ms", type=float, default=5.0)
+    parser.add_argument("--compress", action="store_true")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--dir", type=Path, help="put the database and snapshots here (default: a temp dir)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.dir or Path(tmp)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / "backup-impact.db"
+        path.unlink(missing_ok=True)
+        populate(path, DatasetSpec.scaled(args.rows, seed=args.seed))
+        database.init_db()
+        print(f"{args.rows:,} meal logs, {path.stat().st_size / 1e6:.0f} MB; {args.loggers} loggers for {args.seconds:g}s")
+
+        baseline = drive(args.loggers, args.seconds, args.seed)
+        stop = threading.Event()
+        runs: List[Dict[str, Any]] = []
+        worker = threading.Thread(target=_backup_loop, args=(directory / "snapshots", stop, args, runs))
+        worker.start()
+        loaded = drive(args.loggers, args.seconds, args.seed + 1)
+        stop.set()
+        worker.join()
+        write_queue.stop()
+
+        print(f"{'':<14} {'writes/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for label, result in (("no backup", baseline), ("backing up", loaded)):
+            print(
+                f"{label:<14} {result['writes_per_second']:>10,.0f} {result['p50_ms']:>9.2f} "
+                f"{result['p99_ms']:>9.2f} {result['max_ms']:>9.1f}"
+            )
+        if runs:
+            print(
+                f"{len(runs)} backups: {statistics.fmean(run['copy_seconds'] for run in runs):.2f}s copy on average, "
+                f"{runs[-1]['pages']:,} pages in steps of {args.step_pages}, "
+                f"avg step {statistics.fmean(run['avg_step_ms'] for run in runs):.2f} ms, "
+                f"max step {max(run['max_step_ms'] for run in runs):.1f} ms, "
+                f"restarts {sum(run['restarts'] for run in runs)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Benchmark `/api/dashboard` against the three calls it replaces.
+
+The separate path is what the dashboard used to do on load: one request each
+for weekly progress, the recent-log page and preferences. Both paths run
+in-process through the ASGI app, so the difference is per-request overhead
+plus the extra connections and transactions, not network latency.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from .. import database
+from ..constants import DEFAULT_WEEKLY_GOALS, NUTRIENT_KEYS
+from ..database import fetch_recent_meals, get_preferences
+from ..meal_logic import build_dashboard, build_weekly_progress, format_meal_logs
+
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snack")
+
+
+def _populate(rows: int, seed: int) -> None:
+    rng = random.Random(seed)
+    today = date.today()
+    database.init_db()
+    conn = database._get_connection()
+    try:
+        values = []
+        for position in range(rows):
+            nutrition = {
+                key: round(DEFAULT_WEEKLY_GOALS[key] / 21 * rng.uniform(0.3, 1.6), 2)
+                for key in NUTRIENT_KEYS
+            }
+            override = None
+            if rng.random() < 0.1:
+                override = json.dumps({"calories": round(nutrition["calories"] * 1.2, 1)})
+            meal_date = today - timedelta(days=(rows - position) * 365 // rows)
+            values.append(
+                (
+                    f"Meal {position}",
+                    rng.choice(MEAL_TYPES),
+                    nutrition["calories"],
+                    json.dumps(nutrition),
+                    override,
+                    meal_date.isoformat(),
+                    f"{rng.randrange(6, 22):02d}:00",
+                    0,
+                    f"{meal_date.isoformat()}T12:00:00",
+                )
+            )
+        conn.executemany(
+            """
+            INSERT INTO meal_logs (
+                meal_name, meal_type, calories, nutrition, override_nutrition,
+                meal_date, meal_time, was_suggested, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            values,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _time(fn: Callable[[], object], repeats: int) -> Dict[str, float]:
+    fn()
+    timings = []
+    for _ in range(repeats):
+        began = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - began) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+    }
+
+
+def run(rows: int, repeats: int, limit: int, seed: int) -> List[dict]:
+    from fastapi.testclient import TestClient
+
+    from ..app import app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "dashboard-bench.db"
+        _populate(rows, seed)
+        client = TestClient(app)
+
+        def separate_http() -> None:
+            client.get("/api/nutrition/progress")
+            client.get("/api/meals/log", params={"limit": limit})
+            client.get("/api/preferences")
+
+        def separate_calls() -> None:
+            build_weekly_progress()
+            format_meal_logs(fetch_recent_meals(limit=limit, days=7))
+            get_preferences()
+
+        cases = (
+            ("http separate (3 requests)", separate_http),
+            ("http /api/dashboard", lambda: client.get("/api/dashboard", params={"limit": limit})),
+            ("functions separate", separate_calls),
+            ("functions build_dashboard", lambda: build_dashboard(limit=limit)),
+        )
+        results = []
+        print(f"{rows:,} meal logs, recent page of {limit}")
+        print(f"{'path':<30} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, fn in cases:
+            timing = _time(fn, repeats)
+            print(f"{name:<30} {timing['p50_ms']:>8.2f} {timing['p95_ms']:>8.2f}")
+            results.append({"path": name, **timing})
+        return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.rows, args.repeats, args.limit, args.seed)
+
+
+if __name__ == "__main__":
+    main()
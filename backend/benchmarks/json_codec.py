@@ -0,0 +1,114 @@
+"""Encode/decode throughput of each available JSON codec on nutrition payloads.
+
+Payloads are shaped like what the backend stores and serves: a full
+nutrient blob, a saved recipe row and a 100-entry recent-meals response.
+Each installed codec (see ``backend/json_codec.py``) is timed on the raw
+operations and on ``compute_nutrient_totals`` and response rendering,
+which go through the module the way the app does:
+
+    python -m backend.benchmarks.json_codec --repeats 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from .. import json_codec
+from ..constants import DEFAULT_WEEKLY_GOALS, NUTRIENT_KEYS
+from ..database import compute_nutrient_totals
+
+
+def _nutrition(rng: random.Random) -> Dict[str, float]:
+    return {key: round(DEFAULT_WEEKLY_GOALS[key] / 21 * rng.uniform(0.3, 1.7), 2) for key in NUTRIENT_KEYS}
+
+
+def _payloads(rng: random.Random) -> Dict[str, Any]:
+    recipe = {
+        "name": "Miso glazed salmon bowl",
+        "description": "Salmon over sesame rice with quick-pickled cucumber.",
+        "meal_type": "dinner",
+        "cooking_time": 30,
+        "ingredients": [f"{rng.randrange(1, 400)} g ingredient {number}" for number in range(12)],
+        "instructions": [f"Step {number}: " + "stir and season " * 6 for number in range(8)],
+        "tags": ["high-protein", "omega-3", "weeknight"],
+        "nutrition": _nutrition(rng),
+    }
+    page = [
+        {
+            "id": number,
+            "time": "12:30",
+            "meal": f"Meal {number}",
+            "calories": 600.0,
+            "type": "lunch",
+            "day": "Mon",
+            "date": "Oct 19",
+            "hasOverride": False,
+            "nutrition": _nutrition(rng),
+        }
+        for number in range(100)
+    ]
+    return {"nutrition blob": _nutrition(rng), "recipe row": recipe, "meal log page": page}
+
+
+def _rate(fn: Callable[[], object], repeats: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return repeats / (time.perf_counter() - started)
+
+
+def _use(name: str) -> None:
+    encode, decode = json_codec.BACKENDS[name]()
+    json_codec.NAME, json_codec._encode, json_codec._decode = name, encode, decode
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payloads = _payloads(rng)
+    logs = [
+        {"nutrition": json_codec.dumps(_nutrition(rng)), "override_nutrition": None} for _ in range(1000)
+    ]
+    available: List[str] = []
+    for name in json_codec.BACKENDS:
+        try:
+            json_codec.BACKENDS[name]()
+        except ImportError:
+            print(f"{name}: not installed, skipped")
+            continue
+        available.append(name)
+    selected = json_codec.NAME
+
+    rows: List[Tuple[str, str, float, float]] = []
+    for name in available:
+        _use(name)
+        for label, payload in payloads.items():
+            encoded = json_codec.dumps_bytes(payload)
+            repeats = max(args.repeats // (100 if label == "meal log page" else 1), 100)
+            encode = _rate(lambda: json_codec.dumps(payload), repeats)
+            decode = _rate(lambda: json_codec.loads(encoded), repeats)
+            rows.append((name, f"{label} ({len(encoded):,} B)", encode, decode))
+        response = json_codec.JSONResponse(payloads["meal log page"])
+        render = _rate(lambda: response.render(payloads["meal log page"]), max(args.repeats // 100, 100))
+        totals = _rate(lambda: compute_nutrient_totals(logs), max(args.repeats // 1000, 20))
+        rows.append((name, "render 100-log response", render, 0.0))
+        rows.append((name, "totals over 1,000 logs", totals, 0.0))
+    _use(selected)
+
+    print(f"selected codec: {selected}")
+    print(f"{'codec':<8} {'payload':<34} {'encode/s':>12} {'decode/s':>12}")
+    for name, label, encode, decode in rows:
+        decoded = f"{decode:,.0f}" if decode else "-"
+        print(f"{name:<8} {label:<34} {encode:>12,.0f} {decoded:>12}")
+
+
+if __name__ == "__main__":
+    main()
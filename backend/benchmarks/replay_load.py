@@ -0,0 +1,114 @@
+"""Network-free load test of the OpenAI call path using recorded traffic.
+
+Every successful recording in the replay sources (``logs/openai.log`` by
+default) is sent back through ``_call_openai_json`` in ``replay`` mode. That
+covers admission control, request building, logging and response parsing,
+with the recorded prompts, schemas and response sizes. Provider latency is
+zero by default. ``--latency recorded`` sleeps for each call's original
+duration (times ``--latency-scale``), so queueing under the concurrency caps
+shows up as it would live.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+from .. import llm_replay
+from ..openai_utils import _call_openai_json, get_scheduler
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _drive(recordings: List[llm_replay.Recording], requests: int, concurrency: int, seed: int) -> Dict[str, List[float]]:
+    rng = random.Random(seed)
+    schedule = [rng.choice(recordings) for _ in range(requests)]
+    timings: Dict[str, List[float]] = defaultdict(list)
+    gate = asyncio.Semaphore(concurrency)
+    get_scheduler()
+
+    async def one(recording: llm_replay.Recording) -> None:
+        name, schema = llm_replay._format(recording.request)
+        async with gate:
+            started = time.perf_counter()
+            await _call_openai_json(recording.request["input"], schema, name)
+            timings[name].append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one(recording) for recording in schedule))
+    return timings
+
+
+def run(
+    sources: List[Path],
+    requests: int,
+    concurrency: int,
+    latency: str,
+    latency_scale: float,
+    seed: int,
+    with_logging: bool,
+) -> None:
+    os.environ["OPENAI_REPLAY"] = "replay"
+    os.environ["OPENAI_REPLAY_LATENCY"] = latency
+    os.environ["OPENAI_REPLAY_LATENCY_SCALE"] = str(latency_scale)
+    if not with_logging:
+        logging.getLogger("openai_utils").setLevel(logging.WARNING)
+    loaded = llm_replay.load(sources or None)
+    recordings = [recording for recording in llm_replay.recordings() if recording.ok]
+    if not recordings:
+        raise SystemExit("No successful recordings to replay.")
+    models = {recording.request.get("model") for recording in recordings}
+    if len(models) > 1:
+        raise SystemExit(f"Recordings span several models ({sorted(models)}); pass one model's sources.")
+    os.environ["OPENAI_MODEL"] = models.pop()
+    print(f"{loaded} exchanges loaded, {len(recordings)} distinct successful requests")
+
+    started = time.perf_counter()
+    timings = asyncio.run(_drive(recordings, requests, concurrency, seed))
+    elapsed = time.perf_counter() - started
+
+    sizes = defaultdict(list)
+    for recording in recordings:
+        sizes[recording.name].append(len(str(recording.request["input"])))
+    print(f"{requests} calls at concurrency {concurrency}, latency={latency}: {requests / elapsed:,.1f} calls/s")
+    print(f"{'response_name':<28} {'calls':>6} {'prompt chars':>13} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for name, values in sorted(timings.items()):
+        print(
+            f"{name or '(unnamed)':<28} {len(values):>6} {int(statistics.mean(sizes[name])):>13,} "
+            f"{statistics.median(values):>9.2f} {_percentile(values, 0.95):>9.2f} {max(values):>9.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("sources", nargs="*", type=Path, help="logs or cassettes (default: logs/openai.log)")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", default="0", help="'recorded' or a fixed delay in seconds")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiplier for recorded latency")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--with-logging", action="store_true", help="keep the full request/response log lines")
+    args = parser.parse_args()
+    run(
+        args.sources,
+        args.requests,
+        args.concurrency,
+        args.latency,
+        args.latency_scale,
+        args.seed,
+        args.with_logging,
+    )
+
+
+if __name__ == "__main__":
+    main()
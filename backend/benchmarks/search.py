@@ -0,0 +1,149 @@
+"""Benchmark `/api/search` queries against a synthetic history of up to 1M meal logs.
+
+Rows are written in date order with a few back-dated entries, which is how the
+app fills `meal_logs` in practice.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List, Tuple
+
+from .. import database
+from ..search import search
+
+ADJECTIVES = (
+    "grilled", "spicy", "roasted", "creamy", "smoky", "lemon", "garlic", "teriyaki",
+    "herb", "crispy", "braised", "pesto", "sesame", "honey", "chipotle", "miso",
+    "ginger", "cajun", "tandoori", "balsamic",
+)
+PROTEINS = (
+    "chicken", "salmon", "tofu", "beef", "shrimp", "lentil", "chickpea", "turkey",
+    "pork", "egg", "tempeh", "cod", "tuna", "halloumi", "black bean", "lamb",
+    "edamame", "paneer", "sardine", "mushroom",
+)
+DISHES = (
+    "bowl", "salad", "wrap", "curry", "stir fry", "tacos", "pasta", "soup",
+    "sandwich", "omelette", "burrito", "noodles", "skewers", "flatbread", "risotto",
+)
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snack")
+QUERIES: Tuple[Tuple[str, dict], ...] = (
+    ("chick", {}),
+    ("salmon bo", {}),
+    ("spicy tofu curry", {}),
+    ("teriyaki", {"meal_type": "dinner"}),
+    ("lentil sou", {"days": 30}),
+    ("paneer", {"days": 7, "meal_type": "lunch"}),
+    ("gr", {}),
+)
+
+
+def _populate(rows: int, seed: int, batch: int = 50_000) -> None:
+    rng = random.Random(seed)
+    today = date.today()
+    created = f"{today.isoformat()}T12:00:00"
+    database.init_db()
+    conn = database._get_connection()
+    try:
+        for start in range(0, rows, batch):
+            values = []
+            for _ in range(min(batch, rows - start)):
+                name = f"{rng.choice(ADJECTIVES)} {rng.choice(PROTEINS)} {rng.choice(DISHES)}"
+                notes = None
+                if rng.random() < 0.2:
+                    notes = f"Manual entry: {name} with {rng.choice(PROTEINS)} | Portion: 1 plate"
+                age = (rows - start - len(values)) * 3650 // rows
+                if rng.random() < 0.05:
+                    age += rng.randrange(1, 30)
+                meal_date = today - timedelta(days=age)
+                values.append(
+                    (
+                        name.capitalize(),
+                        rng.choice(MEAL_TYPES),
+                        round(rng.uniform(150, 950), 1),
+                        "{}",
+                        meal_date.isoformat(),
+                        "12:00",
+                        0,
+                        created,
+                        notes,
+                    )
+                )
+            conn.executemany(
+                """
+                INSERT INTO meal_logs (
+                    meal_name, meal_type, calories, nutrition, meal_date,
+                    meal_time, was_suggested, created_at, notes
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                values,
+            )
+            conn.commit()
+        conn.execute("INSERT INTO meal_logs_fts (meal_logs_fts) VALUES ('optimize')")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run(rows: int, repeats: int, limit: int, seed: int) -> List[dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "search-bench.db"
+        started = time.perf_counter()
+        _populate(rows, seed)
+        print(f"populated {rows:,} rows in {time.perf_counter() - started:.1f}s")
+        today = date.today()
+        results = []
+        print(
+            f"{'query':<18} {'filters':<36} {'hits':>5} "
+            f"{'cold ms':>8} {'p50 ms':>8} {'p95 ms':>8}"
+        )
+        for text, options in QUERIES:
+            start_date = today - timedelta(days=options["days"]) if "days" in options else None
+            meal_type = options.get("meal_type")
+            timings = []
+            hits = 0
+            for _ in range(repeats):
+                began = time.perf_counter()
+                found = search(text, "logs", limit, start_date=start_date, meal_type=meal_type)
+                timings.append((time.perf_counter() - began) * 1000)
+                hits = len(found["logs"])
+            cold = timings[0]
+            timings = sorted(timings[1:] or timings)
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            filters = json.dumps(options) if options else "-"
+            print(
+                f"{text:<18} {filters:<36} {hits:>5} "
+                f"{cold:>8.2f} {statistics.median(timings):>8.2f} {p95:>8.2f}"
+            )
+            results.append(
+                {
+                    "query": text,
+                    "filters": options,
+                    "hits": hits,
+                    "cold_ms": round(cold, 3),
+                    "p50_ms": round(statistics.median(timings), 3),
+                    "p95_ms": round(p95, 3),
+                }
+            )
+        return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.rows, args.repeats, args.limit, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Meal-log write throughput as the number of active users grows.
+
+The same ``write_load`` logger threads are spread over 1, 2, 4, ... user
+shards, so each step has the same offered load but more database files to
+commit to. With one shard every write goes through one file's lock; with
+several, the ``WRITE_QUEUE_THREADS`` writer threads commit in parallel:
+
+    python -m backend.benchmarks.shard_scaling --loggers 64 --users 1,2,4,8,16,64 --seconds 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+from pathlib import Path
+
+from .. import database, shards, write_queue
+from .write_load import drive
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loggers", type=int, default=64)
+    parser.add_argument("--users", default="1,2,4,8,16,64", help="comma-separated active user counts")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--dir", type=Path, help="put the shards here (default: a temp dir)")
+    args = parser.parse_args()
+
+    counts = [int(value) for value in args.users.split(",") if value.strip()]
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.dir or Path(tmp)
+        directory.mkdir(parents=True, exist_ok=True)
+        print(
+            f"{args.loggers} loggers for {args.seconds:g}s each, "
+            f"{len(write_queue.stats()['writers'])} writer threads"
+        )
+        print(f"{'users':>6} {'writes':>8} {'writes/s':>10} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9} {'avg group':>10}")
+        for users in counts:
+            database.DB_PATH = directory / f"scaling-{users}.db"
+            names = [f"user{number}" for number in range(users)]
+            for name in names:
+                # Create the shards up front so schema setup is not timed.
+                with shards.user_scope(name):
+                    database.init_db()
+            before = write_queue.stats()
+            result = drive(args.loggers, args.seconds, args.seed, lambda index: names[index % users])
+            after = write_queue.stats()
+            groups = after["groups"] - before["groups"]
+            print(
+                f"{users:>6} {result['writes']:>8,} {result['writes_per_second']:>10,.0f} {result['errors']:>7} "
+                f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+                f"{(after['writes'] - before['writes']) / max(groups, 1):>10.1f}"
+            )
+        write_queue.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Backend hot-path benchmarks over seeded synthetic histories, with JSON output.
+
+Run the scenarios and save the results:
+
+    python -m backend.benchmarks.suite run --sizes 1e3,1e4,1e5 --out head.json
+
+Compare two result files; exits non-zero when a scenario got slower:
+
+    python -m backend.benchmarks.suite compare base.json head.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .. import database, meal_library
+from ..database import (
+    fetch_recent_meals,
+    get_preferences,
+    get_week_start,
+    get_weekly_logs,
+    list_custom_meals,
+)
+from ..meal_logic import _prepare_generation_context, build_weekly_progress
+from ..schemas import MealGenerationRequest
+from .synthetic import DatasetSpec, ensure_dataset, parse_sizes
+
+RESULTS_VERSION = 1
+DEEP_OFFSETS = (0, 1_000, 10_000, 100_000, 1_000_000)
+HISTORY_SLICE = 10_000
+
+Scenario = Tuple[str, Dict[str, Any], Callable[[], Any]]
+
+
+def _scenarios(size: int) -> List[Scenario]:
+    from ..app import list_meal_logs
+
+    week_start = get_week_start()
+    weekly_logs = get_weekly_logs(week_start)
+    history = fetch_recent_meals(limit=HISTORY_SLICE, days=36_500)
+    progress, targets, totals, logs, week_start = build_weekly_progress()
+    preferences = get_preferences()
+    custom_meals = list_custom_meals(limit=12)
+    request = MealGenerationRequest()
+
+    scenarios: List[Scenario] = [
+        (
+            "compute_nutrient_totals",
+            {"logs": len(weekly_logs)},
+            lambda: database.compute_nutrient_totals(weekly_logs),
+        ),
+        (
+            "compute_nutrient_totals",
+            {"logs": len(history)},
+            lambda: database.compute_nutrient_totals(history),
+        ),
+        ("build_weekly_progress", {}, build_weekly_progress),
+        (
+            "list_meal_logs",
+            {"limit": 10, "days": 7},
+            lambda: list_meal_logs(limit=10, days=7, offset=0),
+        ),
+    ]
+    for offset in DEEP_OFFSETS:
+        if offset >= size:
+            continue
+        scenarios.append(
+            (
+                "fetch_recent_meals",
+                {"limit": 20, "offset": offset},
+                lambda offset=offset: fetch_recent_meals(limit=20, days=36_500, offset=offset),
+            )
+        )
+    scenarios += [
+        ("list_custom_meals", {"limit": 12}, lambda: list_custom_meals(limit=12)),
+        ("list_custom_meals", {"limit": 1000}, lambda: list_custom_meals(limit=1000)),
+        ("meal_library.list_meals", {"limit": 12}, lambda: meal_library.list_meals(limit=12)),
+        ("meal_library.list_meals", {"limit": 1000}, lambda: meal_library.list_meals(limit=1000)),
+        (
+            "_prepare_generation_context",
+            {"logs": len(logs), "custom_meals": len(custom_meals)},
+            lambda: _prepare_generation_context(
+                request, progress, targets, totals, logs, week_start, preferences, custom_meals
+            ),
+        ),
+    ]
+    return scenarios
+
+
+def _measure(fn: Callable[[], Any], min_repeats: int, min_seconds: float, max_repeats: int) -> Dict[str, Any]:
+    cold_started = time.perf_counter()
+    fn()
+    cold = (time.perf_counter() - cold_started) * 1000
+    timings: List[float] = []
+    budget_started = time.perf_counter()
+    while len(timings) < max_repeats and (
+        len(timings) < min_repeats or time.perf_counter() - budget_started < min_seconds
+    ):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "repeats": len(timings),
+        "cold_ms": round(cold, 4),
+        "min_ms": round(timings[0], 4),
+        "p50_ms": round(statistics.median(timings), 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+        "mean_ms": round(statistics.fmean(timings), 4),
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    sizes = parse_sizes(args.sizes)
+    report: Dict[str, Any] = {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": args.seed,
+        },
+        "datasets": [],
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(args.data_dir) if args.data_dir else Path(tmp)
+        directory.mkdir(parents=True, exist_ok=True)
+        print(f"{'scenario':<28} {'size':>10} {'params':<34} {'p50 ms':>9} {'p95 ms':>9} {'n':>5}")
+        for size in sizes:
+            spec = DatasetSpec.scaled(
+                size,
+                custom_ratio=args.custom_ratio,
+                preferences_ratio=args.preferences_ratio,
+                override_rate=args.override_rate,
+                seed=args.seed,
+            )
+            _, dataset = ensure_dataset(directory, spec, reuse=bool(args.data_dir))
+            report["datasets"].append(dataset)
+            for name, params, fn in _scenarios(size):
+                if args.only and name not in args.only:
+                    continue
+                timing = _measure(fn, args.min_repeats, args.min_seconds, args.max_repeats)
+                report["results"].append({"scenario": name, "size": size, "params": params, **timing})
+                print(
+                    f"{name:<28} {size:>10,} {json.dumps(params):<34} "
+                    f"{timing['p50_ms']:>9.3f} {timing['p95_ms']:>9.3f} {timing['repeats']:>5}"
+                )
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"wrote {args.out}")
+    return report
+
+
+def _key(result: Dict[str, Any]) -> Tuple[str, int, str]:
+    return result["scenario"], int(result["size"]), json.dumps(result["params"], sort_keys=True)
+
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], threshold: float, min_delta_ms: float, metric: str) -> List[Dict[str, Any]]:
+    """Match results by scenario, size and params and flag slowdowns.
+
+    A row regresses when ``head`` is more than ``threshold`` slower than
+    ``base`` *and* the absolute difference exceeds ``min_delta_ms``, so
+    sub-millisecond jitter on tiny scenarios does not trip it.
+    """
+    baseline = {_key(result): result for result in base["results"]}
+    rows = []
+    for result in head["results"]:
+        before = baseline.get(_key(result))
+        if before is None:
+            continue
+        old, new = float(before[metric]), float(result[metric])
+        ratio = new / old if old else float("inf")
+        rows.append(
+            {
+                "scenario": result["scenario"],
+                "size": result["size"],
+                "params": result["params"],
+                "base_ms": old,
+                "head_ms": new,
+                "ratio": round(ratio, 3),
+                "regression": ratio > 1 + threshold and new - old > min_delta_ms,
+                "improvement": ratio < 1 - threshold and old - new > min_delta_ms,
+            }
+        )
+    return rows
+
+
+def _compare_command(args: argparse.Namespace) -> int:
+    base = json.loads(Path(args.base).read_text(encoding="utf-8"))
+    head = json.loads(Path(args.head).read_text(encoding="utf-8"))
+    rows = compare(base, head, args.threshold, args.min_delta_ms, args.metric)
+    print(f"{'scenario':<28} {'size':>10} {'params':<34} {'base':>9} {'head':>9} {'ratio':>7}")
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ("faster" if row["improvement"] else "")
+        print(
+            f"{row['scenario']:<28} {row['size']:>10,} {json.dumps(row['params']):<34} "
+            f"{row['base_ms']:>9.3f} {row['head_ms']:>9.3f} {row['ratio']:>7.2f} {flag}"
+        )
+    regressions = [row for row in rows if row["regression"]]
+    print(f"{len(rows)} compared, {len(regressions)} regressed (>{args.threshold:.0%} on {args.metric})")
+    return 1 if regressions else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="generate data and time every scenario")
+    run_parser.add_argument("--sizes", nargs="+", default=["1e3", "1e4", "1e5"], help="meal_logs rows, 10^3 to 10^7")
+    run_parser.add_argument("--custom-ratio", type=float, default=0.1, help="user_meals rows per meal log")
+    run_parser.add_argument("--preferences-ratio", type=float, default=0.01, help="user_preferences rows per meal log")
+    run_parser.add_argument("--override-rate", type=float, default=0.08)
+    run_parser.add_argument("--seed", type=int, default=7)
+    run_parser.add_argument("--data-dir", help="keep generated databases here and reuse them")
+    run_parser.add_argument("--only", nargs="+", help="scenario names to run")
+    run_parser.add_argument("--min-repeats", type=int, default=5)
+    run_parser.add_argument("--max-repeats", type=int, default=500)
+    run_parser.add_argument("--min-seconds", type=float, default=1.0)
+    run_parser.add_argument("--out", help="write results JSON here")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+    compare_parser.add_argument("--min-delta-ms", type=float, default=0.05)
+    compare_parser.add_argument("--metric", choices=("p50_ms", "p95_ms", "min_ms", "mean_ms"), default="p50_ms")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(_compare_command(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Seeded synthetic history for benchmarks: meal logs, saved recipes, preferences.
+
+The same seed and sizes always produce the same rows, so two benchmark runs
+against freshly generated databases measure code changes, not data drift.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import sqlite3
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from .. import database
+from ..constants import DEFAULT_WEEKLY_GOALS, NUTRIENT_KEYS
+from ..database import SEARCH_INDEXES
+
+GENERATOR_VERSION = 1
+MEALS_PER_DAY = 4
+MAX_HISTORY_DAYS = 36_500
+BATCH = 50_000
+# Rows draw their nutrition from a fixed pool so generation stays I/O bound.
+NUTRITION_POOL = 4096
+
+ADJECTIVES = (
+    "grilled", "spicy", "roasted", "creamy", "smoky", "lemon", "garlic", "teriyaki",
+    "herb", "crispy", "braised", "pesto", "sesame", "honey", "chipotle", "miso",
+)
+PROTEINS = (
+    "chicken", "salmon", "tofu", "beef", "shrimp", "lentil", "chickpea", "turkey",
+    "pork", "egg", "tempeh", "cod", "tuna", "halloumi", "black bean", "paneer",
+)
+DISHES = (
+    "bowl", "salad", "wrap", "curry", "stir fry", "tacos", "pasta", "soup",
+    "sandwich", "omelette", "burrito", "noodles", "skewers", "flatbread", "risotto",
+)
+SIDES = ("rice", "quinoa", "kale", "spinach", "broccoli", "avocado", "peppers", "sweet potato")
+MEAL_TIMES = {"breakfast": (7, 9), "lunch": (12, 14), "dinner": (18, 21), "snack": (15, 16)}
+COMPLEXITY = ("simple", "moderate", "complex")
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    meal_logs: int
+    user_meals: int
+    preferences: int
+    override_rate: float = 0.08
+    seed: int = 7
+
+    @classmethod
+    def scaled(
+        cls,
+        size: int,
+        custom_ratio: float = 0.1,
+        preferences_ratio: float = 0.01,
+        override_rate: float = 0.08,
+        seed: int = 7,
+    ) -> "DatasetSpec":
+        return cls(
+            meal_logs=size,
+            user_meals=max(int(size * custom_ratio), 1),
+            preferences=max(int(size * preferences_ratio), 1),
+            override_rate=override_rate,
+            seed=seed,
+        )
+
+    def filename(self) -> str:
+        return (
+            f"bench-v{GENERATOR_VERSION}-l{self.meal_logs}-m{self.user_meals}"
+            f"-p{self.preferences}-o{self.override_rate:g}-s{self.seed}.db"
+        )
+
+
+def _nutrition_pool(rng: random.Random, divisor: float) -> List[Tuple[float, str]]:
+    pool = []
+    for _ in range(NUTRITION_POOL):
+        nutrition = {
+            key: round(DEFAULT_WEEKLY_GOALS[key] / divisor * rng.uniform(0.3, 1.7), 2)
+            for key in NUTRIENT_KEYS
+        }
+        pool.append((nutrition["calories"], json.dumps(nutrition)))
+    return pool
+
+
+def _override(rng: random.Random, calories: float) -> str:
+    # Users mostly correct calories and a macro or two, not the full panel.
+    override = {"calories": round(calories * rng.uniform(0.7, 1.3), 1)}
+    for key in rng.sample(("protein", "carbs", "fat", "fiber", "sodium"), rng.randrange(0, 3)):
+        override[key] = round(DEFAULT_WEEKLY_GOALS[key] / 21 * rng.uniform(0.5, 1.5), 2)
+    return json.dumps(override)
+
+
+def _meal_log_rows(spec: DatasetSpec, rng: random.Random) -> Iterator[tuple]:
+    """Meal logs in date order, oldest first, ending today.
+
+    History spans ``meal_logs / MEALS_PER_DAY`` days up to ``MAX_HISTORY_DAYS``;
+    past that, days get denser rather than dates running off the calendar.
+    """
+    pool = _nutrition_pool(rng, 21)
+    today = date.today()
+    span = min(max(spec.meal_logs // MEALS_PER_DAY, 1), MAX_HISTORY_DAYS)
+    meal_types = tuple(MEAL_TIMES)
+    for position in range(spec.meal_logs):
+        meal_date = today - timedelta(days=span - 1 - position * span // spec.meal_logs)
+        meal_type = meal_types[position % len(meal_types)]
+        start, end = MEAL_TIMES[meal_type]
+        calories, nutrition = pool[rng.randrange(NUTRITION_POOL)]
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(PROTEINS)} {rng.choice(DISHES)}"
+        override = _override(rng, calories) if rng.random() < spec.override_rate else None
+        yield (
+            name.capitalize(),
+            meal_type,
+            calories,
+            nutrition,
+            meal_date.isoformat(),
+            f"{rng.randrange(start, end):02d}:{rng.randrange(60):02d}",
+            int(rng.random() < 0.3),
+            f"{meal_date.isoformat()}T{start:02d}:00:00",
+            None,
+            override,
+        )
+
+
+def _user_meal_rows(spec: DatasetSpec, rng: random.Random) -> Iterator[tuple]:
+    pool = _nutrition_pool(rng, 14)
+    created = datetime(2020, 1, 1)
+    for position in range(spec.user_meals):
+        protein = rng.choice(PROTEINS)
+        sides = rng.sample(SIDES, 3)
+        name = f"{rng.choice(ADJECTIVES)} {protein} {rng.choice(DISHES)}".capitalize()
+        _, nutrition = pool[rng.randrange(NUTRITION_POOL)]
+        yield (
+            name,
+            f"{name} with {', '.join(sides)}.",
+            rng.choice(("lunch", "dinner", "meal")),
+            rng.choice((10, 15, 20, 30, 45, 60)),
+            json.dumps([f"200 g {protein}", *(f"1 cup {side}" for side in sides)]),
+            json.dumps(["Prep the ingredients.", "Cook the protein.", "Assemble and serve."]),
+            json.dumps([protein, rng.choice(("high-protein", "quick", "meal-prep"))]),
+            nutrition,
+            json.dumps({"name": name, "preferred_ingredients": [protein]}),
+            (created + timedelta(minutes=position)).isoformat(),
+        )
+
+
+def _preference_rows(spec: DatasetSpec, rng: random.Random) -> Iterator[tuple]:
+    updated = datetime(2020, 1, 1)
+    for position in range(spec.preferences):
+        yield (
+            json.dumps(rng.sample(PROTEINS + SIDES, 4)),
+            json.dumps(rng.sample(("vegetarian", "dairy-free", "gluten-free", "nut-free"), rng.randrange(0, 2))),
+            rng.choice((15, 30, 45, 60)),
+            rng.choice(COMPLEXITY),
+            (updated + timedelta(minutes=position)).isoformat(),
+        )
+
+
+def _insert(conn: sqlite3.Connection, sql: str, rows: Iterator[tuple]) -> None:
+    batch: List[tuple] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH:
+            conn.executemany(sql, batch)
+            conn.commit()
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+        conn.commit()
+
+
+def _drop_search_index(conn: sqlite3.Connection) -> None:
+    # Feeding FTS row by row dominates bulk loads; it is rebuilt on demand instead.
+    for name in SEARCH_INDEXES:
+        for suffix in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}_{suffix}")
+        conn.execute(f"DROP TABLE IF EXISTS {name}")
+    conn.commit()
+
+
+def populate(path: Path, spec: DatasetSpec, search_index: bool = False) -> Dict[str, object]:
+    """Create ``path`` and fill it according to ``spec``.
+
+    The full-text index is left out unless ``search_index`` is set; the next
+    ``init_db`` against the file recreates and rebuilds it.
+    """
+    started = time.perf_counter()
+    database.DB_PATH = path
+    database.init_db()
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA synchronous = OFF")
+        _drop_search_index(conn)
+        rng = random.Random(spec.seed)
+        _insert(
+            conn,
+            """
+            INSERT INTO meal_logs (
+                meal_name, meal_type, calories, nutrition, meal_date, meal_time,
+                was_suggested, created_at, notes, override_nutrition
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            _meal_log_rows(spec, rng),
+        )
+        _insert(
+            conn,
+            """
+            INSERT INTO user_meals (
+                name, description, meal_type, cooking_time, ingredients,
+                instructions, tags, nutrition, source_payload, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            _user_meal_rows(spec, rng),
+        )
+        _insert(
+            conn,
+            """
+            INSERT INTO user_preferences (
+                preferred_ingredients, dietary_restrictions,
+                cooking_time_preference, meal_complexity, updated_at
+            ) VALUES (?, ?, ?, ?, ?)
+            """,
+            _preference_rows(spec, rng),
+        )
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    if search_index:
+        database.init_db()
+    return {
+        **asdict(spec),
+        "generator_version": GENERATOR_VERSION,
+        "search_index": search_index,
+        "seconds": round(time.perf_counter() - started, 2),
+        "bytes": path.stat().st_size,
+    }
+
+
+def ensure_dataset(directory: Path, spec: DatasetSpec, reuse: bool = True) -> Tuple[Path, Dict[str, object]]:
+    """Return a populated database for ``spec``, generating it if needed."""
+    path = directory / spec.filename()
+    if reuse and path.exists():
+        database.DB_PATH = path
+        return path, {**asdict(spec), "generator_version": GENERATOR_VERSION, "reused": True}
+    if path.exists():
+        path.unlink()
+    return path, populate(path, spec)
+
+
+def parse_sizes(raw: Sequence[str]) -> List[int]:
+    """Accept ``1000``, ``1e5`` or ``10^6`` style sizes."""
+    sizes = []
+    for value in raw:
+        for part in str(value).split(","):
+            part = part.strip().replace("10^", "1e")
+            if part:
+                sizes.append(int(float(part)))
+    return sizes
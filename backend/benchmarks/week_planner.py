@@ -0,0 +1,97 @@
+"""Benchmark the rest-of-week planner over synthetic libraries of 100-10,000 meals."""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+from datetime import date
+from typing import Dict, List
+
+from ..constants import DEFAULT_PREFERENCES, DEFAULT_WEEKLY_GOALS, NUTRIENT_KEYS
+from ..database import get_week_start
+from ..meal_logic import _prepare_generation_context
+from ..recommender import LibraryIndex
+from ..schemas import MealGenerationRequest
+from ..week_planner import optimize_week, plan_days
+
+
+LIBRARY_SIZES = (100, 1_000, 10_000)
+
+
+def synthetic_library(size: int, seed: int = 7) -> List[Dict[str, object]]:
+    rng = random.Random(seed)
+    meals = []
+    for meal_id in range(1, size + 1):
+        nutrition = {
+            key: round(DEFAULT_WEEKLY_GOALS[key] / 14 * rng.uniform(0.2, 1.8), 2)
+            for key in NUTRIENT_KEYS
+        }
+        meals.append(
+            {
+                "id": meal_id,
+                "name": f"Synthetic meal {meal_id}",
+                "description": "",
+                "meal_type": rng.choice(["lunch", "dinner", "meal"]),
+                "cooking_time": rng.choice([10, 20, 30, 45, 60]),
+                "ingredients": [],
+                "instructions": [],
+                "tags": [],
+                "nutrition": nutrition,
+            }
+        )
+    return meals
+
+
+def _context(week_start: date) -> Dict[str, object]:
+    totals = {key: 0.0 for key in NUTRIENT_KEYS}
+    return _prepare_generation_context(
+        MealGenerationRequest(),
+        {},
+        DEFAULT_WEEKLY_GOALS,
+        totals,
+        [],
+        week_start,
+        DEFAULT_PREFERENCES,
+        [],
+    )
+
+
+def run(repeats: int, beam_width: int, candidates: int) -> None:
+    week_start = get_week_start()
+    context = _context(week_start)
+    days = plan_days(week_start, today=week_start)
+    print(f"{'meals':>8} {'p50 ms':>10} {'max ms':>10} {'score':>8} truncated")
+    for size in LIBRARY_SIZES:
+        index = LibraryIndex((size, size), synthetic_library(size))
+        timings = []
+        plan = {}
+        for _ in range(repeats):
+            started = time.perf_counter()
+            plan = optimize_week(
+                context,
+                days,
+                index=index,
+                beam_width=beam_width,
+                candidates_per_slot=candidates,
+                time_budget_ms=10_000,
+            )
+            timings.append((time.perf_counter() - started) * 1000)
+        print(
+            f"{size:>8} {statistics.median(timings):>10.2f} {max(timings):>10.2f} "
+            f"{plan['score']:>8.3f} {plan['stats']['truncated']}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--beam-width", type=int, default=8)
+    parser.add_argument("--candidates", type=int, default=24)
+    args = parser.parse_args()
+    run(args.repeats, args.beam_width, args.candidates)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Sustained meal-log write throughput with many concurrent loggers.
+
+Each logger is a thread calling ``log_meal`` back to back, the way FastAPI's
+thread pool runs the sync ``POST /api/meals/log`` handler. Every fifth write
+is an override or delete of an earlier row so all three queued writes are
+exercised. The run is repeated with the group-commit writer and with the
+old connection-per-write path:
+
+    python -m backend.benchmarks.write_load --loggers 100 --seconds 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .. import database, shards, write_queue
+from ..constants import DEFAULT_WEEKLY_GOALS, NUTRIENT_KEYS
+from ..schemas import MealLogRequest
+
+
+def _payload(rng: random.Random, number: int) -> MealLogRequest:
+    nutrition = {
+        key: round(DEFAULT_WEEKLY_GOALS[key] / 21 * rng.uniform(0.3, 1.7), 2) for key in NUTRIENT_KEYS
+    }
+    return MealLogRequest(
+        meal_name=f"Load test meal {number}",
+        meal_type="lunch",
+        calories=nutrition["calories"],
+        nutrition=nutrition,
+    )
+
+
+def drive(
+    loggers: int,
+    seconds: float,
+    seed: int,
+    user_for: Optional[Callable[[int], Optional[str]]] = None,
+) -> Dict[str, float]:
+    """Run ``loggers`` writer threads against ``database.DB_PATH`` for ``seconds``.
+
+    ``user_for(index)`` puts logger ``index`` in that user's shard instead.
+    """
+    latencies: List[List[float]] = [[] for _ in range(loggers)]
+    errors: List[int] = [0] * loggers
+    start_gate = threading.Barrier(loggers)
+    stop_at = [0.0]
+
+    def logger(index: int) -> None:
+        with shards.user_scope(user_for(index) if user_for else None):
+            run(index)
+
+    def run(index: int) -> None:
+        rng = random.Random(seed + index)
+        logged: List[int] = []
+        if start_gate.wait() == 0:
+            stop_at[0] = time.perf_counter() + seconds
+        start_gate.wait()
+        while time.perf_counter() < stop_at[0]:
+            started = time.perf_counter()
+            try:
+                roll = rng.random()
+                if logged and roll < 0.1:
+                    database.update_meal_override(rng.choice(logged), {"calories": 321.0})
+                elif logged and roll < 0.2:
+                    database.delete_meal_log(logged.pop())
+                else:
+                    logged.append(database.log_meal(_payload(rng, len(logged))))
+            except sqlite3.OperationalError:
+                errors[index] += 1
+                continue
+            latencies[index].append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=logger, args=(index,)) for index in range(loggers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    merged = sorted(value for values in latencies for value in values)
+    return {
+        "writes": len(merged),
+        "writes_per_second": len(merged) / elapsed,
+        "errors": sum(errors),
+        "p50_ms": statistics.median(merged) if merged else 0.0,
+        "p99_ms": merged[min(len(merged) - 1, int(len(merged) * 0.99))] if merged else 0.0,
+        "max_ms": merged[-1] if merged else 0.0,
+    }
+
+
+def _run_mode(directory: Path, queued: bool, loggers: int, seconds: float, seed: int) -> Dict[str, float]:
+    database.DB_PATH = directory / f"writes-{'queued' if queued else 'direct'}.db"
+    database.init_db()
+    write_queue.ENABLED = queued
+    result = drive(loggers, seconds, seed)
+    write_queue.stop()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loggers", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--dir", type=Path, help="put the databases here (default: a temp dir)")
+    parser.add_argument("--mode", choices=("both", "queued", "direct"), default="both")
+    args = parser.parse_args()
+
+    modes = {"both": (True, False), "queued": (True,), "direct": (False,)}[args.mode]
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.dir or Path(tmp)
+        directory.mkdir(parents=True, exist_ok=True)
+        print(f"{args.loggers} loggers for {args.seconds:g}s")
+        print(f"{'mode':<8} {'writes':>8} {'writes/s':>10} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for queued in modes:
+            result = _run_mode(directory, queued, args.loggers, args.seconds, args.seed)
+            print(
+                f"{'queued' if queued else 'direct':<8} {result['writes']:>8,} {result['writes_per_second']:>10,.0f} "
+                f"{result['errors']:>7} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['max_ms']:>9.1f}"
+            )
+            if queued:
+                stats = write_queue.stats()
+                print(f"         avg group {stats['avg_group']}, largest {stats['largest_group']}, "
+                      f"avg commit {stats['avg_commit_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,19 +5,32 @@ from __future__ import annotations
 import json
 from typing import Dict, List
 
+from . import dedupe
 from .database import save_custom_meal
 from .openai_utils import complete_custom_recipe
 from .schemas import CustomMealRequest
 
 
 async def generate_and_store_custom_meal(payload: CustomMealRequest) -> Dict[str, object]:
+    duplicate = dedupe.find_duplicate(payload)
+    if duplicate is not None:
+        meal, score = duplicate
+        return {
+            "duplicate": True,
+            "similarity": score,
+            "meal": meal,
+            "message": "A similar recipe is already saved; resend with force=true to generate a new one.",
+        }
     messages = _build_messages(payload)
     recipe = await complete_custom_recipe(messages)
     recipe.setdefault("meal_type", payload.meal_type)
     recipe.setdefault("prepTime", payload.cooking_time)
     recipe.setdefault("tags", [])
-    stored = save_custom_meal(recipe, payload.model_dump())
+    source_payload = payload.model_dump(exclude={"force"})
+    stored = save_custom_meal(recipe, source_payload)
+    dedupe.remember(int(stored["id"]), recipe, source_payload)
     stored["recipe"] = recipe
+    stored["duplicate"] = False
     return stored
 
 
@@ -3,27 +3,221 @@
 from __future__ import annotations
 
 import json
+import logging
 import sqlite3
+import threading
+import time
 from datetime import date, datetime, timedelta
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 
+from . import json_codec, metrics, shards, write_queue
 from .constants import DEFAULT_PREFERENCES, DEFAULT_WEEKLY_GOALS, NUTRIENT_KEYS
 from .schemas import MealLogRequest, PreferencesPayload
 
 
 DB_PATH = Path(__file__).resolve().parent / "nutrition.db"
 
+logger = logging.getLogger("database")
+
+ChangeListener = Callable[[str, Dict[str, object]], None]
+_change_listeners: List[ChangeListener] = []
+
+
+def add_change_listener(listener: ChangeListener) -> None:
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+
+
+def remove_change_listener(listener: ChangeListener) -> None:
+    if listener in _change_listeners:
+        _change_listeners.remove(listener)
+
+
+def _emit_change(event: str, payload: Dict[str, object]) -> None:
+    # Listeners run after the write committed; a failing listener must never fail the write.
+    user_id = shards.current_user()
+    if user_id is not None:
+        payload = {**payload, "user_id": user_id}
+    for listener in list(_change_listeners):
+        try:
+            listener(event, payload)
+        except Exception:
+            logger.exception("Change listener failed for %s", event)
+
+
+class _MeteredCursor(sqlite3.Cursor):
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            metrics.count_rows_read(1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = super().fetchmany(*args, **kwargs)
+        metrics.count_rows_read(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        metrics.count_rows_read(len(rows))
+        return rows
+
+
+class _MeteredConnection(sqlite3.Connection):
+    """Connection that tallies fetched and changed rows for ``/metrics``."""
+
+    # ``Connection.execute`` builds its cursor in C without calling
+    # ``self.cursor()``, so the shortcuts are routed through it here.
+    def cursor(self, factory=_MeteredCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        cursor = self.cursor().execute(sql, parameters)
+        if cursor.rowcount > 0:
+            # ``rowcount`` leaves out trigger writes such as the FTS shadow tables.
+            metrics.count_rows_written(cursor.rowcount)
+        return cursor
+
+    def executemany(self, sql, parameters):
+        cursor = self.cursor().executemany(sql, parameters)
+        if cursor.rowcount > 0:
+            metrics.count_rows_written(cursor.rowcount)
+        return cursor
+
+
+_ready_shards: Set[Path] = set()
+_ready_shards_lock = threading.Lock()
+# Forgetting which shards have their schema only costs a re-check.
+MAX_READY_SHARDS = 10_000
+
+
+def shard_dir() -> Path:
+    path = Path(DB_PATH)
+    return path.with_name(f"{path.stem}-users")
+
+
+def shard_path(user_id: str) -> Path:
+    return shard_dir() / f"{user_id}.db"
+
+
+def db_path() -> Path:
+    """The database file for the current user scope, created on first use."""
+    user_id = shards.current_user()
+    if user_id is None:
+        return Path(DB_PATH)
+    path = shard_path(user_id)
+    if path not in _ready_shards:
+        with _ready_shards_lock:
+            if path not in _ready_shards:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                _init_db(path)
+                if len(_ready_shards) >= MAX_READY_SHARDS:
+                    _ready_shards.clear()
+                _ready_shards.add(path)
+    return path
+
+
+def iter_shards(after: Optional[str] = None) -> Iterator[str]:
+    """User ids that have a shard file, in sorted order, starting past ``after``."""
+    directory = shard_dir()
+    if not directory.is_dir():
+        return
+    for path in sorted(directory.glob("*.db")):
+        if shards.valid_user_id(path.stem) and (after is None or path.stem > after):
+            yield path.stem
+
+
+def for_each_shard(
+    fn: Callable[[], object], include_default: bool = True, after: Optional[str] = None
+) -> Iterator[Tuple[Optional[str], object]]:
+    """Run ``fn`` inside each user's scope (and ``DB_PATH``'s) and yield the results.
+
+    The admin path across shards: archival, backups or reports call the
+    ordinary ``database.py`` functions from ``fn`` and get one shard each time.
+    """
+    if include_default and after is None:
+        with shards.user_scope(None):
+            yield None, fn()
+    for user_id in iter_shards(after):
+        with shards.user_scope(user_id):
+            yield user_id, fn()
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    factory = _MeteredConnection if metrics.ENABLED else sqlite3.Connection
+    conn = sqlite3.connect(path, factory=factory)
+    conn.row_factory = sqlite3.Row
+    return conn
+
 
 def _get_connection() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+    return _connect(db_path())
+
+
+def _get_read_connection() -> sqlite3.Connection:
+    """Read-only connection for queries that never write."""
+    factory = _MeteredConnection if metrics.ENABLED else sqlite3.Connection
+    conn = sqlite3.connect(f"{db_path().resolve().as_uri()}?mode=ro", uri=True, factory=factory)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+def _write(sql: str, params: Tuple[object, ...]) -> write_queue.WriteResult:
+    """Run one write statement, through the group-commit writer when enabled."""
+    path = db_path()
+    if write_queue.ENABLED:
+        # ``connect`` runs on the writer thread, outside the caller's user scope.
+        result = write_queue.execute(path, partial(_connect, path), sql, params)
+        # The writer thread has no call context; the rows count against the caller.
+        metrics.count_rows_written(max(result.rowcount, 0))
+        return result
+    conn = _connect(path)
+    try:
+        cursor = conn.execute(sql, params)
+        conn.commit()
+        return write_queue.WriteResult(cursor.lastrowid, cursor.rowcount)
+    finally:
+        conn.close()
+
+
+def run_with_writer(fn: write_queue.Task) -> object:
+    """Run ``fn(conn, pump)`` on the connection that commits meal-log writes.
+
+    With the write queue off, ``fn`` gets a fresh connection and ``pump``
+    just sleeps.
+    """
+    path = db_path()
+    if write_queue.ENABLED:
+        return write_queue.run(path, partial(_connect, path), fn)
+    conn = _connect(path)
+    try:
+        return fn(conn, time.sleep)
+    finally:
+        conn.close()
+
+
+def _in_transaction(conn: sqlite3.Connection, fn: Callable[[], object]) -> object:
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = fn()
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return result
+
+
 def init_db() -> None:
-    conn = _get_connection()
+    _init_db(db_path())
+
+
+def _init_db(path: Path) -> None:
+    conn = _connect(path)
     try:
+        # WAL lets readers carry on while the writer commits.
+        conn.execute("PRAGMA journal_mode = WAL")
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS meal_logs (
@@ -80,6 +274,161 @@ def init_db() -> None:
             )
             """
         )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS meal_plans (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                week_start TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                plan TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_meal_plans_week
+            ON meal_plans (week_start, fingerprint, id)
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS plan_cache (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                signature TEXT NOT NULL,
+                lunch TEXT NOT NULL,
+                dinner TEXT NOT NULL,
+                served INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_plan_cache_signature
+            ON plan_cache (signature, created_at)
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_until TEXT,
+                run_after TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_jobs_status
+            ON jobs (status, run_after, created_at)
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                status TEXT NOT NULL,
+                status_code INTEGER,
+                content_type TEXT,
+                body BLOB,
+                locked_at TEXT NOT NULL,
+                expires_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_meal_logs_date ON meal_logs (meal_date)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS meal_log_partitions (
+                month TEXT PRIMARY KEY,
+                file TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                min_id INTEGER,
+                max_id INTEGER,
+                min_date TEXT,
+                max_date TEXT,
+                archived_before TEXT NOT NULL,
+                archived_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_meal_log_partitions_max_date ON meal_log_partitions (max_date)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS meal_log_daily (
+                meal_date TEXT PRIMARY KEY,
+                meals INTEGER NOT NULL,
+                calories REAL NOT NULL,
+                nutrition TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS user_meal_fingerprints (
+                meal_id INTEGER PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                entity TEXT NOT NULL,
+                entity_id INTEGER NOT NULL,
+                op TEXT NOT NULL,
+                changed_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS change_log_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                floor_seq INTEGER NOT NULL,
+                compacted_at TEXT
+            )
+            """
+        )
+        conn.execute("INSERT OR IGNORE INTO change_log_state (id, floor_seq) VALUES (1, 0)")
+        # Start the sequence at 1 so a sync cursor of 0 always means "no cursor yet".
+        conn.execute(
+            """
+            INSERT INTO sqlite_sequence (name, seq)
+            SELECT 'change_log', 1
+            WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'change_log')
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS food_composition (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                aliases TEXT NOT NULL,
+                unit_grams REAL,
+                cup_grams REAL,
+                nutrition TEXT NOT NULL
+            )
+            """
+        )
         conn.commit()
         # Ensure legacy databases gain new columns
         for column, definition in {
@@ -91,10 +440,111 @@ def init_db() -> None:
                 conn.commit()
             except sqlite3.OperationalError:
                 pass
+        _ensure_change_triggers(conn)
+        try:
+            _ensure_search_index(conn)
+        except sqlite3.OperationalError:
+            logger.warning("SQLite was built without FTS5; /api/search is unavailable")
     finally:
         conn.close()
 
 
+# External-content FTS5 tables: the text lives only in the base tables and the
+# triggers below keep the inverted index in step with every insert/update/delete.
+SEARCH_INDEXES = {
+    "meal_logs_fts": {
+        "table": "meal_logs",
+        "columns": ("meal_name", "notes"),
+    },
+    "user_meals_fts": {
+        "table": "user_meals",
+        "columns": ("name", "description", "ingredients", "tags"),
+    },
+}
+
+
+def _ensure_search_index(conn: sqlite3.Connection) -> None:
+    for name, spec in SEARCH_INDEXES.items():
+        _create_search_index(conn, "main", name, spec["table"], spec["columns"])
+    conn.commit()
+
+
+def _create_search_index(
+    conn: sqlite3.Connection, schema: str, name: str, table: str, columns_spec: Tuple[str, ...]
+) -> None:
+    """FTS5 table ``schema.name`` over ``table`` in the same file, built from its rows if new."""
+    exists = conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    columns = ", ".join(columns_spec)
+    new_values = ", ".join(f"new.{column}" for column in columns_spec)
+    old_values = ", ".join(f"old.{column}" for column in columns_spec)
+    conn.execute(
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.{name} USING fts5(
+            {columns},
+            content='{table}',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3 4 5'
+        )
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {schema}.{name}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {name} (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {schema}.{name}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {name} ({name}, rowid, {columns})
+            VALUES ('delete', old.id, {old_values});
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {schema}.{name}_update AFTER UPDATE OF {columns} ON {table} BEGIN
+            INSERT INTO {name} ({name}, rowid, {columns})
+            VALUES ('delete', old.id, {old_values});
+            INSERT INTO {name} (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+        """
+    )
+    if not exists:
+        conn.execute(f"INSERT INTO {schema}.{name} ({name}) VALUES ('rebuild')")
+
+
+# Every mutation ``/api/sync`` reports, recorded by triggers in the same
+# transaction as the write itself: ``(table, event, entity, id, op)``.
+# Preferences are a single record, so their entity id is always 0.
+CHANGE_TRIGGERS = (
+    ("meal_logs", "INSERT", "meal_log", "new.id", "upsert"),
+    ("meal_logs", "UPDATE", "meal_log", "new.id", "upsert"),
+    ("meal_logs", "DELETE", "meal_log", "old.id", "delete"),
+    ("user_preferences", "INSERT", "preferences", "0", "upsert"),
+    ("user_meals", "INSERT", "custom_meal", "new.id", "upsert"),
+)
+# Same shape as ``datetime.utcnow().isoformat()``, so the two compare as text.
+CHANGED_AT_SQL = "strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+
+
+def _ensure_change_triggers(conn: sqlite3.Connection) -> None:
+    for table, event, entity, entity_id, op in CHANGE_TRIGGERS:
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_change_{event.lower()} AFTER {event} ON {table} BEGIN
+                INSERT INTO change_log (entity, entity_id, op, changed_at)
+                VALUES ('{entity}', {entity_id}, '{op}', {CHANGED_AT_SQL});
+            END
+            """
+        )
+    conn.commit()
+
+
 def get_week_start(reference: Optional[date] = None) -> date:
     today = reference or date.today()
     weekday = today.weekday()  # Monday = 0
@@ -102,301 +552,1522 @@ def get_week_start(reference: Optional[date] = None) -> date:
 
 
 def ensure_weekly_goal(week_start: date) -> Dict[str, float]:
-    conn = _get_connection()
+    conn = _get_read_connection()
     try:
-        row = conn.execute(
-            "SELECT data FROM nutrition_goals WHERE week_start = ?",
-            (week_start.isoformat(),),
-        ).fetchone()
-        if row:
-            return json.loads(row["data"])
-
-        payload = json.dumps(DEFAULT_WEEKLY_GOALS)
-        conn.execute(
-            """
-            INSERT INTO nutrition_goals (week_start, data, created_at)
-            VALUES (?, ?, ?)
-            """,
-            (week_start.isoformat(), payload, datetime.utcnow().isoformat()),
-        )
-        conn.commit()
-        return DEFAULT_WEEKLY_GOALS.copy()
+        goals = _weekly_goal(conn, week_start)
     finally:
         conn.close()
+    if goals is not None:
+        return goals
+    # OR IGNORE: a concurrent request may have seeded the week first.
+    _write(
+        """
+        INSERT OR IGNORE INTO nutrition_goals (week_start, data, created_at)
+        VALUES (?, ?, ?)
+        """,
+        (week_start.isoformat(), json_codec.dumps(DEFAULT_WEEKLY_GOALS), datetime.utcnow().isoformat()),
+    )
+    return DEFAULT_WEEKLY_GOALS.copy()
+
+
+def _weekly_goal(conn: sqlite3.Connection, week_start: date) -> Optional[Dict[str, float]]:
+    row = conn.execute(
+        "SELECT data FROM nutrition_goals WHERE week_start = ?",
+        (week_start.isoformat(),),
+    ).fetchone()
+    return json_codec.loads(row["data"]) if row else None
 
 
 def save_preferences(payload: PreferencesPayload) -> Dict[str, object]:
-    conn = _get_connection()
-    try:
-        conn.execute(
-            """
-            INSERT INTO user_preferences (
-                preferred_ingredients,
-                dietary_restrictions,
-                cooking_time_preference,
-                meal_complexity,
-                updated_at
-            ) VALUES (?, ?, ?, ?, ?)
-            """,
-            (
-                json.dumps(payload.preferred_ingredients),
-                json.dumps(payload.dietary_restrictions),
-                payload.cooking_time_preference,
-                payload.meal_complexity,
-                datetime.utcnow().isoformat(),
-            ),
-        )
-        conn.commit()
-    finally:
-        conn.close()
-    return get_preferences()
+    _write(
+        """
+        INSERT INTO user_preferences (
+            preferred_ingredients,
+            dietary_restrictions,
+            cooking_time_preference,
+            meal_complexity,
+            updated_at
+        ) VALUES (?, ?, ?, ?, ?)
+        """,
+        (
+            json_codec.dumps(payload.preferred_ingredients),
+            json_codec.dumps(payload.dietary_restrictions),
+            payload.cooking_time_preference,
+            payload.meal_complexity,
+            datetime.utcnow().isoformat(),
+        ),
+    )
+    preferences = get_preferences()
+    _emit_change("preferences_saved", {"preferences": preferences})
+    return preferences
 
 
 def get_preferences() -> Dict[str, object]:
     conn = _get_connection()
     try:
-        row = conn.execute(
-            "SELECT * FROM user_preferences ORDER BY updated_at DESC LIMIT 1"
-        ).fetchone()
-        if not row:
-            return DEFAULT_PREFERENCES.copy()
-        return {
-            "preferred_ingredients": json.loads(row["preferred_ingredients"]),
-            "dietary_restrictions": json.loads(row["dietary_restrictions"]),
-            "cooking_time_preference": row["cooking_time_preference"],
-            "meal_complexity": row["meal_complexity"],
-        }
+        return _get_preferences(conn)
     finally:
         conn.close()
 
 
+def _get_preferences(conn: sqlite3.Connection) -> Dict[str, object]:
+    row = conn.execute(
+        "SELECT * FROM user_preferences ORDER BY updated_at DESC LIMIT 1"
+    ).fetchone()
+    if not row:
+        return DEFAULT_PREFERENCES.copy()
+    return {
+        "preferred_ingredients": json_codec.loads(row["preferred_ingredients"]),
+        "dietary_restrictions": json_codec.loads(row["dietary_restrictions"]),
+        "cooking_time_preference": row["cooking_time_preference"],
+        "meal_complexity": row["meal_complexity"],
+    }
+
+
+INSERT_MEAL_LOG_SQL = """
+    INSERT INTO meal_logs (
+        meal_name,
+        meal_type,
+        calories,
+        nutrition,
+        meal_date,
+        meal_time,
+        was_suggested,
+        created_at,
+        notes,
+        override_nutrition
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
 def log_meal(payload: MealLogRequest) -> int:
+    params, meal_date = _meal_log_params(payload)
+    record_id = _write(INSERT_MEAL_LOG_SQL, params).lastrowid
+    _emit_change("meal_logged", {"id": record_id, "meal_date": meal_date})
+    return record_id
+
+
+def _meal_log_params(payload: MealLogRequest) -> Tuple[Tuple[object, ...], str]:
     meal_date = (payload.meal_date or date.today()).isoformat()
     meal_time = payload.meal_time or datetime.now().strftime("%H:%M")
     nutrition = payload.nutrition.copy()
     nutrition.setdefault("calories", payload.calories)
+    params = (
+        payload.meal_name,
+        payload.meal_type,
+        float(payload.calories),
+        json_codec.dumps(nutrition),
+        meal_date,
+        meal_time,
+        int(payload.was_suggested),
+        datetime.utcnow().isoformat(),
+        payload.notes,
+        None,
+    )
+    return params, meal_date
 
-    conn = _get_connection()
-    try:
-        cursor = conn.execute(
-            """
-            INSERT INTO meal_logs (
-                meal_name,
-                meal_type,
-                calories,
-                nutrition,
-                meal_date,
-                meal_time,
-                was_suggested,
-                created_at,
-                notes,
-                override_nutrition
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                payload.meal_name,
-                payload.meal_type,
-                float(payload.calories),
-                json.dumps(nutrition),
-                meal_date,
-                meal_time,
-                int(payload.was_suggested),
-                datetime.utcnow().isoformat(),
-                payload.notes,
-                None,
-            ),
-        )
-        conn.commit()
-        return cursor.lastrowid
-    finally:
-        conn.close()
+
+def _insert_meal_log(conn: sqlite3.Connection, payload: MealLogRequest) -> Tuple[int, str]:
+    params, meal_date = _meal_log_params(payload)
+    cursor = conn.execute(INSERT_MEAL_LOG_SQL, params)
+    return cursor.lastrowid, meal_date
 
 
 def fetch_recent_meals(limit: int, days: int, offset: int = 0) -> List[Dict[str, object]]:
-    since = date.today() - timedelta(days=days)
-    conn = _get_connection()
+    conn = _get_read_connection()
     try:
-        rows = conn.execute(
-            """
-            SELECT
-                id,
-                meal_name,
-                meal_type,
-                calories,
-                meal_time,
-                meal_date,
-                nutrition,
-                override_nutrition,
-                notes
-            FROM meal_logs
-            WHERE meal_date >= ?
-            ORDER BY meal_date DESC, meal_time DESC
-            LIMIT ? OFFSET ?
-            """,
-            (since.isoformat(), limit, offset),
-        ).fetchall()
-        return [dict(row) for row in rows]
+        return _fetch_recent_meals(conn, limit, days, offset)
     finally:
         conn.close()
 
 
+RECENT_MEAL_COLUMNS = (
+    "id, meal_name, meal_type, calories, meal_time, meal_date, nutrition, override_nutrition, notes"
+)
+
+
+def _fetch_recent_meals(
+    conn: sqlite3.Connection, limit: int, days: int, offset: int
+) -> List[Dict[str, object]]:
+    since = (date.today() - timedelta(days=days)).isoformat()
+    partitions = _partitions_since(conn, since)
+    if partitions:
+        return _union_history(conn, RECENT_MEAL_COLUMNS, since, partitions, limit, offset)
+    rows = conn.execute(
+        f"""
+        SELECT {RECENT_MEAL_COLUMNS}
+        FROM meal_logs
+        WHERE meal_date >= ?
+        ORDER BY meal_date DESC, meal_time DESC
+        LIMIT ? OFFSET ?
+        """,
+        (since, limit, offset),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
 def save_custom_meal(
     recipe: Dict[str, object], source_payload: Dict[str, object]
 ) -> Dict[str, object]:
-    conn = _get_connection()
+    inserted_id = _write(
+        """
+        INSERT INTO user_meals (
+            name,
+            description,
+            meal_type,
+            cooking_time,
+            ingredients,
+            instructions,
+            tags,
+            nutrition,
+            source_payload,
+            created_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            recipe.get("name"),
+            recipe.get("description", ""),
+            recipe.get("meal_type") or source_payload.get("meal_type", "meal"),
+            int(recipe.get("prepTime") or source_payload.get("cooking_time", 30)),
+            json_codec.dumps(recipe.get("ingredients", [])),
+            json_codec.dumps(recipe.get("instructions", [])),
+            json_codec.dumps(recipe.get("tags", [])),
+            json_codec.dumps(recipe.get("nutrition", {})),
+            json_codec.dumps(source_payload),
+            datetime.utcnow().isoformat(),
+        ),
+    ).lastrowid
+    conn = _get_read_connection()
     try:
-        cursor = conn.execute(
-            """
-            INSERT INTO user_meals (
-                name,
-                description,
-                meal_type,
-                cooking_time,
-                ingredients,
-                instructions,
-                tags,
-                nutrition,
-                source_payload,
-                created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                recipe.get("name"),
-                recipe.get("description", ""),
-                recipe.get("meal_type") or source_payload.get("meal_type", "meal"),
-                int(recipe.get("prepTime") or source_payload.get("cooking_time", 30)),
-                json.dumps(recipe.get("ingredients", [])),
-                json.dumps(recipe.get("instructions", [])),
-                json.dumps(recipe.get("tags", [])),
-                json.dumps(recipe.get("nutrition", {})),
-                json.dumps(source_payload),
-                datetime.utcnow().isoformat(),
-            ),
-        )
-        conn.commit()
-        inserted_id = cursor.lastrowid
         row = conn.execute(
             "SELECT * FROM user_meals WHERE id = ?", (inserted_id,)
         ).fetchone()
-        return dict(row)
+        stored = dict(row)
     finally:
         conn.close()
+    _emit_change("custom_meal_saved", {"id": inserted_id})
+    return stored
+
+
+def _decode_custom_meal(row: sqlite3.Row) -> Dict[str, object]:
+    entry = dict(row)
+    for key in ("ingredients", "instructions", "tags"):
+        try:
+            entry[key] = json_codec.loads(entry[key]) if entry.get(key) else []
+        except json.JSONDecodeError:
+            entry[key] = []
+    try:
+        entry["nutrition"] = json_codec.loads(entry["nutrition"]) if entry.get("nutrition") else {}
+    except json.JSONDecodeError:
+        entry["nutrition"] = {}
+    return entry
+
 
+CUSTOM_MEAL_COLUMNS = "id, name, description, meal_type, cooking_time, ingredients, instructions, tags, nutrition"
 
-def list_custom_meals(limit: int = 10) -> List[Dict[str, object]]:
+
+def list_custom_meals(limit: Optional[int] = 10, offset: int = 0) -> List[Dict[str, object]]:
     conn = _get_connection()
     try:
         rows = conn.execute(
-            """
-            SELECT id, name, description, meal_type, cooking_time, ingredients, instructions, tags, nutrition
+            f"""
+            SELECT {CUSTOM_MEAL_COLUMNS}
             FROM user_meals
-            ORDER BY created_at DESC
-            LIMIT ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT ? OFFSET ?
             """,
-            (limit,),
+            (limit if limit is not None else -1, offset),
         ).fetchall()
-        meals: List[Dict[str, object]] = []
-        for row in rows:
-            entry = dict(row)
-            for key in ("ingredients", "instructions", "tags"):
-                try:
-                    entry[key] = json.loads(entry[key]) if entry.get(key) else []
-                except json.JSONDecodeError:
-                    entry[key] = []
-            try:
-                entry["nutrition"] = (
-                    json.loads(entry["nutrition"]) if entry.get("nutrition") else {}
-                )
-            except json.JSONDecodeError:
-                entry["nutrition"] = {}
-            meals.append(entry)
-        return meals
+        return [_decode_custom_meal(row) for row in rows]
     finally:
         conn.close()
 
 
-def get_weekly_logs(week_start: date) -> List[Dict[str, object]]:
-    conn = _get_connection()
+def latest_custom_meal_id() -> int:
+    conn = _get_read_connection()
+    try:
+        return int(conn.execute("SELECT COALESCE(MAX(id), 0) FROM user_meals").fetchone()[0])
+    finally:
+        conn.close()
+
+
+def list_custom_meals_after(
+    after_id: int, up_to_id: int, limit: Optional[int] = None
+) -> Tuple[int, List[Dict[str, object]]]:
+    """Count the meals with ids in ``(after_id, up_to_id]`` and return the newest ``limit`` of them.
+
+    Rows keep ``created_at`` so callers can merge them into a list in
+    ``list_custom_meals`` order.
+    """
+    conn = _get_read_connection()
     try:
+        total = conn.execute(
+            "SELECT COUNT(*) FROM user_meals WHERE id > ? AND id <= ?", (after_id, up_to_id)
+        ).fetchone()[0]
         rows = conn.execute(
-            """
-            SELECT meal_name, meal_type, calories, nutrition, override_nutrition, meal_date, meal_time, was_suggested
-            FROM meal_logs
-            WHERE meal_date >= ?
+            f"""
+            SELECT {CUSTOM_MEAL_COLUMNS}, created_at
+            FROM user_meals
+            WHERE id > ? AND id <= ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
             """,
-            (week_start.isoformat(),),
+            (after_id, up_to_id, limit if limit is not None else -1),
         ).fetchall()
-        return [dict(row) for row in rows]
+        return int(total), [_decode_custom_meal(row) for row in rows]
     finally:
         conn.close()
 
 
-def fetch_meal_log_by_id(log_id: int) -> Optional[Dict[str, object]]:
+def get_custom_meal(meal_id: int) -> Optional[Dict[str, object]]:
     conn = _get_connection()
     try:
         row = conn.execute(
             """
-            SELECT
-                id,
-                meal_name,
-                meal_type,
-                calories,
-                nutrition,
-                override_nutrition,
-                meal_date,
-                meal_time,
-                notes,
-                was_suggested
-            FROM meal_logs
+            SELECT id, name, description, meal_type, cooking_time, ingredients, instructions, tags, nutrition, created_at
+            FROM user_meals
             WHERE id = ?
             """,
-            (log_id,),
+            (meal_id,),
         ).fetchone()
-        if not row:
-            return None
-        entry = dict(row)
-        entry["nutrition"] = json.loads(entry.get("nutrition") or "{}")
-        entry["override_nutrition"] = (
-            json.loads(entry["override_nutrition"])
-            if entry.get("override_nutrition")
-            else None
-        )
-        return entry
+        return _decode_custom_meal(row) if row else None
     finally:
         conn.close()
 
 
-def update_meal_override(log_id: int, overrides: Dict[str, float]) -> Optional[Dict[str, object]]:
+def list_meal_fingerprints(after_id: int = 0) -> List[Tuple[int, Dict[str, object]]]:
     conn = _get_connection()
     try:
-        override_json = json.dumps(overrides) if overrides else None
-        result = conn.execute(
+        rows = conn.execute(
             """
-            UPDATE meal_logs
-            SET override_nutrition = ?
-            WHERE id = ?
+            SELECT meal_id, fingerprint FROM user_meal_fingerprints
+            WHERE meal_id > ?
+            ORDER BY meal_id
             """,
-            (override_json, log_id),
+            (after_id,),
+        ).fetchall()
+        return [(int(row["meal_id"]), json_codec.loads(row["fingerprint"])) for row in rows]
+    finally:
+        conn.close()
+
+
+def list_unfingerprinted_meals() -> List[Dict[str, object]]:
+    conn = _get_connection()
+    try:
+        rows = conn.execute(
+            """
+            SELECT u.id, u.name, u.ingredients, u.tags, u.source_payload
+            FROM user_meals AS u
+            LEFT JOIN user_meal_fingerprints AS f ON f.meal_id = u.id
+            WHERE f.meal_id IS NULL
+            ORDER BY u.id
+            """
+        ).fetchall()
+        meals: List[Dict[str, object]] = []
+        for row in rows:
+            entry = dict(row)
+            for key, default in (("ingredients", []), ("tags", []), ("source_payload", {})):
+                try:
+                    entry[key] = json_codec.loads(entry[key]) if entry.get(key) else default
+                except json.JSONDecodeError:
+                    entry[key] = default
+            meals.append(entry)
+        return meals
+    finally:
+        conn.close()
+
+
+def save_meal_fingerprints(fingerprints: List[Tuple[int, Dict[str, object]]]) -> None:
+    now = datetime.utcnow().isoformat()
+    rows = [(meal_id, json_codec.dumps(fingerprint), now) for meal_id, fingerprint in fingerprints]
+
+    def save(conn: sqlite3.Connection, pump: Callable[[float], None]) -> None:
+        _in_transaction(
+            conn,
+            lambda: conn.executemany(
+                """
+                INSERT INTO user_meal_fingerprints (meal_id, fingerprint, updated_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(meal_id) DO UPDATE SET
+                    fingerprint = excluded.fingerprint,
+                    updated_at = excluded.updated_at
+                """,
+                rows,
+            ),
         )
-        conn.commit()
-        if result.rowcount == 0:
+
+    run_with_writer(save)
+
+
+def custom_meal_library_version() -> Tuple[int, int]:
+    conn = _get_connection()
+    try:
+        row = conn.execute(
+            "SELECT COUNT(*) AS total, COALESCE(MAX(id), 0) AS last_id FROM user_meals"
+        ).fetchone()
+        return int(row["total"]), int(row["last_id"])
+    finally:
+        conn.close()
+
+
+def save_meal_plan(
+    week_start: date, fingerprint: str, plan: Dict[str, object]
+) -> int:
+    return _write(
+        """
+        INSERT INTO meal_plans (week_start, fingerprint, plan, created_at)
+        VALUES (?, ?, ?, ?)
+        """,
+        (
+            week_start.isoformat(),
+            fingerprint,
+            json_codec.dumps(plan),
+            datetime.utcnow().isoformat(),
+        ),
+    ).lastrowid
+
+
+def get_latest_meal_plan(
+    week_start: date, fingerprint: str
+) -> Optional[Dict[str, object]]:
+    conn = _get_connection()
+    try:
+        row = conn.execute(
+            """
+            SELECT id, plan, created_at
+            FROM meal_plans
+            WHERE week_start = ? AND fingerprint = ?
+            ORDER BY id DESC
+            LIMIT 1
+            """,
+            (week_start.isoformat(), fingerprint),
+        ).fetchone()
+        if not row:
+            return None
+        try:
+            plan = json_codec.loads(row["plan"])
+        except json.JSONDecodeError:
             return None
-        return fetch_meal_log_by_id(log_id)
+        plan["plan_id"] = row["id"]
+        plan["created_at"] = row["created_at"]
+        return plan
     finally:
         conn.close()
 
 
-def delete_meal_log(log_id: int) -> bool:
+def get_plan_cache_variants(signature: str, since: datetime) -> List[Dict[str, object]]:
+    conn = _get_connection()
+    try:
+        rows = conn.execute(
+            """
+            SELECT id, lunch, dinner, served, created_at
+            FROM plan_cache
+            WHERE signature = ? AND created_at >= ?
+            ORDER BY served ASC, id ASC
+            """,
+            (signature, since.isoformat()),
+        ).fetchall()
+        variants: List[Dict[str, object]] = []
+        for row in rows:
+            entry = dict(row)
+            try:
+                entry["lunch"] = json_codec.loads(entry["lunch"])
+                entry["dinner"] = json_codec.loads(entry["dinner"])
+            except json.JSONDecodeError:
+                continue
+            variants.append(entry)
+        return variants
+    finally:
+        conn.close()
+
+
+def add_plan_cache_variant(
+    signature: str, lunch: Dict[str, object], dinner: Dict[str, object]
+) -> int:
+    return _write(
+        """
+        INSERT INTO plan_cache (signature, lunch, dinner, served, created_at)
+        VALUES (?, ?, ?, 0, ?)
+        """,
+        (signature, json_codec.dumps(lunch), json_codec.dumps(dinner), datetime.utcnow().isoformat()),
+    ).lastrowid
+
+
+def mark_plan_cache_served(variant_id: int) -> None:
+    _write("UPDATE plan_cache SET served = served + 1 WHERE id = ?", (variant_id,))
+
+
+def prune_plan_cache(before: datetime) -> int:
+    return _write("DELETE FROM plan_cache WHERE created_at < ?", (before.isoformat(),)).rowcount
+
+
+def plan_cache_summary() -> Dict[str, int]:
+    conn = _get_connection()
+    try:
+        row = conn.execute(
+            """
+            SELECT
+                COUNT(DISTINCT signature) AS buckets,
+                COUNT(*) AS variants,
+                COALESCE(SUM(served), 0) AS served
+            FROM plan_cache
+            """
+        ).fetchone()
+        return {key: int(row[key]) for key in ("buckets", "variants", "served")}
+    finally:
+        conn.close()
+
+
+def _decode_job(row: sqlite3.Row) -> Dict[str, object]:
+    entry = dict(row)
+    for key in ("payload", "result"):
+        try:
+            entry[key] = json_codec.loads(entry[key]) if entry.get(key) else None
+        except json.JSONDecodeError:
+            entry[key] = None
+    return entry
+
+
+def enqueue_job(job_id: str, kind: str, payload: Dict[str, object]) -> Dict[str, object]:
+    now = datetime.utcnow().isoformat()
+    _write(
+        """
+        INSERT INTO jobs (id, kind, payload, status, run_after, created_at, updated_at)
+        VALUES (?, ?, ?, 'queued', ?, ?, ?)
+        """,
+        (job_id, kind, json_codec.dumps(payload), now, now, now),
+    )
+    return get_job(job_id)
+
+
+def get_job(job_id: str) -> Optional[Dict[str, object]]:
+    conn = _get_connection()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _decode_job(row) if row else None
+    finally:
+        conn.close()
+
+
+def database_summary() -> Dict[str, object]:
+    """Size and meal-log count of the current database, for the shard listing."""
+    path = db_path()
+    conn = _get_read_connection()
+    try:
+        row = conn.execute(
+            "SELECT COUNT(*) AS meal_logs, MAX(meal_date) AS last_meal_date FROM meal_logs"
+        ).fetchone()
+    finally:
+        conn.close()
+    return {"file": path.name, "bytes": path.stat().st_size, **dict(row)}
+
+
+def has_unfinished_jobs() -> bool:
+    conn = _get_read_connection()
+    try:
+        row = conn.execute(
+            "SELECT 1 FROM jobs WHERE status IN ('queued', 'running') LIMIT 1"
+        ).fetchone()
+        return row is not None
+    finally:
+        conn.close()
+
+
+def claim_job(worker: str, lease_seconds: float, max_attempts: int) -> Optional[Dict[str, object]]:
+    """Atomically lease the oldest runnable job.
+
+    Jobs left ``running`` by a crashed process become claimable again once
+    their lease expires, unless they have already used ``max_attempts``; those
+    are marked failed instead. The lease is taken on the writer under
+    ``BEGIN IMMEDIATE``, which keeps two workers from leasing the same row.
+    """
+    now = datetime.utcnow()
+    now_iso = now.isoformat()
+
+    def claim(conn: sqlite3.Connection, pump: Callable[[float], None]) -> Optional[str]:
+        def lease() -> Optional[str]:
+            conn.execute(
+                """
+                UPDATE jobs
+                SET status = 'failed',
+                    error = COALESCE(error, 'Lease expired on the last attempt'),
+                    lease_until = NULL,
+                    updated_at = ?
+                WHERE status = 'running' AND lease_until < ? AND attempts >= ?
+                """,
+                (now_iso, now_iso, max_attempts),
+            )
+            row = conn.execute(
+                """
+                SELECT id FROM jobs
+                WHERE (status = 'queued' AND run_after <= ?)
+                   OR (status = 'running' AND lease_until < ? AND attempts < ?)
+                ORDER BY created_at
+                LIMIT 1
+                """,
+                (now_iso, now_iso, max_attempts),
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute(
+                """
+                UPDATE jobs
+                SET status = 'running',
+                    worker = ?,
+                    lease_until = ?,
+                    attempts = attempts + 1,
+                    updated_at = ?
+                WHERE id = ?
+                """,
+                (
+                    worker,
+                    (now + timedelta(seconds=lease_seconds)).isoformat(),
+                    now_iso,
+                    row["id"],
+                ),
+            )
+            return row["id"]
+
+        return _in_transaction(conn, lease)
+
+    job_id = run_with_writer(claim)
+    return get_job(job_id) if job_id is not None else None
+
+
+def complete_job(
+    job_id: str,
+    worker: str,
+    result: Dict[str, object],
+    meal_log: Optional[MealLogRequest] = None,
+) -> Optional[Dict[str, object]]:
+    """Store the result, inserting ``meal_log`` in the same transaction.
+
+    Returns ``None`` when this worker no longer holds the lease, so a job that
+    was reclaimed after a stall never logs its meal twice.
+    """
+    result = dict(result)
+    logged: Optional[Tuple[int, str]] = None
+
+    def complete(conn: sqlite3.Connection, pump: Callable[[float], None]) -> bool:
+        def store() -> bool:
+            nonlocal logged
+            owner = conn.execute(
+                "SELECT worker, status FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if not owner or owner["worker"] != worker or owner["status"] != "running":
+                return False
+            if meal_log is not None:
+                logged = _insert_meal_log(conn, meal_log)
+                result["id"] = logged[0]
+            conn.execute(
+                """
+                UPDATE jobs
+                SET status = 'succeeded', result = ?, error = NULL, lease_until = NULL, updated_at = ?
+                WHERE id = ?
+                """,
+                (json_codec.dumps(result), datetime.utcnow().isoformat(), job_id),
+            )
+            return True
+
+        return _in_transaction(conn, store)
+
+    if not run_with_writer(complete):
+        return None
+    if logged is not None:
+        _emit_change("meal_logged", {"id": logged[0], "meal_date": logged[1]})
+    return result
+
+
+def fail_job(
+    job_id: str, worker: str, error: str, retry_at: Optional[datetime] = None
+) -> None:
+    _write(
+        """
+        UPDATE jobs
+        SET status = ?, error = ?, run_after = COALESCE(?, run_after),
+            lease_until = NULL, updated_at = ?
+        WHERE id = ? AND worker = ? AND status = 'running'
+        """,
+        (
+            "queued" if retry_at else "failed",
+            error,
+            retry_at.isoformat() if retry_at else None,
+            datetime.utcnow().isoformat(),
+            job_id,
+            worker,
+        ),
+    )
+
+
+def claim_idempotency_key(
+    key: str, fingerprint: str, expires_at: datetime, stale_before: datetime
+) -> Optional[Dict[str, object]]:
+    """Reserve ``key`` for this request, or return the row that already holds it.
+
+    Expired rows and in-progress rows locked before ``stale_before`` (left by a
+    crashed process) are replaced rather than returned.
+    """
+    now = datetime.utcnow()
+
+    def claim(conn: sqlite3.Connection, pump: Callable[[float], None]) -> Optional[Dict[str, object]]:
+        def reserve() -> Optional[Dict[str, object]]:
+            row = conn.execute(
+                "SELECT * FROM idempotency_keys WHERE key = ?", (key,)
+            ).fetchone()
+            if row and (
+                row["expires_at"] < now.isoformat()
+                or (row["status"] == "in_progress" and row["locked_at"] < stale_before.isoformat())
+            ):
+                conn.execute("DELETE FROM idempotency_keys WHERE key = ?", (key,))
+                row = None
+            if row:
+                return dict(row)
+            conn.execute(
+                """
+                INSERT INTO idempotency_keys (key, fingerprint, status, locked_at, expires_at)
+                VALUES (?, ?, 'in_progress', ?, ?)
+                """,
+                (key, fingerprint, now.isoformat(), expires_at.isoformat()),
+            )
+            return None
+
+        return _in_transaction(conn, reserve)
+
+    return run_with_writer(claim)
+
+
+def get_idempotency_key(key: str) -> Optional[Dict[str, object]]:
+    conn = _get_connection()
+    try:
+        row = conn.execute(
+            "SELECT * FROM idempotency_keys WHERE key = ?", (key,)
+        ).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def complete_idempotency_key(
+    key: str, status_code: int, content_type: Optional[str], body: bytes
+) -> None:
+    _write(
+        """
+        UPDATE idempotency_keys
+        SET status = 'completed', status_code = ?, content_type = ?, body = ?
+        WHERE key = ?
+        """,
+        (status_code, content_type, body, key),
+    )
+
+
+def release_idempotency_key(key: str) -> None:
+    _write("DELETE FROM idempotency_keys WHERE key = ? AND status = 'in_progress'", (key,))
+
+
+def purge_idempotency_keys() -> int:
+    return _write(
+        "DELETE FROM idempotency_keys WHERE expires_at < ?", (datetime.utcnow().isoformat(),)
+    ).rowcount
+
+
+def upsert_food_composition(foods: List[Dict[str, object]]) -> int:
+    """Insert or refresh reference foods keyed by name; values are per 100 g."""
+    rows = [
+        (
+            food["name"],
+            json_codec.dumps(food.get("aliases") or []),
+            food.get("unit_grams"),
+            food.get("cup_grams"),
+            json_codec.dumps(food["nutrition"]),
+        )
+        for food in foods
+    ]
+
+    def upsert(conn: sqlite3.Connection, pump: Callable[[float], None]) -> None:
+        _in_transaction(
+            conn,
+            lambda: conn.executemany(
+                """
+                INSERT INTO food_composition (name, aliases, unit_grams, cup_grams, nutrition)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    aliases = excluded.aliases,
+                    unit_grams = excluded.unit_grams,
+                    cup_grams = excluded.cup_grams,
+                    nutrition = excluded.nutrition
+                """,
+                rows,
+            ),
+        )
+
+    run_with_writer(upsert)
+    return len(foods)
+
+
+def list_food_composition() -> List[Dict[str, object]]:
+    conn = _get_connection()
+    try:
+        rows = conn.execute(
+            """
+            SELECT id, name, aliases, unit_grams, cup_grams, nutrition
+            FROM food_composition
+            ORDER BY id
+            """
+        ).fetchall()
+        foods: List[Dict[str, object]] = []
+        for row in rows:
+            entry = dict(row)
+            entry["aliases"] = json_codec.loads(entry["aliases"]) if entry["aliases"] else []
+            entry["nutrition"] = json_codec.loads(entry["nutrition"])
+            foods.append(entry)
+        return foods
+    finally:
+        conn.close()
+
+
+# Largest date range (in rows) worth turning into an id range for FTS5.
+DATE_PROBE_ROWS = 50_000
+
+
+def _meal_log_id_bounds(
+    conn: sqlite3.Connection,
+    start_date: Optional[date],
+    end_date: Optional[date],
+    probe_limit: int,
+) -> Optional[Tuple[int, int, int]]:
+    """(rows, min id, max id) for a date range, or ``None`` if it spans too many rows.
+
+    Logs are mostly written in date order, so a narrow range maps onto a narrow
+    id range that FTS5 can seek to directly instead of walking every match.
+    """
+    row = conn.execute(
+        """
+        SELECT COUNT(*) AS total, MIN(id) AS low, MAX(id) AS high
+        FROM (
+            SELECT id FROM meal_logs
+            WHERE meal_date >= ? AND meal_date <= ?
+            LIMIT ?
+        )
+        """,
+        (
+            start_date.isoformat() if start_date else "",
+            end_date.isoformat() if end_date else "9999-12-31",
+            probe_limit + 1,
+        ),
+    ).fetchone()
+    if row["total"] > probe_limit:
+        return None
+    return int(row["total"]), row["low"], row["high"]
+
+
+LOG_SEARCH_SQL = """
+    SELECT
+        m.id,
+        m.meal_name,
+        m.meal_type,
+        m.calories,
+        m.meal_date,
+        m.meal_time,
+        m.notes,
+        bm25(f.meal_logs_fts, {weights}) AS rank
+    FROM {schema}.meal_logs_fts AS f
+    CROSS JOIN {schema}.meal_logs AS m ON m.id = f.rowid
+    WHERE f.meal_logs_fts MATCH ?
+    {filters}
+    ORDER BY rank, f.rowid DESC
+    LIMIT ?
+"""
+
+
+def _rank_key(row: Dict[str, object]) -> Tuple[float, int]:
+    # bm25() is negative and lower is better; newer logs win ties.
+    return float(row["rank"]), -int(row["id"])
+
+
+def search_meal_logs(
+    match: str,
+    limit: int,
+    weights: Sequence[float],
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    meal_type: Optional[str] = None,
+) -> List[Dict[str, object]]:
+    """Best ``limit`` meal logs for an FTS5 ``match`` expression, by ``bm25()``.
+
+    ``weights`` are the column weights in ``SEARCH_INDEXES`` order, and
+    each row carries its ``rank`` (lower is better). Archived logs are
+    ranked in each archive partition's own index and merged in by rank.
+    """
+    filters = []
+    params: List[object] = []
+    if start_date is not None:
+        filters.append("AND m.meal_date >= ?")
+        params.append(start_date.isoformat())
+    if end_date is not None:
+        filters.append("AND m.meal_date <= ?")
+        params.append(end_date.isoformat())
+    if meal_type:
+        filters.append("AND m.meal_type = ?")
+        params.append(meal_type)
+    placeholders = ", ".join("?" for _ in weights)
+    rows: List[Dict[str, object]] = []
+    conn = _get_connection()
+    try:
+        main_filters, main_params = filters, params
+        bounds = None
+        if start_date is not None or end_date is not None:
+            bounds = _meal_log_id_bounds(conn, start_date, end_date, DATE_PROBE_ROWS)
+            if bounds is not None:
+                main_filters = ["AND f.rowid BETWEEN ? AND ?", *filters]
+                main_params = [*bounds[1:], *params]
+        if bounds is None or bounds[0]:
+            rows = [
+                dict(row)
+                for row in conn.execute(
+                    LOG_SEARCH_SQL.format(
+                        weights=placeholders, schema="main", filters=" ".join(main_filters)
+                    ),
+                    [*weights, match, *main_params, limit],
+                ).fetchall()
+            ]
+        partitions = conn.execute(
+            """
+            SELECT file, max_id
+            FROM meal_log_partitions
+            WHERE rows > 0 AND max_date >= ? AND min_date <= ?
+            ORDER BY max_id DESC
+            """,
+            (
+                start_date.isoformat() if start_date else "",
+                end_date.isoformat() if end_date else "9999-12-31",
+            ),
+        ).fetchall()
+    finally:
+        conn.close()
+    if partitions:
+        sql = LOG_SEARCH_SQL.format(weights=placeholders, schema="{schema}", filters=" ".join(filters))
+        rows = _search_archived_logs(rows, partitions, sql, [*weights, match, *params, limit], limit)
+    return rows
+
+
+def _search_archived_logs(
+    rows: List[Dict[str, object]],
+    partitions: List[sqlite3.Row],
+    sql: str,
+    params: List[object],
+    limit: int,
+) -> List[Dict[str, object]]:
+    """Merge ``rows`` with ``sql`` run on each of ``partitions``; best ``limit`` by rank.
+
+    A log found in main and in a partition while its month is being
+    archived is kept once.
+    """
+    merged = {int(row["id"]): row for row in rows}
+    conn = _get_read_connection()
+    try:
+        for start in range(0, len(partitions), MAX_ATTACHED_PARTITIONS):
+            attached = _attach_read_only(conn, partitions[start:start + MAX_ATTACHED_PARTITIONS])
+            try:
+                for alias, file in attached:
+                    try:
+                        found = conn.execute(sql.format(schema=alias), params).fetchall()
+                    except sqlite3.OperationalError as exc:
+                        # Not indexed yet; the next archive run adds the index.
+                        logger.warning("Skipping archive partition %s in search: %s", file, exc)
+                        continue
+                    for row in found:
+                        merged.setdefault(int(row["id"]), dict(row))
+            finally:
+                for alias, _ in attached:
+                    conn.execute(f"DETACH DATABASE {alias}")
+    finally:
+        conn.close()
+    return sorted(merged.values(), key=_rank_key)[:limit]
+
+
+def _attach_read_only(conn: sqlite3.Connection, partitions: List[sqlite3.Row]) -> List[Tuple[str, str]]:
+    """Attach ``partitions`` read-only as ``partition_<n>`` after any already attached; ``(alias, file)`` pairs."""
+    attached: List[Tuple[str, str]] = []
+    first = len(_attached_partitions(conn))
+    for partition in partitions:
+        alias = f"partition_{first + len(attached)}"
+        try:
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (_partition_uri(partition["file"]),))
+        except sqlite3.OperationalError as exc:
+            logger.warning("Skipping archive partition %s: %s", partition["file"], exc)
+            continue
+        attached.append((alias, partition["file"]))
+    return attached
+
+
+def search_custom_meals(
+    match: str,
+    limit: int,
+    weights: Sequence[float],
+    meal_type: Optional[str] = None,
+) -> List[Dict[str, object]]:
+    """Best ``limit`` saved recipes for an FTS5 ``match`` expression, by ``bm25()``."""
+    params: List[object] = [*weights, match]
+    type_filter = ""
+    if meal_type:
+        type_filter = "AND (u.meal_type = ? OR u.meal_type = 'meal')"
+        params.append(meal_type)
+    params.append(limit)
+    placeholders = ", ".join("?" for _ in weights)
     conn = _get_connection()
     try:
-        result = conn.execute(
-            "DELETE FROM meal_logs WHERE id = ?",
+        rows = conn.execute(
+            f"""
+            SELECT
+                u.id,
+                u.name,
+                u.description,
+                u.meal_type,
+                u.cooking_time,
+                u.ingredients,
+                u.tags,
+                bm25(f.user_meals_fts, {placeholders}) AS rank
+            FROM user_meals_fts AS f
+            CROSS JOIN user_meals AS u ON u.id = f.rowid
+            WHERE f.user_meals_fts MATCH ?
+            {type_filter}
+            ORDER BY rank, f.rowid DESC
+            LIMIT ?
+            """,
+            params,
+        ).fetchall()
+        results: List[Dict[str, object]] = []
+        for row in rows:
+            entry = dict(row)
+            for key in ("ingredients", "tags"):
+                try:
+                    entry[key] = json_codec.loads(entry[key]) if entry.get(key) else []
+                except json.JSONDecodeError:
+                    entry[key] = []
+            results.append(entry)
+        return results
+    finally:
+        conn.close()
+
+
+def get_weekly_logs(week_start: date) -> List[Dict[str, object]]:
+    conn = _get_read_connection()
+    try:
+        return _get_weekly_logs(conn, week_start)
+    finally:
+        conn.close()
+
+
+WEEKLY_LOG_COLUMNS = (
+    "meal_name, meal_type, calories, nutrition, override_nutrition, meal_date, meal_time, was_suggested"
+)
+
+
+def _get_weekly_logs(conn: sqlite3.Connection, week_start: date) -> List[Dict[str, object]]:
+    since = week_start.isoformat()
+    partitions = _partitions_since(conn, since)
+    if partitions:
+        return _union_history(conn, WEEKLY_LOG_COLUMNS, since, partitions)
+    rows = conn.execute(
+        f"""
+        SELECT {WEEKLY_LOG_COLUMNS}
+        FROM meal_logs
+        WHERE meal_date >= ?
+        """,
+        (since,),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+MEAL_LOG_COLUMNS = (
+    "id, meal_name, meal_type, calories, nutrition, override_nutrition, meal_date, meal_time, notes, was_suggested"
+)
+
+
+def fetch_meal_log_by_id(log_id: int) -> Optional[Dict[str, object]]:
+    conn = _get_read_connection()
+    try:
+        row = conn.execute(
+            f"SELECT {MEAL_LOG_COLUMNS} FROM meal_logs WHERE id = ?",
             (log_id,),
+        ).fetchone()
+        if not row:
+            row = _fetch_archived_log(conn, log_id)
+        return _decode_meal_log(row) if row else None
+    finally:
+        conn.close()
+
+
+def _decode_meal_log(row: sqlite3.Row) -> Dict[str, object]:
+    entry = dict(row)
+    entry["nutrition"] = json_codec.loads(entry.get("nutrition") or "{}")
+    entry["override_nutrition"] = (
+        json_codec.loads(entry["override_nutrition"])
+        if entry.get("override_nutrition")
+        else None
+    )
+    return entry
+
+
+def update_meal_override(log_id: int, overrides: Dict[str, float]) -> Optional[Dict[str, object]]:
+    override_json = json_codec.dumps(overrides) if overrides else None
+    sql = """
+        UPDATE {table}
+        SET override_nutrition = ?
+        WHERE id = ?
+    """
+    result = _write(sql.format(table="meal_logs"), (override_json, log_id))
+    if result.rowcount == 0 and _write_archived_log(log_id, sql, (override_json, log_id), "upsert") is None:
+        return None
+    updated = fetch_meal_log_by_id(log_id)
+    _emit_change(
+        "meal_updated",
+        {"id": log_id, "meal_date": updated.get("meal_date") if updated else None},
+    )
+    return updated
+
+
+def delete_meal_log(log_id: int) -> bool:
+    sql = "DELETE FROM {table} WHERE id = ?"
+    deleted = _write(sql.format(table="meal_logs"), (log_id,)).rowcount > 0
+    if not deleted:
+        deleted = _write_archived_log(log_id, sql, (log_id,), "delete") is not None
+    if deleted:
+        _emit_change("meal_deleted", {"id": log_id})
+    return deleted
+
+
+# Logs older than the archive horizon (see ``backend.archive``) move into one
+# SQLite file per month next to the main database. ``meal_log_partitions``
+# records which months exist and ``meal_log_daily`` keeps per-day totals for
+# archived days, so the main file only holds recent rows and small rollups.
+ARCHIVED_COLUMNS = (
+    "id, meal_name, meal_type, calories, nutrition, meal_date, meal_time, "
+    "was_suggested, created_at, notes, override_nutrition"
+)
+# SQLite attaches at most 10 databases per connection by default.
+MAX_ATTACHED_PARTITIONS = 8
+
+
+def archive_dir(path: Optional[Path] = None) -> Path:
+    """Archive partitions of ``path`` (default: the current database)."""
+    path = path or db_path()
+    return path.with_name(f"{path.stem}-archive")
+
+
+def _partition_file(month: str) -> str:
+    return f"meal_logs_{month.replace('-', '_')}.db"
+
+
+def _partition_uri(file: str) -> str:
+    return f"{(archive_dir() / file).resolve().as_uri()}?mode=ro"
+
+
+def _next_month(month: str) -> str:
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}-01"
+
+
+def _partitions_since(conn: sqlite3.Connection, since: str) -> List[sqlite3.Row]:
+    """Archive partitions holding logs dated ``since`` or later, newest first."""
+    return conn.execute(
+        """
+        SELECT month, file, max_date
+        FROM meal_log_partitions
+        WHERE max_date >= ?
+        ORDER BY month DESC
+        """,
+        (since,),
+    ).fetchall()
+
+
+def _union_history(
+    conn: sqlite3.Connection,
+    columns: str,
+    since: str,
+    partitions: List[sqlite3.Row],
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> List[Dict[str, object]]:
+    """Logs dated ``since`` or later from the main table and its archive partitions.
+
+    The main table and any of ``partitions`` already attached to ``conn``
+    (see ``get_dashboard_snapshot``) are read in one UNION query on
+    ``conn``, inside whatever transaction it has open. The other partitions
+    are then attached ``MAX_ATTACHED_PARTITIONS`` at a time, newest first:
+    on ``conn`` itself when it has no transaction open, otherwise on a
+    separate read-only connection, because ATTACH is refused inside a
+    transaction. With a ``limit`` the walk stops once older months cannot
+    reach the page.
+    """
+    wanted = None if limit is None else limit + offset
+    merged: List[Dict[str, object]] = []
+    seen = set()
+
+    def merge(target: sqlite3.Connection, aliases: List[str], with_main: bool) -> None:
+        selects = [f"SELECT {columns} FROM {alias}.meal_logs WHERE meal_date >= ?" for alias in aliases]
+        if with_main:
+            selects.insert(0, f"SELECT {columns} FROM main.meal_logs WHERE meal_date >= ?")
+        params: List[object] = [since] * len(selects)
+        # UNION drops the copies a back-dated row has in both files while its
+        # month is being re-archived.
+        sql = " UNION ".join(selects) + " ORDER BY meal_date DESC, meal_time DESC"
+        if wanted is not None:
+            sql += " LIMIT ?"
+            params.append(wanted)
+        for row in target.execute(sql, params).fetchall():
+            key = tuple(row)
+            if key not in seen:
+                seen.add(key)
+                merged.append(dict(row))
+        merged.sort(key=lambda entry: (entry["meal_date"], entry["meal_time"] or ""), reverse=True)
+        if wanted is not None:
+            del merged[wanted:]
+
+    attached = _attached_partitions(conn)
+    merge(conn, [attached[partition["file"]] for partition in partitions if partition["file"] in attached], True)
+    rest = [partition for partition in partitions if partition["file"] not in attached]
+    if rest:
+        other = _get_read_connection() if conn.in_transaction else conn
+        try:
+            for start in range(0, len(rest), MAX_ATTACHED_PARTITIONS):
+                batch = rest[start:start + MAX_ATTACHED_PARTITIONS]
+                if wanted is not None and len(merged) >= wanted and merged[wanted - 1]["meal_date"] > batch[0]["max_date"]:
+                    break
+                aliases = _attach_read_only(other, batch)
+                try:
+                    merge(other, [alias for alias, _ in aliases], False)
+                finally:
+                    for alias, _ in aliases:
+                        other.execute(f"DETACH DATABASE {alias}")
+        finally:
+            if other is not conn:
+                other.close()
+    if limit is None:
+        return merged
+    return merged[offset:offset + limit]
+
+
+def _attached_partitions(conn: sqlite3.Connection) -> Dict[str, str]:
+    """Aliases of the archive partitions attached to ``conn``, by partition file name."""
+    return {
+        Path(row[2]).name: row[1]
+        for row in conn.execute("PRAGMA database_list").fetchall()
+        if row[1].startswith("partition_")
+    }
+
+
+def _fetch_archived_log(conn: sqlite3.Connection, log_id: int) -> Optional[sqlite3.Row]:
+    # AUTOINCREMENT never reuses ids, so each partition's id range is exact.
+    for partition in conn.execute(
+        "SELECT file FROM meal_log_partitions WHERE ? BETWEEN min_id AND max_id ORDER BY month DESC",
+        (log_id,),
+    ).fetchall():
+        try:
+            archive = sqlite3.connect(_partition_uri(partition["file"]), uri=True)
+        except sqlite3.OperationalError as exc:
+            logger.warning("Skipping archive partition %s: %s", partition["file"], exc)
+            continue
+        archive.row_factory = sqlite3.Row
+        try:
+            row = archive.execute(
+                f"SELECT {MEAL_LOG_COLUMNS} FROM meal_logs WHERE id = ?", (log_id,)
+            ).fetchone()
+        finally:
+            archive.close()
+        if row is not None:
+            return row
+    return None
+
+
+def _refresh_daily_rollups(conn: sqlite3.Connection, start: str, end: str) -> None:
+    """Recompute ``meal_log_daily`` for ``start <= meal_date < end`` from ``archive``."""
+    by_day: Dict[str, List[Dict[str, object]]] = {}
+    for row in conn.execute(
+        """
+        SELECT meal_date, nutrition, override_nutrition
+        FROM archive.meal_logs
+        WHERE meal_date >= ? AND meal_date < ?
+        """,
+        (start, end),
+    ).fetchall():
+        by_day.setdefault(row["meal_date"], []).append(dict(row))
+    conn.execute(
+        "DELETE FROM main.meal_log_daily WHERE meal_date >= ? AND meal_date < ?",
+        (start, end),
+    )
+    updated_at = datetime.utcnow().isoformat()
+    rollups = []
+    for meal_date, logs in by_day.items():
+        totals = compute_nutrient_totals(logs)
+        rollups.append((meal_date, len(logs), totals["calories"], json_codec.dumps(totals), updated_at))
+    conn.executemany(
+        """
+        INSERT INTO main.meal_log_daily (meal_date, meals, calories, nutrition, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        rollups,
+    )
+
+
+def _record_partition(conn: sqlite3.Connection, month: str, archived_before: str) -> None:
+    stats = conn.execute(
+        """
+        SELECT COUNT(*) AS total, MIN(id) AS low, MAX(id) AS high,
+               MIN(meal_date) AS first, MAX(meal_date) AS last
+        FROM archive.meal_logs
+        """
+    ).fetchone()
+    conn.execute(
+        """
+        INSERT INTO main.meal_log_partitions (
+            month, file, rows, min_id, max_id, min_date, max_date, archived_before, archived_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(month) DO UPDATE SET
+            rows = excluded.rows,
+            min_id = excluded.min_id,
+            max_id = excluded.max_id,
+            min_date = excluded.min_date,
+            max_date = excluded.max_date,
+            archived_before = max(archived_before, excluded.archived_before),
+            archived_at = excluded.archived_at
+        """,
+        (
+            month,
+            _partition_file(month),
+            stats["total"],
+            stats["low"],
+            stats["high"],
+            stats["first"],
+            stats["last"],
+            archived_before,
+            datetime.utcnow().isoformat(),
+        ),
+    )
+
+
+# Partition files this process has attached for writing, which also gives
+# them their search index.
+_indexed_partitions: Set[Path] = set()
+
+
+def _attach_partition(conn: sqlite3.Connection, directory: Path, month: str) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    conn.execute("ATTACH DATABASE ? AS archive", (str(directory / _partition_file(month)),))
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS archive.meal_logs (
+            id INTEGER PRIMARY KEY,
+            meal_name TEXT NOT NULL,
+            meal_type TEXT NOT NULL,
+            calories REAL NOT NULL,
+            nutrition TEXT NOT NULL,
+            meal_date TEXT NOT NULL,
+            meal_time TEXT,
+            was_suggested INTEGER DEFAULT 0,
+            created_at TEXT NOT NULL,
+            notes TEXT,
+            override_nutrition TEXT
         )
-        conn.commit()
-        return result.rowcount > 0
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_meal_logs_date ON meal_logs (meal_date)")
+    # Each partition has its own search index; ``search_meal_logs`` unions them.
+    _create_search_index(
+        conn, "archive", "meal_logs_fts", "meal_logs", SEARCH_INDEXES["meal_logs_fts"]["columns"]
+    )
+    _indexed_partitions.add(directory / _partition_file(month))
+
+
+def _archive_month(conn: sqlite3.Connection, directory: Path, month: str, before: str) -> int:
+    start = f"{month}-01"
+    end = min(_next_month(month), before)
+    _attach_partition(conn, directory, month)
+    try:
+        # Copy first, then drop from main with the rollups and registry in
+        # one main-only transaction, so a crash in between leaves duplicates
+        # that the next run overwrites rather than lost rows. Overwriting is
+        # a delete and an insert rather than INSERT OR REPLACE, whose implicit
+        # delete skips the triggers that keep the partition's search index.
+        def copy() -> None:
+            conn.execute(
+                """
+                DELETE FROM archive.meal_logs WHERE id IN (
+                    SELECT id FROM main.meal_logs WHERE meal_date >= ? AND meal_date < ?
+                )
+                """,
+                (start, end),
+            )
+            conn.execute(
+                f"""
+                INSERT INTO archive.meal_logs ({ARCHIVED_COLUMNS})
+                SELECT {ARCHIVED_COLUMNS} FROM main.meal_logs
+                WHERE meal_date >= ? AND meal_date < ?
+                """,
+                (start, end),
+            )
+
+        _in_transaction(conn, copy)
+
+        def move() -> int:
+            _refresh_daily_rollups(conn, start, _next_month(month))
+            last_change = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM main.change_log").fetchone()[0]
+            moved = conn.execute(
+                """
+                DELETE FROM main.meal_logs
+                WHERE meal_date >= ? AND meal_date < ?
+                  AND id IN (SELECT id FROM archive.meal_logs)
+                """,
+                (start, end),
+            ).rowcount
+            # Archived logs still exist; drop the delete entries the move just recorded.
+            conn.execute(
+                "DELETE FROM main.change_log WHERE seq > ? AND entity = 'meal_log' AND op = 'delete'",
+                (last_change,),
+            )
+            _record_partition(conn, month, end)
+            return moved
+
+        return _in_transaction(conn, move)
+    finally:
+        conn.execute("DETACH DATABASE archive")
+
+
+def archive_meal_logs(before: date, pause_seconds: float = 0.0) -> Dict[str, object]:
+    """Move logs dated before ``before`` into their monthly archive partitions.
+
+    Runs on the write-queue thread one month at a time, committing queued
+    writes for ``pause_seconds`` between months.
+    """
+    cutoff = before.isoformat()
+    # Resolved here: the writer thread runs outside the caller's user scope.
+    directory = archive_dir()
+
+    def archive(conn: sqlite3.Connection, pump: Callable[[float], None]) -> Dict[str, object]:
+        months = [
+            row[0]
+            for row in conn.execute(
+                "SELECT DISTINCT substr(meal_date, 1, 7) FROM meal_logs WHERE meal_date < ? ORDER BY 1",
+                (cutoff,),
+            ).fetchall()
+        ]
+        moved = 0
+        for month in months:
+            moved += _archive_month(conn, directory, month, cutoff)
+            pump(pause_seconds)
+        # Partitions archived before they had a search index get one here.
+        for row in conn.execute("SELECT month, file FROM meal_log_partitions").fetchall():
+            path = directory / row["file"]
+            if path not in _indexed_partitions and path.exists():
+                _attach_partition(conn, directory, row["month"])
+                conn.execute("DETACH DATABASE archive")
+                pump(pause_seconds)
+        return {"before": cutoff, "months": months, "rows": moved}
+
+    return run_with_writer(archive)
+
+
+def _write_archived_log(log_id: int, sql: str, params: Tuple[object, ...], op: str) -> Optional[str]:
+    """Apply ``sql`` (with a ``{table}`` placeholder) to an archived log.
+
+    Returns the log's date if it was found, after refreshing that day's
+    rollup and recording ``op`` in ``change_log`` (the main table's triggers
+    do not see partitions). Runs on the write-queue thread so it never races
+    an archive run.
+    """
+    directory = archive_dir()
+
+    def apply(conn: sqlite3.Connection, pump: Callable[[float], None]) -> Optional[str]:
+        for partition in conn.execute(
+            "SELECT month FROM meal_log_partitions WHERE ? BETWEEN min_id AND max_id ORDER BY month DESC",
+            (log_id,),
+        ).fetchall():
+            month = partition["month"]
+            _attach_partition(conn, directory, month)
+            try:
+                row = conn.execute("SELECT meal_date FROM archive.meal_logs WHERE id = ?", (log_id,)).fetchone()
+                if row is None:
+                    continue
+                meal_date = row["meal_date"]
+
+                def change() -> None:
+                    conn.execute(sql.format(table="archive.meal_logs"), params)
+                    day_after = (date.fromisoformat(meal_date) + timedelta(days=1)).isoformat()
+                    _refresh_daily_rollups(conn, meal_date, day_after)
+                    conn.execute(
+                        "UPDATE main.meal_log_partitions SET rows = (SELECT COUNT(*) FROM archive.meal_logs) WHERE month = ?",
+                        (month,),
+                    )
+                    conn.execute(
+                        f"""
+                        INSERT INTO main.change_log (entity, entity_id, op, changed_at)
+                        VALUES ('meal_log', ?, ?, {CHANGED_AT_SQL})
+                        """,
+                        (log_id, op),
+                    )
+
+                _in_transaction(conn, change)
+                return meal_date
+            finally:
+                conn.execute("DETACH DATABASE archive")
+        return None
+
+    return run_with_writer(apply)
+
+
+def list_meal_log_partitions() -> List[Dict[str, object]]:
+    conn = _get_read_connection()
+    try:
+        rows = conn.execute("SELECT * FROM meal_log_partitions ORDER BY month").fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def get_daily_totals(start: date, end: date) -> List[Dict[str, object]]:
+    """Per-day meal counts and nutrient totals for ``start``..``end`` inclusive.
+
+    Archived days come from ``meal_log_daily``; days still in the main table
+    are summed from their logs, and both are added up for a day that has
+    rows in each.
+    """
+    conn = _get_read_connection()
+    try:
+        days: Dict[str, Dict[str, object]] = {}
+        for row in conn.execute(
+            """
+            SELECT meal_date, meals, nutrition
+            FROM meal_log_daily
+            WHERE meal_date >= ? AND meal_date <= ?
+            """,
+            (start.isoformat(), end.isoformat()),
+        ).fetchall():
+            days[row["meal_date"]] = {
+                "date": row["meal_date"],
+                "meals": row["meals"],
+                "totals": json_codec.loads(row["nutrition"]),
+            }
+        hot: Dict[str, List[Dict[str, object]]] = {}
+        for row in conn.execute(
+            """
+            SELECT meal_date, nutrition, override_nutrition
+            FROM meal_logs
+            WHERE meal_date >= ? AND meal_date <= ?
+            """,
+            (start.isoformat(), end.isoformat()),
+        ).fetchall():
+            hot.setdefault(row["meal_date"], []).append(dict(row))
     finally:
         conn.close()
+    for meal_date, logs in hot.items():
+        totals = compute_nutrient_totals(logs)
+        day = days.setdefault(
+            meal_date, {"date": meal_date, "meals": 0, "totals": {key: 0.0 for key in NUTRIENT_KEYS}}
+        )
+        day["meals"] += len(logs)
+        for key, value in totals.items():
+            day["totals"][key] = day["totals"].get(key, 0.0) + value
+    return [days[key] for key in sorted(days)]
 
 
 def get_weekly_snapshot() -> Tuple[Dict[str, float], List[Dict[str, object]], date]:
@@ -406,18 +2077,59 @@ def get_weekly_snapshot() -> Tuple[Dict[str, float], List[Dict[str, object]], da
     return targets, logs, week_start
 
 
+def get_dashboard_snapshot(limit: int, days: int, offset: int = 0) -> Dict[str, object]:
+    """Weekly targets and logs, a recent-log page and preferences from one read.
+
+    Everything is read on one connection inside a single transaction, so the
+    parts are mutually consistent even while other requests are writing or
+    an archive run is moving logs into partitions. That covers up to
+    ``MAX_ATTACHED_PARTITIONS`` archived months; a recent-log page reaching
+    further back reads the older months after the transaction.
+    """
+    week_start = get_week_start()
+    # Seed this week's goals first so the snapshot itself stays read-only.
+    seeded = ensure_weekly_goal(week_start)
+    since = min(week_start, date.today() - timedelta(days=days)).isoformat()
+    conn = _get_read_connection()
+    try:
+        # ATTACH is refused inside a transaction, so the newest partitions the
+        # reads can reach are attached first and read in the same transaction
+        # as the main tables. Only a page reaching past them reads older
+        # partitions afterwards.
+        attached = _attach_read_only(conn, _partitions_since(conn, since)[:MAX_ATTACHED_PARTITIONS])
+        conn.execute("BEGIN")
+        try:
+            # Partitions are not in WAL mode: their read starts with the first
+            # statement that touches them, so open every one up front.
+            conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            for alias, _ in attached:
+                conn.execute(f"SELECT COUNT(*) FROM {alias}.sqlite_master").fetchone()
+            snapshot = {
+                "targets": _weekly_goal(conn, week_start) or seeded,
+                "logs": _get_weekly_logs(conn, week_start),
+                "week_start": week_start,
+                "recent_meals": _fetch_recent_meals(conn, limit, days, offset),
+                "preferences": _get_preferences(conn),
+            }
+        finally:
+            conn.rollback()
+        return snapshot
+    finally:
+        conn.close()
+
+
 def compute_nutrient_totals(logs: List[Dict[str, object]]) -> Dict[str, float]:
     totals = {key: 0.0 for key in NUTRIENT_KEYS}
     for entry in logs:
         try:
-            base = json.loads(entry["nutrition"])
+            base = json_codec.loads(entry["nutrition"])
         except (TypeError, json.JSONDecodeError):
             base = {}
         override_raw = entry.get("override_nutrition")
         override = {}
         if override_raw:
             try:
-                override = json.loads(override_raw)
+                override = json_codec.loads(override_raw)
             except (TypeError, json.JSONDecodeError):
                 override = {}
         combined = base.copy()
@@ -425,3 +2137,182 @@ def compute_nutrient_totals(logs: List[Dict[str, object]]) -> Dict[str, float]:
         for key in totals:
             totals[key] += float(combined.get(key, 0))
     return totals
+
+
+def _change_log_head(conn: sqlite3.Connection) -> Tuple[int, int]:
+    """``(head, floor)``: the last change recorded and the last one compacted away."""
+    # ``sqlite_sequence`` keeps the head even after compaction empties the table.
+    head = conn.execute(
+        "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'change_log'), 0)"
+    ).fetchone()[0]
+    floor = conn.execute(
+        "SELECT COALESCE((SELECT floor_seq FROM change_log_state WHERE id = 1), 0)"
+    ).fetchone()[0]
+    return int(head), int(floor)
+
+
+def _load_changed(
+    conn: sqlite3.Connection, entity: str, ids: List[int]
+) -> Dict[int, Dict[str, object]]:
+    """Current state of the ``ids`` records of ``entity``; missing ones are left out."""
+    if entity == "preferences":
+        return {0: _get_preferences(conn)}
+    placeholders = ", ".join("?" for _ in ids)
+    if entity == "custom_meal":
+        rows = conn.execute(
+            f"SELECT {CUSTOM_MEAL_COLUMNS}, created_at FROM user_meals WHERE id IN ({placeholders})", ids
+        ).fetchall()
+        return {int(row["id"]): _decode_custom_meal(row) for row in rows}
+    rows = conn.execute(
+        f"SELECT {MEAL_LOG_COLUMNS} FROM meal_logs WHERE id IN ({placeholders})", ids
+    ).fetchall()
+    found = {int(row["id"]): _decode_meal_log(row) for row in rows}
+    for log_id in ids:
+        if log_id not in found:
+            row = _fetch_archived_log(conn, log_id)
+            if row is not None:
+                found[log_id] = _decode_meal_log(row)
+    return found
+
+
+def get_changes(since: int, limit: int = 500) -> Dict[str, object]:
+    """Records changed after change number ``since``, for ``/api/sync``.
+
+    Each changed record appears once, at its latest change, with its current
+    state (``op: "upsert"``) or as a tombstone (``op: "delete"``). Resume
+    from ``next``. ``reset`` means the cursor can't be served incrementally:
+    it is 0, older than the compacted history, or from before a restore.
+    The client should then reload everything and continue from ``next``.
+    """
+    conn = _get_read_connection()
+    try:
+        # Read the head first: states loaded below are at least this new, and
+        # anything changed in between is sent again on the next sync.
+        head, floor = _change_log_head(conn)
+        if since <= 0 or since < floor or since > head:
+            return {"since": since, "next": head, "reset": True, "more": False, "changes": []}
+        # Bare columns next to MAX() come from the row holding the maximum.
+        rows = conn.execute(
+            """
+            SELECT entity, entity_id, op, MAX(seq) AS last_seq
+            FROM change_log
+            WHERE seq > ? AND seq <= ?
+            GROUP BY entity, entity_id
+            ORDER BY last_seq
+            LIMIT ?
+            """,
+            (since, head, limit + 1),
+        ).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        upserts: Dict[str, List[int]] = {}
+        for row in rows:
+            if row["op"] == "upsert":
+                upserts.setdefault(row["entity"], []).append(int(row["entity_id"]))
+        states = {entity: _load_changed(conn, entity, ids) for entity, ids in upserts.items()}
+        changes = []
+        for row in rows:
+            entity_id = int(row["entity_id"])
+            data = states.get(row["entity"], {}).get(entity_id) if row["op"] == "upsert" else None
+            changes.append(
+                {
+                    "seq": row["last_seq"],
+                    "entity": row["entity"],
+                    "id": entity_id,
+                    # Deleted after the head was read: report what the client will find.
+                    "op": "upsert" if data is not None else "delete",
+                    "data": data,
+                }
+            )
+        return {
+            "since": since,
+            "next": changes[-1]["seq"] if more else head,
+            "reset": False,
+            "more": more,
+            "changes": changes,
+        }
+    finally:
+        conn.close()
+
+
+def compact_change_log(
+    before: str, batch_size: int = 5000, pause_seconds: float = 0.0
+) -> Dict[str, object]:
+    """Drop superseded change entries, then every entry recorded before ``before``.
+
+    Only the latest entry per record matters to ``get_changes``, so
+    superseded ones go without affecting any client. Dropping old entries
+    raises ``floor_seq`` so older cursors get ``reset``. Runs on the
+    write-queue thread in batches, committing queued writes between them.
+    """
+
+    def compact(conn: sqlite3.Connection, pump: Callable[[float], None]) -> Dict[str, object]:
+        def drop_superseded() -> int:
+            return conn.execute(
+                """
+                DELETE FROM change_log WHERE seq IN (
+                    SELECT seq FROM change_log
+                    WHERE seq NOT IN (SELECT MAX(seq) FROM change_log GROUP BY entity, entity_id)
+                    LIMIT ?
+                )
+                """,
+                (batch_size,),
+            ).rowcount
+
+        def drop_expired() -> int:
+            last = conn.execute(
+                """
+                SELECT MAX(seq) FROM (
+                    SELECT seq FROM change_log WHERE changed_at < ? ORDER BY seq LIMIT ?
+                )
+                """,
+                (before, batch_size),
+            ).fetchone()[0]
+            if last is None:
+                return 0
+            conn.execute(
+                "UPDATE change_log_state SET floor_seq = MAX(floor_seq, ?), compacted_at = ? WHERE id = 1",
+                (last, datetime.utcnow().isoformat()),
+            )
+            return conn.execute("DELETE FROM change_log WHERE seq <= ?", (last,)).rowcount
+
+        removed = {"superseded": 0, "expired": 0}
+        for key, step in (("superseded", drop_superseded), ("expired", drop_expired)):
+            while True:
+                count = _in_transaction(conn, step)
+                removed[key] += count
+                if count < batch_size:
+                    break
+                pump(pause_seconds)
+        head, floor = _change_log_head(conn)
+        remaining = conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0]
+        return {**removed, "remaining": remaining, "head": head, "floor": floor}
+
+    return run_with_writer(compact)
+
+
+def change_log_summary() -> Dict[str, object]:
+    conn = _get_read_connection()
+    try:
+        head, floor = _change_log_head(conn)
+        row = conn.execute("SELECT COUNT(*) AS entries, MIN(changed_at) AS oldest FROM change_log").fetchone()
+        return {"head": head, "floor": floor, "entries": row["entries"], "oldest": row["oldest"]}
+    finally:
+        conn.close()
+
+
+metrics.instrument_module(
+    globals(),
+    skip=(
+        "add_change_listener",
+        "remove_change_listener",
+        "get_week_start",
+        "run_with_writer",
+        "archive_dir",
+        "shard_dir",
+        "shard_path",
+        "db_path",
+        "iter_shards",
+        "for_each_shard",
+    ),
+)
@@ -0,0 +1,250 @@
+"""Near-duplicate detection for custom recipe requests.
+
+Every saved recipe gets a MinHash signature over its name, ingredient and
+tag tokens. Signatures are persisted in ``user_meal_fingerprints`` and mirrored
+in memory, so a new request can be checked before it costs a model call.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import random
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from . import metrics, shards
+from .database import (
+    custom_meal_library_version,
+    get_custom_meal,
+    list_meal_fingerprints,
+    list_unfingerprinted_meals,
+    save_meal_fingerprints,
+)
+from .env import env_float
+from .schemas import CustomMealRequest
+
+NUM_HASHES = 64
+FINGERPRINT_VERSION = 1
+NAME_WEIGHT = 0.5
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240611)
+_COEFFICIENTS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)
+]
+
+_WORD = re.compile(r"[a-z]+")
+_IGNORED = {
+    # Glue words and recipe-name fillers.
+    "a", "an", "and", "the", "with", "of", "in", "on", "for", "or", "to", "style",
+    "easy", "quick", "simple", "homemade", "my", "best", "healthy",
+    # Quantities and preparation notes that show up in ingredient lines.
+    "g", "kg", "mg", "ml", "l", "oz", "lb", "lbs", "cup", "cups", "tbsp", "tsp",
+    "tablespoon", "tablespoons", "teaspoon", "teaspoons", "pinch", "clove", "cloves",
+    "can", "handful", "slice", "slices", "piece", "pieces", "large", "small", "medium",
+    "chopped", "diced", "sliced", "minced", "grated", "fresh", "dried", "ground",
+    "optional", "taste", "about", "plus", "divided", "finely", "roughly", "cooked",
+}
+
+
+def dedupe_enabled() -> bool:
+    return os.getenv("CUSTOM_MEAL_DEDUPE", "1").lower() not in ("0", "false", "no")
+
+
+def _words(values: Iterable[object]) -> Set[str]:
+    words: Set[str] = set()
+    for value in values:
+        for word in _WORD.findall(str(value or "").lower()):
+            if len(word) < 2 or word in _IGNORED:
+                continue
+            words.add(word[:-1] if len(word) > 3 and word.endswith("s") else word)
+    return words
+
+
+def _features(names: Iterable[object], ingredients: Iterable[object], tags: Iterable[object]) -> Tuple[FrozenSet[str], Set[str]]:
+    name_words = frozenset(_words(names))
+    features = {f"n:{word}" for word in name_words}
+    features.update(f"i:{word}" for word in _words(ingredients))
+    features.update(f"t:{word}" for word in _words(tags))
+    return name_words, features
+
+
+def _minhash(features: Iterable[str]) -> List[int]:
+    hashes = [
+        int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for feature in features
+    ]
+    if not hashes:
+        return [_PRIME] * NUM_HASHES
+    return [min((a * value + b) % _PRIME for value in hashes) for a, b in _COEFFICIENTS]
+
+
+def fingerprint_meal(meal: Dict[str, object]) -> Dict[str, object]:
+    """Signature of a stored recipe, folding in the request that produced it."""
+    source = meal.get("source_payload") or {}
+    name_words, features = _features(
+        [meal.get("name"), source.get("name")],
+        [*(meal.get("ingredients") or []), *(source.get("preferred_ingredients") or [])],
+        [*(meal.get("tags") or []), source.get("cuisine")],
+    )
+    return {
+        "version": FINGERPRINT_VERSION,
+        "name": sorted(name_words),
+        "size": len(features),
+        "minhash": _minhash(features),
+    }
+
+
+def fingerprint_request(payload: CustomMealRequest) -> Dict[str, object]:
+    name_words, features = _features(
+        [payload.name], payload.preferred_ingredients, [payload.cuisine]
+    )
+    return {
+        "version": FINGERPRINT_VERSION,
+        "name": sorted(name_words),
+        "size": len(features),
+        "minhash": _minhash(features),
+    }
+
+
+def similarity(request: Dict[str, object], stored: Dict[str, object]) -> float:
+    """Blend of name overlap and how much of the request the stored recipe covers.
+
+    MinHash estimates the Jaccard index J of the two feature sets; with the set
+    sizes known, containment of the request in the recipe is
+    ``J * (|R| + |S|) / ((1 + J) * |R|)``. Containment rather than Jaccard is
+    used because a finished recipe lists far more ingredients than a request.
+    """
+    request_names = set(request["name"])
+    stored_names = set(stored["name"])
+    if not request_names or not stored_names:
+        return 0.0
+    name_overlap = len(request_names & stored_names) / len(request_names | stored_names)
+    agreeing = sum(
+        1 for left, right in zip(request["minhash"], stored["minhash"]) if left == right
+    )
+    jaccard = agreeing / NUM_HASHES
+    request_size = max(int(request["size"]), 1)
+    containment = min(
+        jaccard * (request_size + int(stored["size"])) / ((1 + jaccard) * request_size),
+        1.0,
+    )
+    return NAME_WEIGHT * name_overlap + (1 - NAME_WEIGHT) * containment
+
+
+class DuplicateIndex:
+    """In-memory fingerprints with a name-word inverted index for candidates.
+
+    A recipe sharing no name word with the request scores at most
+    ``1 - NAME_WEIGHT``, below any sensible threshold, so only recipes that
+    share one are compared.
+    """
+
+    def __init__(self):
+        self.fingerprints: Dict[int, Dict[str, object]] = {}
+        self._by_name: Dict[str, Set[int]] = defaultdict(set)
+        self.last_id = 0
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def add(self, meal_id: int, fingerprint: Dict[str, object], advance: bool = True) -> None:
+        previous = self.fingerprints.get(meal_id)
+        if previous is not None:
+            for word in previous["name"]:
+                self._by_name[word].discard(meal_id)
+        self.fingerprints[meal_id] = fingerprint
+        for word in fingerprint["name"]:
+            self._by_name[word].add(meal_id)
+        if advance:
+            self.last_id = max(self.last_id, meal_id)
+
+    def best_match(self, request: Dict[str, object]) -> Optional[Tuple[int, float]]:
+        candidates: Set[int] = set()
+        for word in request["name"]:
+            candidates |= self._by_name.get(word, set())
+        best: Optional[Tuple[int, float]] = None
+        for meal_id in candidates:
+            score = similarity(request, self.fingerprints[meal_id])
+            if best is None or score > best[1] or (score == best[1] and meal_id > best[0]):
+                best = (meal_id, score)
+        return best
+
+
+_lock = threading.Lock()
+# One index per user shard, least recently used first.
+_indexes: "OrderedDict[Optional[str], DuplicateIndex]" = OrderedDict()
+MAX_INDEXES = 32
+_stats = {"checks": 0, "duplicates": 0, "forced": 0}
+
+
+def _current_index() -> DuplicateIndex:
+    """The calling user's index; call with ``_lock`` held."""
+    user_id = shards.current_user()
+    index = _indexes.get(user_id)
+    if index is None:
+        index = _indexes[user_id] = DuplicateIndex()
+    _indexes.move_to_end(user_id)
+    while len(_indexes) > MAX_INDEXES:
+        _indexes.popitem(last=False)
+    return index
+
+
+def _sync() -> DuplicateIndex:
+    """Pull fingerprints written since the last sync and backfill missing ones."""
+    _, last_id = custom_meal_library_version()
+    with _lock:
+        index = _current_index()
+        if last_id <= index.last_id:
+            return index
+        for meal_id, fingerprint in list_meal_fingerprints(index.last_id):
+            index.add(meal_id, fingerprint)
+        missing = [
+            (int(meal["id"]), fingerprint_meal(meal))
+            for meal in list_unfingerprinted_meals()
+            if int(meal["id"]) not in index.fingerprints
+        ]
+        if missing:
+            save_meal_fingerprints(missing)
+            for meal_id, fingerprint in missing:
+                index.add(meal_id, fingerprint)
+        index.last_id = max(index.last_id, last_id)
+        return index
+
+
+def find_duplicate(payload: CustomMealRequest) -> Optional[Tuple[Dict[str, object], float]]:
+    """Return the closest saved recipe and its similarity when it clears the threshold."""
+    if not dedupe_enabled():
+        return None
+    if payload.force:
+        _stats["forced"] += 1
+        return None
+    _stats["checks"] += 1
+    index = _sync()
+    with _lock:
+        match = index.best_match(fingerprint_request(payload))
+    if match is None or match[1] < env_float("CUSTOM_MEAL_DUPLICATE_THRESHOLD", 0.8):
+        metrics.record_cache("completed_recipe", "dedupe", False)
+        return None
+    meal = get_custom_meal(match[0])
+    if meal is None:
+        metrics.record_cache("completed_recipe", "dedupe", False)
+        return None
+    _stats["duplicates"] += 1
+    metrics.record_cache("completed_recipe", "dedupe", True)
+    return meal, round(match[1], 3)
+
+
+def remember(meal_id: int, recipe: Dict[str, object], source_payload: Dict[str, object]) -> None:
+    fingerprint = fingerprint_meal({**recipe, "source_payload": source_payload})
+    save_meal_fingerprints([(meal_id, fingerprint)])
+    with _lock:
+        # Leave ``last_id`` alone so rows saved by other workers are still synced.
+        _current_index().add(meal_id, fingerprint, advance=False)
+
+
+def stats() -> Dict[str, object]:
+    return {"enabled": dedupe_enabled(), "indexed": sum(len(index) for index in _indexes.values()), **_stats}
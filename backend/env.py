@@ -0,0 +1,23 @@
+"""Numeric settings read from the environment.
+
+A missing or malformed value falls back to the default instead of failing
+at import time.
+"""
+
+from __future__ import annotations
+
+import os
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
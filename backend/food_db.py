@@ -0,0 +1,300 @@
+"""Offline food-composition lookups for single-ingredient manual entries."""
+
+from __future__ import annotations
+
+import csv
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from . import metrics
+from .constants import NUTRIENT_KEYS
+from .database import list_food_composition, upsert_food_composition
+from .env import env_float
+
+DATA_PATH = Path(__file__).resolve().parent / "data" / "foods.csv"
+MAX_PORTION_GRAMS = 3000.0
+MAX_UNITLESS_COUNT = 12
+
+_MULTI_INGREDIENT = re.compile(r"[,;+&/]|\b(?:and|with|plus|topped|served|on)\b")
+_NON_ALNUM = re.compile(r"[^a-z0-9%]+")
+_PORTION = re.compile(
+    r"^(?:about|approx|approximately|around|roughly|~)?\s*"
+    r"(?P<qty>\d+(?:\.\d+)?(?:\s*/\s*\d+)?|[a-z]+)\s*"
+    r"(?P<rest>.*)$"
+)
+
+_MASS_UNITS = {
+    "g": 1.0, "gm": 1.0, "gms": 1.0, "gr": 1.0, "gram": 1.0, "grams": 1.0,
+    "kg": 1000.0, "kgs": 1000.0, "kilogram": 1000.0, "kilograms": 1000.0,
+    "oz": 28.35, "ounce": 28.35, "ounces": 28.35,
+    "lb": 453.6, "lbs": 453.6, "pound": 453.6, "pounds": 453.6,
+}
+# Volumes in millilitres, converted with each food's own density
+# (``cup_grams`` per US cup): honey is ~1.4 g/ml and oil ~0.9 g/ml.
+CUP_MILLILITRES = 236.6
+_VOLUME_UNITS = {
+    "ml": 1.0, "millilitre": 1.0, "milliliter": 1.0, "millilitres": 1.0, "milliliters": 1.0,
+    "l": 1000.0, "litre": 1000.0, "liter": 1000.0, "litres": 1000.0, "liters": 1000.0,
+}
+_CUP_FRACTIONS = {
+    "cup": 1.0, "cups": 1.0,
+    "tbsp": 1 / 16, "tablespoon": 1 / 16, "tablespoons": 1 / 16,
+    "tsp": 1 / 48, "teaspoon": 1 / 48, "teaspoons": 1 / 48,
+}
+_COUNT_UNITS = {
+    "piece", "pieces", "pc", "pcs", "slice", "slices", "item", "items",
+    "serving", "servings", "whole", "fillet", "fillets", "strip", "strips",
+}
+_SIZE_FACTORS = {"small": 0.75, "medium": 1.0, "regular": 1.0, "large": 1.25}
+_WORD_QUANTITIES = {
+    "a": 1.0, "an": 1.0, "one": 1.0, "half": 0.5, "quarter": 0.25,
+    "two": 2.0, "three": 3.0, "four": 4.0, "five": 5.0, "six": 6.0,
+}
+
+
+def food_db_enabled() -> bool:
+    return os.getenv("FOOD_DB_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def _normalize(text: str) -> str:
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def _trigrams(text: str) -> frozenset:
+    padded = f"  {text} "
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def _singular(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+
+class FoodIndex:
+    """Trigram inverted index over food names and aliases.
+
+    Similarity is the Dice coefficient between trigram sets, so word order
+    and small typos cost a little while unrelated foods score near zero.
+    """
+
+    def __init__(self, foods: List[Dict[str, object]]):
+        self.foods = foods
+        self._exact: Dict[str, int] = {}
+        self._aliases: List[Tuple[int, frozenset]] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._words: List[set] = []
+        for position, food in enumerate(foods):
+            words = set()
+            for alias in [food["name"], *food.get("aliases", [])]:
+                normalized = _normalize(str(alias))
+                if not normalized:
+                    continue
+                words.update(_singular(word) for word in normalized.split())
+                self._exact.setdefault(normalized, position)
+                grams = _trigrams(normalized)
+                alias_id = len(self._aliases)
+                self._aliases.append((position, grams))
+                for gram in grams:
+                    self._postings[gram].append(alias_id)
+            self._words.append(words)
+
+    def __len__(self) -> int:
+        return len(self.foods)
+
+    def match(self, query: str) -> Optional[Tuple[int, float]]:
+        normalized = _normalize(query)
+        if not normalized:
+            return None
+        exact = self._exact.get(normalized)
+        if exact is not None:
+            return exact, 1.0
+        grams = _trigrams(normalized)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for alias_id in self._postings.get(gram, ()):
+                shared[alias_id] += 1
+        best: Optional[Tuple[int, float]] = None
+        for alias_id, count in shared.items():
+            position, alias_grams = self._aliases[alias_id]
+            score = 2 * count / (len(grams) + len(alias_grams))
+            if best is None or score > best[1]:
+                best = (position, score)
+        return best
+
+    def names_food(self, position: int, word: str) -> bool:
+        return _singular(word) in self._words[position]
+
+
+def _parse_quantity(token: str) -> Optional[float]:
+    if token in _WORD_QUANTITIES:
+        return _WORD_QUANTITIES[token]
+    if "/" in token:
+        numerator, denominator = (part.strip() for part in token.split("/", 1))
+        try:
+            return float(numerator) / float(denominator)
+        except (ValueError, ZeroDivisionError):
+            return None
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+def parse_portion(text: str, food: Dict[str, object], index: FoodIndex, position: int) -> Optional[float]:
+    """Convert a portion like ``250 g``, ``1.5 cups`` or ``2 large eggs`` to grams.
+
+    Returns ``None`` for anything vague (``a bowl``, ``some``) so the caller
+    can fall back to the model instead of guessing.
+    """
+    cleaned = text.lower().replace(",", " ").strip()
+    cleaned = re.sub(r"(\d)([a-z])", r"\1 \2", cleaned)
+    match = _PORTION.match(cleaned)
+    if match is None:
+        return None
+    quantity = _parse_quantity(match.group("qty"))
+    if quantity is None or quantity <= 0:
+        return None
+    words = [word for word in _normalize(match.group("rest")).split() if word != "of"]
+    size = 1.0
+    if words and words[0] in _SIZE_FACTORS:
+        size = _SIZE_FACTORS[words.pop(0)]
+    unit = words[0] if words else ""
+
+    if unit in _MASS_UNITS:
+        grams = quantity * _MASS_UNITS[unit]
+    elif unit in _VOLUME_UNITS:
+        if not food.get("cup_grams"):
+            return None
+        grams = quantity * _VOLUME_UNITS[unit] * float(food["cup_grams"]) / CUP_MILLILITRES
+    elif unit in _CUP_FRACTIONS:
+        if not food.get("cup_grams"):
+            return None
+        grams = quantity * _CUP_FRACTIONS[unit] * float(food["cup_grams"])
+    elif unit in _COUNT_UNITS or (unit and index.names_food(position, unit)) or (
+        not unit and quantity <= MAX_UNITLESS_COUNT
+    ):
+        if not food.get("unit_grams"):
+            return None
+        grams = quantity * size * float(food["unit_grams"])
+    else:
+        return None
+    if grams <= 0 or grams > MAX_PORTION_GRAMS:
+        return None
+    return grams
+
+
+def _read_csv(path: Path) -> List[Dict[str, object]]:
+    foods: List[Dict[str, object]] = []
+    with path.open(newline="", encoding="utf-8") as handle:
+        for row in csv.DictReader(handle):
+            foods.append(
+                {
+                    "name": row["name"],
+                    "aliases": [alias for alias in row["aliases"].split(";") if alias],
+                    "unit_grams": float(row["unit_grams"]) if row["unit_grams"] else None,
+                    "cup_grams": float(row["cup_grams"]) if row["cup_grams"] else None,
+                    "nutrition": {key: float(row.get(key) or 0) for key in NUTRIENT_KEYS},
+                }
+            )
+    return foods
+
+
+_index_lock = threading.Lock()
+_index: Optional[FoodIndex] = None
+_stats_lock = threading.Lock()
+_stats = {
+    "lookups": 0,
+    "local_hits": 0,
+    "multi_ingredient": 0,
+    "low_confidence": 0,
+    "unparsed_portion": 0,
+    "lookup_seconds": 0.0,
+}
+
+
+def load(path: Path = DATA_PATH) -> int:
+    """Seed the ``food_composition`` table from the bundled CSV and rebuild the index."""
+    global _index
+    if path.exists():
+        upsert_food_composition(_read_csv(path))
+    index = FoodIndex(list_food_composition())
+    with _index_lock:
+        _index = index
+    return len(index)
+
+
+def get_index() -> FoodIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FoodIndex(list_food_composition())
+        return _index
+
+
+def _record(outcome: Optional[str], started: float) -> None:
+    with _stats_lock:
+        _stats["lookups"] += 1
+        _stats["lookup_seconds"] += time.perf_counter() - started
+        if outcome is None:
+            _stats["local_hits"] += 1
+        else:
+            _stats[outcome] += 1
+    metrics.record_cache("manual_meal_nutrition", "food_db", outcome is None)
+
+
+def estimate(meal_name: str, description: str, approximate_weight: str) -> Optional[Dict[str, object]]:
+    """Answer a manual entry from the local table, or ``None`` if the model should."""
+    if not food_db_enabled():
+        return None
+    started = time.perf_counter()
+    if _MULTI_INGREDIENT.search(_normalize(description)):
+        _record("multi_ingredient", started)
+        return None
+    index = get_index()
+    best: Optional[Tuple[int, float]] = None
+    for query in (description, meal_name):
+        found = index.match(query)
+        if found is not None and (best is None or found[1] > best[1]):
+            best = found
+    if best is None or best[1] < env_float("FOOD_DB_MIN_CONFIDENCE", 0.6):
+        _record("low_confidence", started)
+        return None
+    position, confidence = best
+    food = index.foods[position]
+    grams = parse_portion(approximate_weight, food, index, position)
+    if grams is None:
+        _record("unparsed_portion", started)
+        return None
+    factor = grams / 100.0
+    nutrition = {
+        key: round(float(food["nutrition"].get(key, 0.0)) * factor, 2) for key in NUTRIENT_KEYS
+    }
+    _record(None, started)
+    return {
+        "food": food["name"],
+        "confidence": round(confidence, 3),
+        "grams": round(grams, 1),
+        "nutrition": nutrition,
+    }
+
+
+def stats() -> Dict[str, object]:
+    with _stats_lock:
+        snapshot = dict(_stats)
+    lookups = snapshot.pop("lookups")
+    lookup_seconds = snapshot.pop("lookup_seconds")
+    hits = snapshot.pop("local_hits")
+    return {
+        "enabled": food_db_enabled(),
+        "foods": len(_index) if _index is not None else 0,
+        "lookups": lookups,
+        "local_hits": hits,
+        "llm_fallbacks": lookups - hits,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "avg_lookup_ms": round(lookup_seconds * 1000 / lookups, 4) if lookups else 0.0,
+        "fallback_reasons": snapshot,
+    }
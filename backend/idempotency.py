@@ -0,0 +1,137 @@
+"""Idempotency-Key support for POST endpoints that write to the database."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterable
+
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from .database import (
+    claim_idempotency_key,
+    complete_idempotency_key,
+    get_idempotency_key,
+    release_idempotency_key,
+)
+from .env import env_float
+
+HEADER = "Idempotency-Key"
+REPLAY_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request: Request, body: bytes) -> str:
+    digest = hashlib.sha256()
+    digest.update(request.method.encode("utf-8"))
+    digest.update(b"\0" + request.url.path.encode("utf-8"))
+    digest.update(b"\0" + request.url.query.encode("utf-8"))
+    digest.update(b"\0" + body)
+    return digest.hexdigest()
+
+
+def _replay(row: Dict[str, object]) -> Response:
+    return Response(
+        content=row["body"] or b"",
+        status_code=int(row["status_code"]),
+        media_type=row["content_type"],
+        headers={REPLAY_HEADER: "true"},
+    )
+
+
+class IdempotencyMiddleware(BaseHTTPMiddleware):
+    """Store the first response for each key and replay it for retries.
+
+    Only POSTs to ``paths`` that carry the header are affected. A duplicate
+    arriving while the original is still running waits for it instead of
+    re-running the handler; 5xx responses release the key so the client can
+    retry for real.
+    """
+
+    def __init__(self, app, paths: Iterable[str]):
+        super().__init__(app)
+        self._paths = set(paths)
+        self._inflight: Dict[str, asyncio.Event] = {}
+
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        key = request.headers.get(HEADER)
+        if request.method != "POST" or not key or request.url.path not in self._paths:
+            return await call_next(request)
+        if len(key) > MAX_KEY_LENGTH:
+            return JSONResponse({"detail": f"{HEADER} is too long"}, status_code=400)
+
+        body = await request.body()
+        fingerprint = request_fingerprint(request, body)
+        ttl = timedelta(hours=env_float("IDEMPOTENCY_TTL_HOURS", 24.0))
+        lock_timeout = timedelta(seconds=env_float("IDEMPOTENCY_LOCK_SECONDS", 180.0))
+        now = datetime.utcnow()
+        existing = await asyncio.to_thread(
+            claim_idempotency_key, key, fingerprint, now + ttl, now - lock_timeout
+        )
+        if existing is not None:
+            return await self._resolve_existing(key, fingerprint, existing)
+
+        done = self._inflight.setdefault(key, asyncio.Event())
+        try:
+            response = await call_next(request)
+            if response.status_code >= 500:
+                await asyncio.to_thread(release_idempotency_key, key)
+                return response
+            content = b"".join([chunk async for chunk in response.body_iterator])
+            await asyncio.to_thread(
+                complete_idempotency_key,
+                key,
+                response.status_code,
+                response.headers.get("content-type"),
+                content,
+            )
+            return Response(
+                content=content,
+                status_code=response.status_code,
+                headers=dict(response.headers),
+            )
+        except BaseException:
+            await asyncio.to_thread(release_idempotency_key, key)
+            raise
+        finally:
+            done.set()
+            self._inflight.pop(key, None)
+
+    async def _resolve_existing(
+        self, key: str, fingerprint: str, row: Dict[str, object]
+    ) -> Response:
+        if row["fingerprint"] != fingerprint:
+            return JSONResponse(
+                {"detail": f"{HEADER} was already used for a different request"},
+                status_code=422,
+            )
+        if row["status"] == "completed":
+            return _replay(row)
+
+        deadline = asyncio.get_running_loop().time() + env_float(
+            "IDEMPOTENCY_WAIT_SECONDS", 90.0
+        )
+        while asyncio.get_running_loop().time() < deadline:
+            event = self._inflight.get(key)
+            try:
+                if event is not None:
+                    await asyncio.wait_for(event.wait(), timeout=1.0)
+                else:
+                    await asyncio.sleep(0.1)
+            except asyncio.TimeoutError:
+                pass
+            current = await asyncio.to_thread(get_idempotency_key, key)
+            if current is None:
+                return JSONResponse(
+                    {"detail": "The original request failed; retry with the same key"},
+                    status_code=409,
+                )
+            if current["status"] == "completed":
+                return _replay(current)
+        return JSONResponse(
+            {"detail": "The original request is still in progress"},
+            status_code=409,
+        )
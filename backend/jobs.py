@@ -0,0 +1,210 @@
+"""Durable SQLite-backed job queue with a bounded asyncio worker pool."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from . import metrics, shards
+from .database import (
+    claim_job,
+    complete_job,
+    enqueue_job,
+    fail_job,
+    get_job,
+    has_unfinished_jobs,
+    iter_shards,
+)
+from .env import env_float
+from .schemas import MealLogRequest
+
+logger = logging.getLogger("jobs")
+
+JobHandler = Callable[
+    [Dict[str, object]], Awaitable[Tuple[Dict[str, object], Optional[MealLogRequest]]]
+]
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+class WorkerPool:
+    """Run queued jobs with at most ``concurrency`` handlers in flight.
+
+    Jobs are leased for ``lease_seconds`` (longer than the provider timeout);
+    a worker only records a result while it still owns the lease, so a job is
+    never completed twice even if it is reclaimed after a crash.
+
+    Jobs live in the database of the user who submitted them. Workers poll
+    ``DB_PATH`` plus every user shard that may still hold an unfinished job:
+    all shards at start-up, then the ones jobs are submitted to, each dropped
+    again once it has nothing left to run.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, JobHandler],
+        concurrency: int,
+        lease_seconds: float,
+        max_attempts: int,
+        poll_seconds: float,
+    ):
+        self._handlers = handlers
+        self._concurrency = max(concurrency, 1)
+        self._lease_seconds = lease_seconds
+        self._max_attempts = max(max_attempts, 1)
+        self._poll_seconds = poll_seconds
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._instance = uuid.uuid4().hex[:8]
+        # Shards that may hold unfinished jobs; ``None`` is ``DB_PATH``.
+        self._scopes: Dict[Optional[str], None] = {None: None}
+        self._scopes_lock = threading.Lock()
+
+    def start(self) -> None:
+        for user_id in iter_shards():
+            self._scopes[user_id] = None
+        for number in range(self._concurrency):
+            worker = f"{os.getpid()}-{self._instance}-{number}"
+            self._tasks.append(asyncio.create_task(self._run_worker(worker)))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def submit(self, job_id: str, kind: str, payload: Dict[str, object]) -> Dict[str, object]:
+        # Under the lock so ``_claim`` cannot drop the scope between the
+        # insert and the scope being recorded.
+        with self._scopes_lock:
+            job = enqueue_job(job_id, kind, payload)
+            self._scopes[shards.current_user()] = None
+        self.wake()
+        return job
+
+    def _claim(self, worker: str) -> Optional[Dict[str, object]]:
+        for user_id in list(self._scopes):
+            with shards.user_scope(user_id):
+                job = claim_job(worker, self._lease_seconds, self._max_attempts)
+                if job is not None:
+                    job["user_id"] = user_id
+                    return job
+                if user_id is not None:
+                    with self._scopes_lock:
+                        if not has_unfinished_jobs():
+                            self._scopes.pop(user_id, None)
+        return None
+
+    async def _run_worker(self, worker: str) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                job = await asyncio.to_thread(self._claim, worker)
+            except Exception:
+                logger.exception("Claiming a job failed")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self._poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            with shards.user_scope(job["user_id"]):
+                await self._process(job, worker)
+
+    async def _process(self, job: Dict[str, object], worker: str) -> None:
+        handler = self._handlers.get(job["kind"])
+        if handler is None:
+            await asyncio.to_thread(
+                fail_job, job["id"], worker, f"Unknown job kind: {job['kind']}"
+            )
+            return
+        attempt = metrics.job_attempt.set(int(job["attempts"]))
+        try:
+            result, meal_log = await handler(job["payload"] or {})
+        except Exception as exc:
+            attempts = int(job["attempts"])
+            retry_at = None
+            if attempts < self._max_attempts:
+                retry_at = datetime.utcnow() + timedelta(seconds=2 ** attempts)
+            logger.warning("Job %s attempt %s failed: %s", job["id"], attempts, exc)
+            await asyncio.to_thread(fail_job, job["id"], worker, str(exc), retry_at)
+            return
+        finally:
+            metrics.job_attempt.reset(attempt)
+        stored = await asyncio.to_thread(complete_job, job["id"], worker, result, meal_log)
+        if stored is None:
+            logger.warning("Job %s lease was lost before completion; result discarded", job["id"])
+
+
+_pool: Optional[WorkerPool] = None
+
+
+def start(handlers: Dict[str, JobHandler]) -> None:
+    global _pool
+    _pool = WorkerPool(
+        handlers,
+        concurrency=int(env_float("JOBS_CONCURRENCY", 4)),
+        lease_seconds=env_float("JOBS_LEASE_SECONDS", 120.0),
+        max_attempts=int(env_float("JOBS_MAX_ATTEMPTS", 3)),
+        poll_seconds=env_float("JOBS_POLL_SECONDS", 1.0),
+    )
+    _pool.start()
+
+
+async def stop() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.stop()
+    _pool = None
+
+
+def submit(kind: str, payload: Dict[str, object]) -> Dict[str, object]:
+    if _pool is not None:
+        return _pool.submit(uuid.uuid4().hex, kind, payload)
+    return enqueue_job(uuid.uuid4().hex, kind, payload)
+
+
+def public_job(job: Dict[str, object]) -> Dict[str, object]:
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+async def job_events(job_id: str) -> AsyncIterator[str]:
+    """Server-sent events stream of status changes, closing on a terminal state."""
+    poll = env_float("JOBS_SSE_POLL_SECONDS", 0.5)
+    heartbeat = env_float("JOBS_SSE_HEARTBEAT_SECONDS", 15.0)
+    last_status = None
+    idle = 0.0
+    while True:
+        job = await asyncio.to_thread(get_job, job_id)
+        if job is None:
+            yield "event: error\ndata: {\"detail\": \"Job not found\"}\n\n"
+            return
+        if job["status"] != last_status:
+            last_status = job["status"]
+            idle = 0.0
+            yield f"event: status\ndata: {json.dumps(public_job(job))}\n\n"
+            if last_status in TERMINAL_STATUSES:
+                return
+        elif idle >= heartbeat:
+            idle = 0.0
+            yield ": keep-alive\n\n"
+        await asyncio.sleep(poll)
+        idle += poll
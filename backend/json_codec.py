@@ -0,0 +1,109 @@
+"""JSON encoding for stored blobs, API responses and OpenAI request bodies.
+
+Uses orjson, or msgspec, when one is installed and falls back to the
+standard library otherwise; neither is a hard requirement.
+``JSON_CODEC=json|orjson|msgspec`` picks one explicitly. All backends
+produce plain JSON that any of the others can read back, so switching
+codecs needs no migration; only whitespace differs (orjson and msgspec
+write compact output and raw UTF-8).
+
+Decoding errors are always ``json.JSONDecodeError`` so callers keep
+catching the same exception whichever codec runs.
+
+Hashes and cache keys that depend on the exact text (plan-cache and
+generation fingerprints, replay keys) keep using ``json.dumps`` with
+``sort_keys`` directly and are not routed through here.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Tuple, Union
+
+from starlette.responses import JSONResponse as _StarletteJSONResponse
+
+logger = logging.getLogger("json_codec")
+
+Encoder = Callable[[Any], bytes]
+Decoder = Callable[[Union[str, bytes]], Any]
+
+
+def _stdlib() -> Tuple[Encoder, Decoder]:
+    def encode(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    return encode, json.loads
+
+
+def _orjson() -> Tuple[Encoder, Decoder]:
+    import orjson
+
+    def encode(obj: Any) -> bytes:
+        # Integer dict keys are written as strings, like the stdlib does.
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    # ``orjson.JSONDecodeError`` already subclasses ``json.JSONDecodeError``.
+    return encode, orjson.loads
+
+
+def _msgspec() -> Tuple[Encoder, Decoder]:
+    import msgspec
+
+    encoder = msgspec.json.Encoder()
+
+    def decode(data: Union[str, bytes]) -> Any:
+        try:
+            return msgspec.json.decode(data)
+        except msgspec.DecodeError as exc:
+            text = data.decode("utf-8", "replace") if isinstance(data, bytes) else str(data)
+            raise json.JSONDecodeError(str(exc), text, 0) from exc
+
+    return encoder.encode, decode
+
+
+BACKENDS: Dict[str, Callable[[], Tuple[Encoder, Decoder]]] = {
+    "orjson": _orjson,
+    "msgspec": _msgspec,
+    "json": _stdlib,
+}
+
+
+def _select(requested: str) -> Tuple[str, Encoder, Decoder]:
+    names = [requested] if requested in BACKENDS else list(BACKENDS)
+    if requested not in ("", "auto") and requested not in BACKENDS:
+        logger.warning("Unknown JSON_CODEC %r; picking the first available codec", requested)
+    for name in names:
+        try:
+            encode, decode = BACKENDS[name]()
+        except ImportError:
+            if name == requested:
+                logger.warning("JSON_CODEC=%s is not installed; picking the first available codec", name)
+                return _select("auto")
+            continue
+        return name, encode, decode
+    return ("json", *_stdlib())
+
+
+NAME, _encode, _decode = _select(os.getenv("JSON_CODEC", "auto").lower())
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    return _encode(obj)
+
+
+def dumps(obj: Any) -> str:
+    """Encode ``obj`` as a JSON string, for TEXT columns."""
+    return _encode(obj).decode("utf-8")
+
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    return _decode(data)
+
+
+class JSONResponse(_StarletteJSONResponse):
+    """FastAPI's default response class, rendered with the selected codec."""
+
+    def render(self, content: Any) -> bytes:
+        return _encode(content)
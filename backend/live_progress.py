@@ -0,0 +1,293 @@
+"""Server-sent weekly progress updates fanned out from one in-process broker."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from collections import deque
+from datetime import date
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set, Tuple
+
+from .env import env_float
+from .meal_logic import build_weekly_progress
+
+logger = logging.getLogger("live_progress")
+
+PROGRESS_EVENTS = ("meal_logged", "meal_updated", "meal_deleted")
+
+Progress = Dict[str, Dict[str, Any]]
+
+
+def live_progress_enabled() -> bool:
+    return os.getenv("LIVE_PROGRESS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def _diff(previous: Progress, current: Progress) -> Progress:
+    changes: Progress = {}
+    for key, entry in current.items():
+        before = previous.get(key, {})
+        changed = {field: value for field, value in entry.items() if before.get(field) != value}
+        if changed:
+            changes[key] = changed
+    return changes
+
+
+def _frame(event: str, token: str, data: Dict[str, Any]) -> str:
+    return f"id: {token}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class _Subscriber:
+    def __init__(self, queue_size: int):
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=max(queue_size, 1))
+        self.needs_snapshot = False
+
+
+class ProgressBroker:
+    """Recompute weekly progress once per burst of writes and push the delta.
+
+    ``notify`` is the database change listener and may be called from any
+    thread. All other state is touched only on the event loop. Writes that
+    land while a computation is running fold into a single follow-up run.
+
+    Every delta carries a resume token ``<epoch>-<seq>``. A reconnecting
+    client replays missed deltas from a bounded history. When the history no
+    longer covers its token, or the process restarted, it gets a snapshot.
+    A subscriber whose queue fills up is treated the same way: its backlog is
+    dropped and replaced by one snapshot.
+    """
+
+    def __init__(self, queue_size: int, history_size: int):
+        self._queue_size = queue_size
+        self._epoch = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._history: Deque[Tuple[int, str]] = deque(maxlen=max(history_size, 1))
+        self._subscribers: Set[_Subscriber] = set()
+        self._progress: Optional[Progress] = None
+        self._week_start: Optional[date] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._dirty = False
+        self._snapshot_cache: Tuple[int, str] = (-1, "")
+        self.stats = {
+            "notifications": 0,
+            "skipped": 0,
+            "computations": 0,
+            "published": 0,
+            "snapshots": 0,
+            "resumed": 0,
+            "resyncs": 0,
+            "failed": 0,
+        }
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        for subscriber in list(self._subscribers):
+            self._close(subscriber)
+        self._subscribers.clear()
+        self._loop = None
+
+    def notify(self, event: str, payload: Dict[str, Any]) -> None:
+        loop = self._loop
+        if event not in PROGRESS_EVENTS or loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._changed, payload.get("meal_date"))
+
+    def token(self) -> str:
+        return f"{self._epoch}-{self._seq}"
+
+    def subscribe(self, resume: Optional[str] = None) -> _Subscriber:
+        subscriber = _Subscriber(self._queue_size)
+        self._subscribers.add(subscriber)
+        if self._progress is None:
+            subscriber.needs_snapshot = True
+            self._schedule()
+        elif not self._replay(subscriber, resume):
+            self._offer(subscriber, self._snapshot_frame())
+        return subscriber
+
+    def unsubscribe(self, subscriber: _Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "subscribers": len(self._subscribers),
+            "token": self.token(),
+            "history": len(self._history),
+            "computing": self._task is not None and not self._task.done(),
+        }
+
+    def _changed(self, meal_date: Optional[str]) -> None:
+        self.stats["notifications"] += 1
+        if (
+            meal_date
+            and self._week_start is not None
+            and meal_date < self._week_start.isoformat()
+        ):
+            # Back-dated entries outside this week cannot move its totals.
+            self.stats["skipped"] += 1
+            return
+        computing = self._task is not None and not self._task.done()
+        if not self._subscribers and not computing:
+            # Nobody is listening: forget the baseline instead of recomputing,
+            # so the next subscriber or resume starts from a fresh snapshot.
+            self._progress = None
+            self._history.clear()
+            return
+        self._schedule()
+
+    def _schedule(self) -> None:
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._refresh())
+
+    async def _refresh(self) -> None:
+        while self._dirty:
+            self._dirty = False
+            try:
+                progress, *_, week_start = await asyncio.to_thread(build_weekly_progress)
+            except Exception:
+                logger.exception("Recomputing weekly progress failed")
+                self.stats["failed"] += 1
+                return
+            self.stats["computations"] += 1
+            self._publish(progress, week_start)
+
+    def _publish(self, progress: Progress, week_start: date) -> None:
+        previous, self._progress = self._progress, progress
+        rolled_over = week_start != self._week_start
+        self._week_start = week_start
+        delta = None
+        if previous is not None and not rolled_over:
+            changes = _diff(previous, progress)
+            if changes:
+                self._seq += 1
+                delta = _frame(
+                    "delta",
+                    self.token(),
+                    {"week_start": week_start.isoformat(), "changes": changes},
+                )
+                self._history.append((self._seq, delta))
+                self.stats["published"] += 1
+        else:
+            self._seq += 1
+            self._history.clear()
+        snapshot = None
+        for subscriber in list(self._subscribers):
+            if subscriber.needs_snapshot or previous is None or rolled_over:
+                snapshot = snapshot or self._snapshot_frame()
+                subscriber.needs_snapshot = False
+                self._offer(subscriber, snapshot)
+            elif delta is not None:
+                self._offer(subscriber, delta)
+
+    def _snapshot_frame(self) -> str:
+        # Progress only changes together with ``_seq``, so one frame per seq
+        # serves every subscriber that joins or resyncs in between.
+        if self._snapshot_cache[0] != self._seq:
+            self.stats["snapshots"] += 1
+            frame = _frame(
+                "snapshot",
+                self.token(),
+                {"week_start": self._week_start.isoformat(), "progress": self._progress},
+            )
+            self._snapshot_cache = (self._seq, frame)
+        return self._snapshot_cache[1]
+
+    def _replay(self, subscriber: _Subscriber, resume: Optional[str]) -> bool:
+        epoch, _, seq = (resume or "").partition("-")
+        if epoch != self._epoch or not seq.isdigit():
+            return False
+        since = int(seq)
+        if since > self._seq:
+            return False
+        oldest = self._history[0][0] if self._history else self._seq + 1
+        if since + 1 < oldest:
+            return False
+        self.stats["resumed"] += 1
+        for number, frame in self._history:
+            if number > since:
+                self._offer(subscriber, frame)
+        return True
+
+    def _offer(self, subscriber: _Subscriber, frame: str) -> None:
+        try:
+            subscriber.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # A slow reader loses its backlog, not the other subscribers' latency.
+            self.stats["resyncs"] += 1
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(self._snapshot_frame())
+
+    def _close(self, subscriber: _Subscriber) -> None:
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+
+_broker: Optional[ProgressBroker] = None
+
+
+def start(loop: asyncio.AbstractEventLoop) -> bool:
+    global _broker
+    if not live_progress_enabled():
+        return False
+    _broker = ProgressBroker(
+        queue_size=int(env_float("LIVE_PROGRESS_QUEUE_SIZE", 32)),
+        history_size=int(env_float("LIVE_PROGRESS_HISTORY", 256)),
+    )
+    _broker.start(loop)
+    return True
+
+
+def stop() -> None:
+    global _broker
+    if _broker is not None:
+        _broker.stop()
+    _broker = None
+
+
+def active() -> bool:
+    return _broker is not None
+
+
+def notify_change(event: str, payload: Dict[str, Any]) -> None:
+    # Only the default database is tracked; user shards have no background copy.
+    if _broker is not None and payload.get("user_id") is None:
+        _broker.notify(event, payload)
+
+
+async def progress_events(resume: Optional[str] = None) -> AsyncIterator[str]:
+    """Server-sent events: one ``snapshot`` (or replayed deltas), then ``delta`` frames."""
+    broker = _broker
+    if broker is None:
+        return
+    heartbeat = env_float("LIVE_PROGRESS_HEARTBEAT_SECONDS", 15.0)
+    subscriber = broker.subscribe(resume)
+    try:
+        yield f"retry: {int(env_float('LIVE_PROGRESS_RETRY_MS', 3000))}\n\n"
+        while True:
+            try:
+                frame = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if frame is None:
+                return
+            yield frame
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+def stats() -> Dict[str, Any]:
+    if _broker is None:
+        return {"enabled": False}
+    return {"enabled": True, **_broker.snapshot()}
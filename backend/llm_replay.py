@@ -0,0 +1,278 @@
+"""Record and replay OpenAI Responses traffic from JSON-lines logs.
+
+Recordings use the ``_write_log`` line format: a ``request`` line carrying
+the request body, then a ``response`` line carrying either the response
+body or the error. ``logs/openai.log`` can be loaded as-is. Cassettes
+written here add a ``pair`` id to both lines so concurrent calls pair up
+exactly. Lines without one are paired first-in first-out per schema name,
+which the Responses API echoes back in ``text.format``.
+
+``OPENAI_REPLAY`` selects the mode:
+
+- ``off`` (default): recordings are not consulted.
+- ``replay``: answer only from recordings. A miss raises ``ReplayMiss``
+  and the network is never touched.
+- ``cache``: answer from recordings when they match and call the provider
+  otherwise. New responses are added to the store, and to
+  ``OPENAI_CASSETTE`` when it is set.
+- ``record``: always call the provider and append every pair to
+  ``OPENAI_CASSETTE``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .env import env_float
+
+logger = logging.getLogger("llm_replay")
+
+MODES = ("off", "replay", "cache", "record")
+DEFAULT_SOURCES = (Path(__file__).resolve().parent / "logs" / "openai.log",)
+# Requests older than this when a response arrives never got one (the client
+# times out after 60 s) and are not paired with it.
+MAX_PAIR_SECONDS = 300.0
+
+
+class ReplayMiss(RuntimeError):
+    """Raised in ``replay`` mode when no recording matches a request."""
+
+
+@dataclass
+class Recording:
+    name: str
+    request: Dict[str, Any]
+    status: int
+    body: Any
+    latency: float
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+
+def replay_mode() -> str:
+    mode = os.getenv("OPENAI_REPLAY", "off").lower()
+    return mode if mode in MODES else "off"
+
+
+def _format(request: Dict[str, Any]) -> Tuple[str, Any]:
+    fmt = (request.get("text") or {}).get("format") or {}
+    name, schema = fmt.get("name"), fmt.get("schema")
+    # Early logs nested the name inside ``schema`` ({"name": ..., "schema": {...}}).
+    if name is None and isinstance(schema, dict) and "schema" in schema:
+        name, schema = schema.get("name"), schema.get("schema")
+    return name or "", schema
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    """Exact-match key: model, input messages, schema name and schema.
+
+    Sampling knobs (temperature, top_p, seed) are left out so recordings made
+    before they were sent still match.
+    """
+    name, schema = _format(request)
+    blob = json.dumps(
+        {"model": request.get("model"), "input": request.get("input"), "name": name, "schema": schema},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _timestamp(entry: Dict[str, Any]) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(entry["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def parse_log(path: Path) -> Iterator[Recording]:
+    """Yield request/response pairs from a log or cassette file."""
+    pending: Dict[str, Dict[str, Any]] = {}
+    unpaired: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+    with path.open(encoding="utf-8") as handle:
+        for number, line in enumerate(handle, 1):
+            line = line.strip()
+            # Lines may carry a logger prefix before the JSON object.
+            start = line.find("{")
+            if start < 0:
+                continue
+            try:
+                entry = json.loads(line[start:])
+            except json.JSONDecodeError:
+                logger.warning("Skipping unreadable line %s:%s", path, number)
+                continue
+            direction = entry.get("direction")
+            if direction == "request" and isinstance(entry.get("payload"), dict):
+                if entry.get("pair"):
+                    pending[entry["pair"]] = entry
+                else:
+                    unpaired[_format(entry["payload"])[0]].append(entry)
+                continue
+            if direction != "response":
+                continue
+            request = pending.pop(entry["pair"], None) if entry.get("pair") else None
+            finished = _timestamp(entry)
+            if request is None:
+                body = entry.get("payload")
+                name = _format(body)[0] if isinstance(body, dict) else ""
+                for queue in unpaired.values():
+                    while queue and finished and (_timestamp(queue[0]) or finished) < finished - MAX_PAIR_SECONDS:
+                        queue.popleft()
+                queue = unpaired.get(name) or next((q for q in unpaired.values() if q), None)
+                if not queue:
+                    continue
+                request = queue.popleft()
+            started = _timestamp(request)
+            yield Recording(
+                name=_format(request["payload"])[0],
+                request=request["payload"],
+                status=int(entry.get("status") or 0),
+                body=entry.get("payload") if "payload" in entry else entry.get("error"),
+                latency=max(finished - started, 0.0) if started and finished else 0.0,
+            )
+
+
+class ReplayStore:
+    """Recordings by request key; successful responses win over errors."""
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max(max_entries, 1)
+        self._entries: "OrderedDict[str, Recording]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"loaded": 0, "hits": 0, "misses": 0, "recorded": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, recording: Recording) -> None:
+        key = request_key(recording.request)
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None and existing.ok and not recording.ok:
+                return
+            self._entries[key] = recording
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def lookup(self, request: Dict[str, Any]) -> Optional[Recording]:
+        key = request_key(request)
+        with self._lock:
+            recording = self._entries.get(key)
+            if recording is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return recording
+
+    def recordings(self) -> List[Recording]:
+        with self._lock:
+            return list(self._entries.values())
+
+    def by_name(self) -> Dict[str, int]:
+        counts: Dict[str, int] = defaultdict(int)
+        with self._lock:
+            for recording in self._entries.values():
+                counts[recording.name] += 1
+        return dict(counts)
+
+
+_store = ReplayStore(int(env_float("OPENAI_REPLAY_MAX_ENTRIES", 10_000)))
+_cassette_lock = threading.Lock()
+
+
+def sources() -> List[Path]:
+    raw = os.getenv("OPENAI_REPLAY_SOURCES")
+    if not raw:
+        return [path for path in DEFAULT_SOURCES if path.exists()]
+    return [Path(part) for part in raw.split(os.pathsep) if part]
+
+
+def load(paths: Optional[Iterable[Path]] = None) -> int:
+    """Load recordings into the store; used at startup to pre-warm it."""
+    loaded = 0
+    for path in paths if paths is not None else sources():
+        if not path.exists():
+            logger.warning("Replay source %s does not exist", path)
+            continue
+        for recording in parse_log(path):
+            _store.add(recording)
+            loaded += 1
+    _store.stats["loaded"] += loaded
+    return loaded
+
+
+def lookup(request: Dict[str, Any]) -> Optional[Recording]:
+    return _store.lookup(request)
+
+
+def simulate_latency(recording: Recording) -> None:
+    """Sleep for the recorded latency when ``OPENAI_REPLAY_LATENCY=recorded``.
+
+    ``OPENAI_REPLAY_LATENCY_SCALE`` shrinks it for quick load runs. This runs
+    on the worker thread that would otherwise wait on the network.
+    """
+    setting = os.getenv("OPENAI_REPLAY_LATENCY", "0")
+    if setting == "recorded":
+        delay = recording.latency * env_float("OPENAI_REPLAY_LATENCY_SCALE", 1.0)
+    else:
+        try:
+            delay = float(setting)
+        except ValueError:
+            delay = 0.0
+    if delay > 0:
+        time.sleep(delay)
+
+
+def record(request: Dict[str, Any], status: int, body: Any, latency: float) -> None:
+    """Keep a live exchange in the store and append it to ``OPENAI_CASSETTE``."""
+    mode = replay_mode()
+    if mode not in ("cache", "record"):
+        return
+    recording = Recording(_format(request)[0], request, status, body, latency)
+    if mode == "cache":
+        _store.add(recording)
+    _store.stats["recorded"] += 1
+    cassette = os.getenv("OPENAI_CASSETTE")
+    if not cassette:
+        return
+    pair = uuid.uuid4().hex
+    finished = datetime.utcnow()
+    started = finished - timedelta(seconds=latency)
+    response = {"timestamp": finished.isoformat(), "direction": "response", "pair": pair, "status": status}
+    response["payload" if status < 400 else "error"] = body
+    lines = [
+        json.dumps({"timestamp": started.isoformat(), "direction": "request", "pair": pair, "payload": request}),
+        json.dumps(response),
+    ]
+    path = Path(cassette)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _cassette_lock, path.open("a", encoding="utf-8") as handle:
+        handle.write("\n".join(lines) + "\n")
+
+
+def recordings() -> List[Recording]:
+    return _store.recordings()
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "mode": replay_mode(),
+        "entries": len(_store),
+        "by_name": _store.by_name(),
+        **_store.stats,
+    }
@@ -1,21 +1,88 @@
-"""Manual meal logging powered by OpenAI nutrition estimation."""
+"""Manual meal logging powered by the local food table or OpenAI estimation."""
 
 from __future__ import annotations
 
+import asyncio
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from . import food_db
 from .database import log_meal
 from .openai_utils import estimate_manual_nutrition
 from .schemas import ManualMealRequest, MealLogRequest
 
 
 async def log_manual_meal(payload: ManualMealRequest) -> dict:
+    log_payload, result = await estimate_manual_meal(payload)
+    # ``log_meal`` blocks on the write queue; keep it off the event loop.
+    record_id = await asyncio.to_thread(log_meal, log_payload)
+    return {**result, "id": record_id}
+
+
+def stamp_reported_time(payload: ManualMealRequest) -> ManualMealRequest:
+    """Fill in the date and time the meal was reported, before it is queued.
+
+    ``log_meal`` would otherwise use the time the job runs, which for a job
+    queued or retried past midnight is the wrong day.
+    """
+    now = datetime.now()
+    return payload.model_copy(
+        update={
+            "meal_date": payload.meal_date or now.date(),
+            "meal_time": payload.meal_time or now.strftime("%H:%M"),
+        }
+    )
+
+
+def log_local_manual_meal(payload: ManualMealRequest) -> Optional[dict]:
+    """Log the entry straight away when the local food table can answer it."""
+    local = estimate_local_manual_meal(payload)
+    if local is None:
+        return None
+    log_payload, result = local
+    record_id = log_meal(log_payload)
+    return {**result, "id": record_id}
+
+
+def estimate_local_manual_meal(
+    payload: ManualMealRequest,
+) -> Optional[Tuple[MealLogRequest, Dict[str, object]]]:
+    match = food_db.estimate(
+        payload.meal_name, payload.description, payload.approximate_weight
+    )
+    if match is None:
+        return None
+    log_payload, result = _build_log(payload, match["nutrition"], "local")
+    result["match"] = {
+        "food": match["food"],
+        "confidence": match["confidence"],
+        "grams": match["grams"],
+    }
+    return log_payload, result
+
+
+async def estimate_manual_meal(
+    payload: ManualMealRequest,
+    try_local: bool = True,
+) -> Tuple[MealLogRequest, Dict[str, object]]:
+    if try_local:
+        local = estimate_local_manual_meal(payload)
+        if local is not None:
+            return local
     estimate = await estimate_manual_nutrition(
         meal_name=payload.meal_name,
         meal_type=payload.meal_type,
         description=payload.description,
         approximate_weight=payload.approximate_weight,
     )
+    return _build_log(payload, estimate.get("nutrition", {}), "openai")
+
 
-    nutrition_profile = estimate.get("nutrition", {})
+def _build_log(
+    payload: ManualMealRequest,
+    nutrition_profile: Dict[str, float],
+    source: str,
+) -> Tuple[MealLogRequest, Dict[str, object]]:
     calories = float(nutrition_profile.get("calories", 0))
 
     log_payload = MealLogRequest(
@@ -28,11 +95,19 @@ async def log_manual_meal(payload: ManualMealRequest) -> dict:
         was_suggested=False,
         notes=f"Manual entry: {payload.description} | Portion: {payload.approximate_weight}",
     )
-
-    record_id = log_meal(log_payload)
-    return {
+    return log_payload, {
         "success": True,
-        "id": record_id,
         "meal_name": payload.meal_name,
         "nutrition": nutrition_profile,
+        "source": source,
     }
+
+
+async def run_manual_meal_job(
+    job_payload: Dict[str, object],
+) -> Tuple[Dict[str, object], MealLogRequest]:
+    # The route already tried the local table before queueing the job.
+    log_payload, result = await estimate_manual_meal(
+        ManualMealRequest.model_validate(job_payload), try_local=False
+    )
+    return result, log_payload
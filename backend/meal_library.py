@@ -0,0 +1,145 @@
+"""Decoded saved-recipe library kept in memory.
+
+Plan generation, the recommender, the week planner and ``GET
+/api/meals/custom`` all read saved recipes. Instead of sorting
+``user_meals`` and decoding four JSON columns per row on every call, each
+user shard's newest ``MEAL_LIBRARY_CACHE_SIZE`` recipes (default 2000) are
+kept decoded in memory.
+
+Every read checks ``MAX(id)`` and, when recipes were saved since the last
+read (by this process or any other), fetches and decodes just those rows
+and merges them in. Recipes are never edited or deleted one at a time, so
+a lower ``MAX(id)``, as after restoring an older backup, rebuilds the
+library from scratch. Pages past the cached recipes, and a full listing
+of a library larger than the cache, still go to SQLite.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .database import (
+    custom_meal_library_version,
+    db_path,
+    latest_custom_meal_id,
+    list_custom_meals,
+    list_custom_meals_after,
+)
+from .env import env_int
+
+# One library per database file (so per user shard), least recently used first.
+MAX_LIBRARIES = 32
+
+
+def cache_size() -> int:
+    return max(env_int("MEAL_LIBRARY_CACHE_SIZE", 2000), 0)
+
+
+class _Library:
+    def __init__(self) -> None:
+        # Newest first, in ``list_custom_meals`` order; ``keys`` holds the
+        # ``(created_at, id)`` sort key of each entry. Both lists are replaced,
+        # never mutated, so readers can keep a reference.
+        self.meals: List[Dict[str, object]] = []
+        self.keys: List[Tuple[str, int]] = []
+        self.total = 0
+        self.last_id = 0
+
+    def merge(self, added: int, rows: List[Dict[str, object]], last_id: int, size: int) -> None:
+        entries = list(zip(self.keys, self.meals))
+        for row in rows:
+            key = (str(row.pop("created_at") or ""), int(row["id"]))
+            entries.append((key, row))
+        entries.sort(key=lambda entry: entry[0], reverse=True)
+        del entries[size:]
+        self.keys = [key for key, _ in entries]
+        self.meals = [meal for _, meal in entries]
+        self.total += added
+        self.last_id = last_id
+
+
+_libraries: "OrderedDict[str, _Library]" = OrderedDict()
+_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0, "loads": 0, "rows_decoded": 0}
+
+
+def _current() -> Optional[Tuple[List[Dict[str, object]], int, int]]:
+    """``(meals, total, last_id)`` for the calling user, brought up to date with ``user_meals``."""
+    size = cache_size()
+    if not size:
+        return None
+    last_id = latest_custom_meal_id()
+    path = str(db_path())
+    with _lock:
+        library = _libraries.get(path)
+        if library is None or last_id < library.last_id:
+            library = _Library()
+            _libraries[path] = library
+            _counters["loads"] += 1
+        if last_id > library.last_id:
+            added, rows = list_custom_meals_after(library.last_id, last_id, size)
+            library.merge(added, rows, last_id, size)
+            _counters["rows_decoded"] += len(rows)
+        _libraries.move_to_end(path)
+        while len(_libraries) > MAX_LIBRARIES:
+            _libraries.popitem(last=False)
+        return library.meals, library.total, library.last_id
+
+
+def _count(hit: bool) -> None:
+    with _lock:
+        _counters["hits" if hit else "misses"] += 1
+
+
+def _list(
+    current: Optional[Tuple[List[Dict[str, object]], int, int]], limit: Optional[int], offset: int
+) -> List[Dict[str, object]]:
+    if current is not None:
+        meals, total, _ = current
+        end = total if limit is None else offset + limit
+        if end <= len(meals) or len(meals) == total:
+            _count(True)
+            # Shallow copies, so callers can add keys without touching the cache.
+            return [dict(meal) for meal in meals[offset:end]]
+    _count(False)
+    return list_custom_meals(limit=limit, offset=offset)
+
+
+def list_meals(limit: Optional[int] = 10, offset: int = 0) -> List[Dict[str, object]]:
+    """Same rows as ``database.list_custom_meals``, served from memory when cached."""
+    return _list(_current(), limit, offset)
+
+
+def page(limit: int, offset: int = 0) -> Tuple[int, List[Dict[str, object]]]:
+    """The library size and one page of ``list_meals``, from a single freshness check."""
+    current = _current()
+    total = current[1] if current is not None else custom_meal_library_version()[0]
+    return total, _list(current, limit, offset)
+
+
+def snapshot() -> Tuple[Tuple[int, int], Optional[List[Dict[str, object]]]]:
+    """``(version, meals)`` for the whole library, versioned like ``custom_meal_library_version``.
+
+    The meals are the cached dicts themselves; treat them as read-only.
+    ``meals`` is ``None`` when the library is larger than the cache, for the
+    caller to load with ``list_custom_meals(limit=None)`` if its copy is stale.
+    """
+    current = _current()
+    if current is None:
+        _count(False)
+        return custom_meal_library_version(), None
+    meals, total, last_id = current
+    _count(len(meals) == total)
+    return (total, last_id), meals if len(meals) == total else None
+
+
+def stats() -> Dict[str, object]:
+    with _lock:
+        return {
+            **_counters,
+            "cache_size": cache_size(),
+            "libraries": len(_libraries),
+            "cached_meals": sum(len(library.meals) for library in _libraries.values()),
+        }
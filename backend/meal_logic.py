@@ -2,19 +2,33 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
+import logging
+import os
 from datetime import date, datetime
-from typing import Dict, List, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
 from .constants import DEFAULT_WEEKLY_GOALS, NUTRIENT_METADATA, SCORING_NUTRIENTS
 from .database import (
     compute_nutrient_totals,
+    get_dashboard_snapshot,
+    get_latest_meal_plan,
     get_preferences,
     get_weekly_snapshot,
-    list_custom_meals,
+    save_meal_plan,
 )
+from . import json_codec, meal_library, plan_cache, speculation
 from .openai_utils import generate_meal_suggestions
-from .schemas import MealGenerationRequest
+from .recommender import get_library_index, rank_for_slots, recommend_plan
+from .schemas import MealGenerationRequest, WeekPlanRequest
+from .week_planner import optimize_week, plan_days
+
+
+logger = logging.getLogger("meal_logic")
+
+PLAN_FOCUS_MIN_OVERLAP = 0.5
 
 
 def build_weekly_progress() -> Tuple[
@@ -25,6 +39,13 @@ def build_weekly_progress() -> Tuple[
     date,
 ]:
     targets, logs, week_start = get_weekly_snapshot()
+    progress, totals = _progress_from_logs(targets, logs)
+    return progress, targets, totals, logs, week_start
+
+
+def _progress_from_logs(
+    targets: Dict[str, float], logs: List[Dict[str, object]]
+) -> Tuple[Dict[str, Dict[str, float]], Dict[str, float]]:
     totals = compute_nutrient_totals(logs)
     progress = {}
     for key, meta in NUTRIENT_METADATA.items():
@@ -40,21 +61,414 @@ def build_weekly_progress() -> Tuple[
             progress[key]["name"] = meta["name"]
         if meta.get("is_limit"):
             progress[key]["isLimit"] = True
-    return progress, targets, totals, logs, week_start
+    return progress, totals
+
+
+def format_meal_logs(meals: List[Dict[str, object]]) -> List[Dict[str, object]]:
+    """Shape raw ``meal_logs`` rows for the recent-meals list, overrides applied."""
+    formatted = []
+    for meal in meals:
+        try:
+            base_nutrition = json_codec.loads(meal.get("nutrition") or "{}")
+        except (TypeError, json.JSONDecodeError):
+            base_nutrition = {}
+        override_raw = meal.get("override_nutrition")
+        override_nutrition = {}
+        if override_raw:
+            try:
+                override_nutrition = json_codec.loads(override_raw)
+            except (TypeError, json.JSONDecodeError):
+                override_nutrition = {}
+        effective_nutrition = base_nutrition.copy()
+        effective_nutrition.update(override_nutrition)
+        calories = effective_nutrition.get("calories", meal.get("calories", 0))
+        meal_date_str = meal.get("meal_date")
+        if meal_date_str:
+            parsed_date = datetime.strptime(meal_date_str, "%Y-%m-%d")
+            day_label = parsed_date.strftime("%a")
+            date_label = parsed_date.strftime("%b %d")
+        else:
+            day_label = ""
+            date_label = ""
+        formatted.append(
+            {
+                "id": meal["id"],
+                "time": meal.get("meal_time", "00:00"),
+                "meal": meal.get("meal_name"),
+                "calories": calories,
+                "type": (meal.get("meal_type") or "meal").capitalize(),
+                "day": day_label,
+                "date": date_label,
+                "hasOverride": bool(override_nutrition),
+            }
+        )
+    return formatted
+
+
+def build_dashboard(limit: int = 5, days: int = 7, offset: int = 0) -> Dict[str, object]:
+    """Weekly progress, recent meals and preferences from one consistent read."""
+    snapshot = get_dashboard_snapshot(limit=limit, days=days, offset=offset)
+    progress, _ = _progress_from_logs(snapshot["targets"], snapshot["logs"])
+    return {
+        "progress": progress,
+        "recent_meals": format_meal_logs(snapshot["recent_meals"]),
+        "preferences": snapshot["preferences"],
+        "week_start": snapshot["week_start"].isoformat(),
+    }
 
 
-async def generate_meal_plan(payload: MealGenerationRequest) -> Dict[str, object]:
+async def generate_meal_plan(
+    payload: MealGenerationRequest, deadline_ms: Optional[float] = None
+) -> Dict[str, object]:
+    context = _load_generation_context(payload)
+    if payload.prefer_library:
+        library_plan = recommend_plan(context)
+        if library_plan is not None:
+            lunch, dinner = library_plan
+            return _format_plan(context, lunch, dinner, "library")
+    stored = _serve_stored_plan(context, payload.days)
+    if stored is not None:
+        return stored
+    if payload.days and payload.days > 1:
+        return await _within_deadline(
+            _generate_multi_day_plan(context, payload.days),
+            deadline_ms,
+            lambda: _fallback_multi_day(context, payload.days),
+        )
+    fingerprint = generation_fingerprint(context)
+    if speculation.active():
+        precomputed = speculation.lookup(fingerprint)
+        if precomputed is not None:
+            return dict(precomputed, speculative=True)
+    return await _within_deadline(
+        _generate_single_day(context),
+        deadline_ms,
+        lambda: _fallback_plan(context),
+        on_late_result=lambda result: speculation.remember(fingerprint, result),
+    )
+
+
+_background_generations: Set[asyncio.Future] = set()
+
+
+async def _within_deadline(
+    generation: Awaitable[Dict[str, object]],
+    deadline_ms: Optional[float],
+    fallback: Callable[[], Dict[str, object]],
+    on_late_result: Optional[Callable[[Dict[str, object]], None]] = None,
+) -> Dict[str, object]:
+    """Await ``generation`` for at most ``deadline_ms``, then serve ``fallback``.
+
+    A late generation keeps running in the background so its result still
+    lands in the plan cache (and ``on_late_result``) for the next request.
+    """
+    if not deadline_ms:
+        return await generation
+    task = asyncio.ensure_future(generation)
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), deadline_ms / 1000)
+    except asyncio.TimeoutError:
+        pass
+    _background_generations.add(task)
+
+    def _settle(done: asyncio.Future) -> None:
+        _background_generations.discard(done)
+        if done.cancelled():
+            return
+        if done.exception() is not None:
+            logger.warning("Background generation failed: %s", done.exception())
+            return
+        if on_late_result is not None:
+            on_late_result(done.result())
+
+    task.add_done_callback(_settle)
+    return fallback()
+
+
+def _fallback_plan(context: Dict[str, object]) -> Dict[str, object]:
+    library_plan = recommend_plan(context, min_score=float("-inf"))
+    if library_plan is not None:
+        lunch, dinner = library_plan
+    else:
+        lunch = _template_meal(context, "lunch")
+        dinner = _template_meal(context, "dinner")
+    return _format_plan(context, lunch, dinner, "fallback")
+
+
+def _fallback_multi_day(context: Dict[str, object], days: int) -> Dict[str, object]:
+    dates = plan_days(context["week_start"])[:days]
+    day_targets = _plan_calorie_targets(context, dates)
+    if len(get_library_index()) >= 2:
+        plan = optimize_week(context, dates, time_budget_ms=50)
+        entries = [
+            dict(entry, calorie_targets=target["calorie_targets"])
+            for entry, target in zip(plan["days"], day_targets)
+        ]
+    else:
+        entries = [
+            {
+                "date": day.isoformat(),
+                "day": day.strftime("%a"),
+                "lunch": _template_meal(context, "lunch"),
+                "dinner": _template_meal(context, "dinner"),
+                "calorie_targets": target["calorie_targets"],
+            }
+            for day, target in zip(dates, day_targets)
+        ]
+    return _format_multi_day(context, entries, "fallback")
+
+
+def _template_meal(context: Dict[str, object], meal_type: str) -> Dict[str, object]:
+    calories = context[f"{meal_type}_calories"]
+    focus = ", ".join(context["focus_labels"][:3]) or "balanced nutrition"
+    return {
+        "name": f"Build-your-own {meal_type}",
+        "description": f"Aim for about {calories:.0f} kcal with foods rich in {focus}.",
+        "meal_type": meal_type,
+        "calories": calories,
+        "prepTime": context.get("cooking_time_preference") or 30,
+        "ingredients": list(context["preferences"]),
+        "instructions": [],
+        "nutrition": {},
+    }
+
+
+def speculation_inputs() -> Tuple[str, Dict[str, object]]:
+    context = _load_generation_context(MealGenerationRequest())
+    return generation_fingerprint(context), context
+
+
+async def precompute_meal_plan(context: Dict[str, object]) -> Dict[str, object]:
+    return await _generate_single_day(context)
+
+
+def generation_fingerprint(context: Dict[str, object]) -> str:
+    """Hash every context field that feeds the single-day prompt."""
+    blob = json.dumps(
+        {
+            "date": date.today().isoformat(),
+            "remaining": context["remaining"],
+            "preferences": context["preferences"],
+            "restrictions": context["restrictions"],
+            "custom_meals": context["custom_meals"],
+            "recent_logs": context["recent_logs"],
+            "lunch_calories": context["lunch_calories"],
+            "dinner_calories": context["dinner_calories"],
+            "limit_guidance": context["limit_guidance"],
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+async def _generate_single_day(context: Dict[str, object]) -> Dict[str, object]:
+    signature = plan_cache.plan_signature(context) if plan_cache.cache_enabled() else None
+    if signature:
+        cached = plan_cache.lookup(signature)
+        if cached is not None:
+            lunch, dinner, short = cached
+            if short:
+                _fill_plan_cache(context, signature)
+            return _format_plan(context, lunch, dinner, "cache")
+    messages = _build_generation_messages(context)
+    ai_response = await generate_meal_suggestions(messages)
+    if signature:
+        plan_cache.store(signature, ai_response.get("lunch"), ai_response.get("dinner"))
+    return _format_plan(
+        context, ai_response.get("lunch"), ai_response.get("dinner"), "openai"
+    )
+
+
+def _fill_plan_cache(context: Dict[str, object], signature: str) -> None:
+    """Generate one more variant for ``signature`` without holding up the caller."""
+    if not plan_cache.begin_fill(signature):
+        return
+
+    async def _fill() -> None:
+        try:
+            ai_response = await generate_meal_suggestions(_build_generation_messages(context))
+            await asyncio.to_thread(
+                plan_cache.store, signature, ai_response.get("lunch"), ai_response.get("dinner")
+            )
+        finally:
+            plan_cache.end_fill(signature)
+
+    task = asyncio.ensure_future(_fill())
+    _background_generations.add(task)
+
+    def _settle(done: asyncio.Future) -> None:
+        _background_generations.discard(done)
+        if not done.cancelled() and done.exception() is not None:
+            logger.warning("Plan cache fill failed: %s", done.exception())
+
+    task.add_done_callback(_settle)
+
+
+async def _generate_multi_day_plan(
+    context: Dict[str, object], days: int
+) -> Dict[str, object]:
+    dates = plan_days(context["week_start"])[:days]
+    day_targets = _plan_calorie_targets(context, dates)
+    messages = _build_generation_messages(context, day_targets)
+    ai_response = await generate_meal_suggestions(messages, days=len(dates))
+    generated = ai_response.get("days") or []
+    entries = []
+    for position, day in enumerate(dates):
+        meals = generated[position] if position < len(generated) else {}
+        entries.append(
+            {
+                "date": day.isoformat(),
+                "day": day.strftime("%a"),
+                "lunch": meals.get("lunch"),
+                "dinner": meals.get("dinner"),
+                "calorie_targets": day_targets[position]["calorie_targets"],
+            }
+        )
+    plan = {
+        "days": entries,
+        "focus_keys": [entry["key"] for entry in context["focus_details"]],
+        "daily_remaining": _daily_remaining(context, plan_days(context["week_start"])),
+        "generated_at": datetime.utcnow().isoformat(),
+    }
+    plan_id = save_meal_plan(context["week_start"], _plan_fingerprint(context), plan)
+    return _format_multi_day(context, entries, "openai", plan_id)
+
+
+def _serve_stored_plan(
+    context: Dict[str, object], days: Optional[int]
+) -> Optional[Dict[str, object]]:
+    plan = get_latest_meal_plan(context["week_start"], _plan_fingerprint(context))
+    if not plan:
+        return None
+    today = date.today().isoformat()
+    entries = [entry for entry in plan.get("days", []) if entry.get("date", "") >= today]
+    if not entries or entries[0]["date"] != today:
+        return None
+    if days and len(entries) < min(days, len(plan_days(context["week_start"]))):
+        return None
+    if _plan_diverged(context, plan, entries[0]):
+        return None
+    entries = entries[:days] if days else entries[:1]
+    return _format_multi_day(context, entries, "stored_plan", plan["plan_id"])
+
+
+def _plan_diverged(
+    context: Dict[str, object], plan: Dict[str, object], entry: Dict[str, object]
+) -> bool:
+    """Compare the per-day calorie budget at planning time with the one implied by current logs."""
+    planned = float(plan.get("daily_remaining") or 0)
+    current = _daily_remaining(context, plan_days(context["week_start"]))
+    if abs(current - planned) / max(planned, 1.0) > _plan_divergence_threshold():
+        return True
+    planned_focus = set(plan.get("focus_keys") or [])
+    current_focus = {item["key"] for item in context["focus_details"]}
+    union = planned_focus | current_focus
+    if union and len(planned_focus & current_focus) / len(union) < PLAN_FOCUS_MIN_OVERLAP:
+        return True
+    return False
+
+
+def _daily_remaining(context: Dict[str, object], dates: List[date]) -> float:
+    return float(context["remaining"].get("calories", 0)) / max(len(dates), 1)
+
+
+def _plan_divergence_threshold() -> float:
+    try:
+        return float(os.getenv("PLAN_DIVERGENCE_THRESHOLD", "0.15"))
+    except ValueError:
+        return 0.15
+
+
+def _plan_fingerprint(context: Dict[str, object]) -> str:
+    blob = json.dumps(
+        {
+            "preferences": sorted(str(item).lower() for item in context["preferences"]),
+            "restrictions": sorted(str(item).lower() for item in context["restrictions"]),
+        }
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _format_multi_day(
+    context: Dict[str, object],
+    entries: List[Dict[str, object]],
+    source: str,
+    plan_id: Optional[int] = None,
+) -> Dict[str, object]:
+    first = entries[0] if entries else {}
+    response = _format_plan(context, first.get("lunch"), first.get("dinner"), source)
+    if first:
+        response["calorie_targets"] = first["calorie_targets"]
+    response["days"] = entries
+    response["plan_id"] = plan_id
+    return response
+
+
+def recommend_meals(limit: int = 5, meal_type: Optional[str] = None) -> Dict[str, object]:
+    context = _load_generation_context(MealGenerationRequest())
+    meal_types = [meal_type] if meal_type else ["lunch", "dinner"]
+    return {
+        "suggestions": rank_for_slots(context, limit, meal_types),
+        "focus": {
+            "labels": context["focus_labels"],
+            "deficits": context["focus_details"],
+        },
+        "calorie_targets": {
+            "lunch": context["lunch_calories"],
+            "dinner": context["dinner_calories"],
+        },
+    }
+
+
+def plan_week(payload: WeekPlanRequest) -> Dict[str, object]:
+    context = _load_generation_context(
+        MealGenerationRequest(restrictions=payload.restrictions)
+    )
+    days = plan_days(context["week_start"])
+    plan = optimize_week(
+        context,
+        days,
+        beam_width=payload.beam_width,
+        candidates_per_slot=payload.candidates_per_slot,
+        time_budget_ms=payload.time_budget_ms,
+    )
+    plan.update(
+        {
+            "source": "planner",
+            "focus": {
+                "labels": context["focus_labels"],
+                "deficits": context["focus_details"],
+            },
+            "calorie_targets": {
+                "lunch": context["lunch_calories"],
+                "dinner": context["dinner_calories"],
+            },
+            "generated_at": datetime.utcnow().isoformat(),
+        }
+    )
+    return plan
+
+
+def _load_generation_context(payload: MealGenerationRequest) -> Dict[str, object]:
     progress, targets, totals, logs, week_start = build_weekly_progress()
     stored_preferences = get_preferences()
-    custom_meals = list_custom_meals(limit=12)
-    context = _prepare_generation_context(
+    custom_meals = meal_library.list_meals(limit=12)
+    return _prepare_generation_context(
         payload, progress, targets, totals, logs, week_start, stored_preferences, custom_meals
     )
-    messages = _build_generation_messages(context)
-    ai_response = await generate_meal_suggestions(messages)
+
+
+def _format_plan(
+    context: Dict[str, object],
+    lunch: Optional[Dict[str, object]],
+    dinner: Optional[Dict[str, object]],
+    source: str,
+) -> Dict[str, object]:
     return {
-        "lunch": ai_response.get("lunch"),
-        "dinner": ai_response.get("dinner"),
+        "lunch": lunch,
+        "dinner": dinner,
+        "source": source,
         "focus": {
             "labels": context["focus_labels"],
             "deficits": context["focus_details"],
@@ -147,11 +561,15 @@ def _prepare_generation_context(
         for meal in custom_meals
     ]
     return {
+        "targets": targets,
         "preferences": preferred_source,
         "restrictions": restriction_source,
         "focus_labels": focus_labels,
         "focus_details": focus_details,
         "remaining": remaining,
+        "remaining_ratios": remaining_ratios,
+        "cooking_time_preference": stored_preferences.get("cooking_time_preference"),
+        "week_start": week_start,
         "progress": progress,
         "lunch_calories": lunch_calories,
         "dinner_calories": dinner_calories,
@@ -161,23 +579,26 @@ def _prepare_generation_context(
     }
 
 
-def _build_generation_messages(context: Dict[str, object]) -> List[Dict[str, str]]:
+def _build_generation_messages(
+    context: Dict[str, object],
+    day_targets: Optional[List[Dict[str, object]]] = None,
+) -> List[Dict[str, str]]:
     focus_text = ", ".join(context["focus_labels"]) or "balanced coverage"
-    json_blob = json.dumps(
-        {
-            "remaining_needs": context["remaining"],
-            "preferences": context["preferences"],
-            "restrictions": context["restrictions"],
-            "custom_meals": context["custom_meals"],
-            "recent_logs": context["recent_logs"],
-            "targets": {
-                "lunch_calories": context["lunch_calories"],
-                "dinner_calories": context["dinner_calories"],
-            },
-            "limit_nutrients": context["limit_guidance"],
+    data = {
+        "remaining_needs": context["remaining"],
+        "preferences": context["preferences"],
+        "restrictions": context["restrictions"],
+        "custom_meals": context["custom_meals"],
+        "recent_logs": context["recent_logs"],
+        "targets": {
+            "lunch_calories": context["lunch_calories"],
+            "dinner_calories": context["dinner_calories"],
         },
-        indent=2,
-    )
+        "limit_nutrients": context["limit_guidance"],
+    }
+    if day_targets:
+        data["targets"] = day_targets
+    json_blob = json.dumps(data, indent=2)
     limit_text = (
         ", ".join(
             f"{item['label']} (stay under {item['max']}{item['unit']}, ~{item['remaining_buffer']}{item['unit']} remaining)"
@@ -185,9 +606,18 @@ def _build_generation_messages(context: Dict[str, object]) -> List[Dict[str, str
         )
         or "standard upper limits"
     )
+    if day_targets:
+        dates = ", ".join(entry["date"] for entry in day_targets)
+        task = (
+            f"Plan nourishing lunch and dinner meals for each of these {len(day_targets)} days: {dates}. "
+            "Return one entry per date in order, vary recipes across days, and hit each day's calorie targets "
+            "while closing the remaining weekly gaps over the whole plan.\n"
+        )
+    else:
+        task = "Plan two nourishing meals (lunch and dinner) for today's nutrition gaps.\n"
     user_prompt = (
-        "Plan two nourishing meals (lunch and dinner) for today's nutrition gaps.\n"
-        f"Focus especially on: {focus_text}.\n"
+        task
+        + f"Focus especially on: {focus_text}.\n"
         f"Avoid pushing upper-limit nutrients: {limit_text}. Treat their remaining buffers as ceilings, not goals.\n"
         "Use the provided JSON data as the single source of truth and respond with JSON only."
         f"\n\nDATA:\n{json_blob}"
@@ -209,13 +639,32 @@ def _daily_calorie_targets(
     targets: Dict[str, float], totals: Dict[str, float], week_start: date
 ) -> Tuple[float, float]:
     weekly_target = float(targets.get("calories", DEFAULT_WEEKLY_GOALS["calories"]))
-    daily_default = weekly_target / 7
     today = date.today()
     days_elapsed = max((today - week_start).days, 0)
     days_elapsed = min(days_elapsed, 6)
     days_remaining = max(7 - (days_elapsed + 1), 1)
     remaining = max(weekly_target - float(totals.get("calories", 0)), 0)
+    return _split_daily_calories(weekly_target, remaining, days_remaining)
 
+
+def _plan_calorie_targets(
+    context: Dict[str, object], dates: List[date]
+) -> List[Dict[str, object]]:
+    weekly_target = float(
+        context["targets"].get("calories", DEFAULT_WEEKLY_GOALS["calories"])
+    )
+    remaining = float(context["remaining"].get("calories", 0))
+    lunch, dinner = _split_daily_calories(weekly_target, remaining, max(len(dates), 1))
+    return [
+        {"date": day.isoformat(), "calorie_targets": {"lunch": lunch, "dinner": dinner}}
+        for day in dates
+    ]
+
+
+def _split_daily_calories(
+    weekly_target: float, remaining: float, days_remaining: int
+) -> Tuple[float, float]:
+    daily_default = weekly_target / 7
     if remaining <= 0:
         planned_daily = daily_default * 0.75
     else:
@@ -0,0 +1,324 @@
+"""In-process counters and histograms rendered in Prometheus text format.
+
+Recording is a dict lookup and a few additions under a lock. Nothing is
+formatted until ``/metrics`` is scraped, so an unscraped process only pays
+for the increments. ``METRICS_ENABLED=0`` removes the instrumentation
+entirely: database functions are left unwrapped and the middleware passes
+requests straight through.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+DB_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0,
+)
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 45.0, 60.0, 90.0, 120.0)
+
+Labels = Tuple[str, ...]
+
+
+def metrics_enabled() -> bool:
+    return os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+ENABLED = metrics_enabled()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Labels, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in values:
+            lines.append(
+                f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per series: non-cumulative bucket counts (last slot is +Inf), sum.
+        self._series: Dict[Labels, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Labels, value: float) -> None:
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            rendered = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{rendered} {_format_value(round(total, 9))}")
+            lines.append(f"{self.name}_count{rendered} {cumulative}")
+        return lines
+
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to sending its response headers.",
+    ("method", "route", "status"),
+)
+DB_LATENCY = Histogram(
+    "db_call_duration_seconds",
+    "Wall time of each database.py function call.",
+    ("function",),
+    DB_BUCKETS,
+)
+DB_ROWS_READ = Counter(
+    "db_rows_read_total", "Rows fetched by each database.py function.", ("function",)
+)
+DB_ROWS_WRITTEN = Counter(
+    "db_rows_written_total",
+    "Rows inserted, updated or deleted by each database.py function.",
+    ("function",),
+)
+DB_ERRORS = Counter(
+    "db_call_errors_total", "database.py calls that raised.", ("function",)
+)
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds",
+    "OpenAI Responses API call time, excluding the admission queue.",
+    ("response_name", "status"),
+    LLM_BUCKETS,
+)
+LLM_QUEUE_WAIT = Histogram(
+    "llm_queue_wait_seconds",
+    "Time spent waiting for an OpenAI admission slot.",
+    ("response_name",),
+    LLM_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported in the Responses usage block.",
+    ("response_name", "kind"),
+)
+LLM_CACHE = Counter(
+    "llm_cache_lookups_total",
+    "Lookups in caches that stand in for an OpenAI call.",
+    ("response_name", "cache", "result"),
+)
+LLM_JOB_REATTEMPTS = Counter(
+    "llm_job_reattempt_calls_total",
+    "OpenAI calls made by a job's second or later attempt.",
+    ("response_name",),
+)
+
+REGISTRY = (
+    HTTP_LATENCY,
+    DB_LATENCY,
+    DB_ROWS_READ,
+    DB_ROWS_WRITTEN,
+    DB_ERRORS,
+    LLM_LATENCY,
+    LLM_QUEUE_WAIT,
+    LLM_TOKENS,
+    LLM_CACHE,
+    LLM_JOB_REATTEMPTS,
+)
+
+# Row tallies for the database call running in this context: [read, written].
+_db_rows: ContextVar[Optional[List[int]]] = ContextVar("db_rows", default=None)
+# Attempt number of the job whose handler is running in this context.
+job_attempt: ContextVar[int] = ContextVar("job_attempt", default=1)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def count_rows_read(rows: int) -> None:
+    tally = _db_rows.get()
+    if tally is not None:
+        tally[0] += rows
+
+
+def count_rows_written(rows: int) -> None:
+    tally = _db_rows.get()
+    if tally is not None:
+        tally[1] += rows
+
+
+def timed_db_call(name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    labels = (name,)
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        tally = [0, 0]
+        token = _db_rows.set(tally)
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            DB_ERRORS.inc(labels)
+            raise
+        finally:
+            DB_LATENCY.observe(labels, time.perf_counter() - started)
+            _db_rows.reset(token)
+            if tally[0]:
+                DB_ROWS_READ.inc(labels, tally[0])
+            if tally[1]:
+                DB_ROWS_WRITTEN.inc(labels, tally[1])
+
+    return wrapper
+
+
+def instrument_module(namespace: Dict[str, Any], skip: Sequence[str] = ()) -> None:
+    """Wrap every public function defined in ``namespace``'s module.
+
+    Rebinding the module globals means calls between database functions are
+    measured too, each under its own name.
+    """
+    if not ENABLED:
+        return
+    module = namespace["__name__"]
+    for name, value in list(namespace.items()):
+        if (
+            name.startswith("_")
+            or name in skip
+            or not callable(value)
+            or getattr(value, "__module__", None) != module
+            or isinstance(value, type)
+        ):
+            continue
+        namespace[name] = timed_db_call(name, value)
+
+
+def record_llm_call(
+    response_name: str, seconds: float, status: str, usage: Optional[Dict[str, Any]] = None
+) -> None:
+    if not ENABLED:
+        return
+    LLM_LATENCY.observe((response_name, status), seconds)
+    # Each call is made once; only a re-run job attempt repeats it.
+    if job_attempt.get() > 1:
+        LLM_JOB_REATTEMPTS.inc((response_name,))
+    if not usage:
+        return
+    kinds = {
+        "input": usage.get("input_tokens"),
+        "output": usage.get("output_tokens"),
+        "cached_input": (usage.get("input_tokens_details") or {}).get("cached_tokens"),
+        "reasoning": (usage.get("output_tokens_details") or {}).get("reasoning_tokens"),
+    }
+    for kind, tokens in kinds.items():
+        if tokens:
+            LLM_TOKENS.inc((response_name, kind), tokens)
+
+
+def record_llm_queue_wait(response_name: str, seconds: float) -> None:
+    if ENABLED:
+        LLM_QUEUE_WAIT.observe((response_name,), seconds)
+
+
+def record_cache(response_name: str, cache: str, hit: bool) -> None:
+    if ENABLED:
+        LLM_CACHE.inc((response_name, cache, "hit" if hit else "miss"))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each request up to its response headers.
+
+    Requests are labelled with the route template (``/api/jobs/{job_id}``),
+    not the raw path, so the series count stays bounded. Streaming responses
+    are timed to their first byte rather than for the life of the stream.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        recorded = False
+
+        def record(status: int) -> None:
+            nonlocal recorded
+            recorded = True
+            route = scope.get("route")
+            HTTP_LATENCY.observe(
+                (scope["method"], getattr(route, "path", "unmatched"), str(status)),
+                time.perf_counter() - started,
+            )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and not recorded:
+                record(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not recorded:
+                record(500)
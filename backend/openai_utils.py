@@ -3,15 +3,19 @@
 from __future__ import annotations
 
 import asyncio
+import heapq
 import json
 import os
 import logging
-from typing import Any, Dict, List, Sequence
+import time
+from typing import Any, Dict, List, Optional, Sequence
 
 from datetime import datetime
 import httpx
 
+from . import json_codec, llm_replay, metrics, profiling
 from .constants import NUTRIENT_KEYS, NUTRIENT_METADATA
+from .env import env_float
 
 logger = logging.getLogger("openai_utils")
 if not logger.handlers:
@@ -44,6 +48,235 @@ def _ensure_client() -> httpx.Client:
     return _client
 
 
+DEFAULT_PRIORITIES: Dict[str, int] = {
+    "manual_meal_nutrition": 0,
+    "completed_recipe": 1,
+    "meal_suggestions": 2,
+    "multi_day_meal_suggestions": 3,
+}
+DEFAULT_CONCURRENCY: Dict[str, int] = {
+    "manual_meal_nutrition": 4,
+    "completed_recipe": 2,
+    "meal_suggestions": 2,
+    "multi_day_meal_suggestions": 1,
+}
+DEFAULT_OUTPUT_TOKENS: Dict[str, int] = {
+    "manual_meal_nutrition": 600,
+    "completed_recipe": 1200,
+    "meal_suggestions": 2000,
+    "multi_day_meal_suggestions": 8000,
+}
+
+
+class LLMQueueTimeout(RuntimeError):
+    """Raised when a call waits in the scheduler queue past its deadline."""
+
+
+def _parse_name_map(raw: str | None, defaults: Dict[str, int]) -> Dict[str, int]:
+    # Format: "meal_suggestions=2,manual_meal_nutrition=4"
+    values = dict(defaults)
+    for part in (raw or "").split(","):
+        name, _, value = part.partition("=")
+        try:
+            values[name.strip()] = int(value)
+        except ValueError:
+            continue
+    return values
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        if self.unlimited:
+            return
+        self._refill()
+        # May go negative when actual usage exceeds the estimate; later calls repay the debt.
+        self.tokens -= min(amount, self.capacity) if amount > 0 else amount
+
+
+class LLMScheduler:
+    """Admission control for outbound model calls.
+
+    Waiters are served strictly by priority (lower first, FIFO within a
+    priority) subject to a per-``response_name`` concurrency cap, a global cap,
+    and request/token buckets sized from ``OPENAI_RPM`` / ``OPENAI_TPM``. A
+    waiter whose name is at its cap does not block other names behind it.
+    """
+
+    def __init__(self) -> None:
+        self.priorities = _parse_name_map(os.getenv("OPENAI_PRIORITIES"), DEFAULT_PRIORITIES)
+        self.limits = _parse_name_map(os.getenv("OPENAI_CONCURRENCY"), DEFAULT_CONCURRENCY)
+        self.global_limit = max(int(env_float("OPENAI_MAX_CONCURRENCY", 8)), 1)
+        self.queue_timeout = env_float("OPENAI_QUEUE_TIMEOUT_SECONDS", 30.0)
+        self.requests = _TokenBucket(env_float("OPENAI_RPM", 0))
+        self.tokens = _TokenBucket(env_float("OPENAI_TPM", 0))
+        self._waiters: List[List[Any]] = []
+        self._sequence = 0
+        self._running: Dict[str, int] = {}
+        self._running_total = 0
+        self._wakeup: asyncio.TimerHandle | None = None
+        self.metrics: Dict[str, Dict[str, float]] = {}
+
+    def _metric(self, name: str) -> Dict[str, float]:
+        return self.metrics.setdefault(
+            name,
+            {
+                "admitted": 0,
+                "timed_out": 0,
+                "wait_seconds_total": 0.0,
+                "wait_seconds_max": 0.0,
+            },
+        )
+
+    def estimate_tokens(self, name: str, payload_chars: int) -> int:
+        return payload_chars // 4 + DEFAULT_OUTPUT_TOKENS.get(name, 1000)
+
+    async def acquire(self, name: str, estimated_tokens: int) -> float:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._sequence += 1
+        entry = [self.priorities.get(name, 5), self._sequence, name, estimated_tokens, future]
+        heapq.heappush(self._waiters, entry)
+        enqueued = loop.time()
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                self.release(name)
+            else:
+                future.cancel()
+                self._discard(entry)
+            self._metric(name)["timed_out"] += 1
+            raise LLMQueueTimeout(
+                f"{name} waited more than {self.queue_timeout:.0f}s for an OpenAI slot"
+            )
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(name)
+            else:
+                future.cancel()
+                self._discard(entry)
+            raise
+        waited = loop.time() - enqueued
+        metric = self._metric(name)
+        metric["admitted"] += 1
+        metric["wait_seconds_total"] += waited
+        metric["wait_seconds_max"] = max(metric["wait_seconds_max"], waited)
+        return waited
+
+    def release(self, name: str) -> None:
+        self._running[name] = max(self._running.get(name, 0) - 1, 0)
+        self._running_total = max(self._running_total - 1, 0)
+        self._dispatch()
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: int | None) -> None:
+        if actual_tokens is not None:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def _discard(self, entry: List[Any]) -> None:
+        try:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+        except ValueError:
+            pass
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+        while self._waiters and self._running_total < self.global_limit:
+            eligible = None
+            for entry in sorted(self._waiters):
+                if entry[4].done():
+                    continue
+                if self._running.get(entry[2], 0) < max(self.limits.get(entry[2], 2), 1):
+                    eligible = entry
+                    break
+            if eligible is None:
+                self._waiters = [entry for entry in self._waiters if not entry[4].done()]
+                heapq.heapify(self._waiters)
+                return
+            delay = max(self.requests.wait_time(1), self.tokens.wait_time(eligible[3]))
+            if delay > 0:
+                self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            self._waiters.remove(eligible)
+            heapq.heapify(self._waiters)
+            self.requests.consume(1)
+            self.tokens.consume(eligible[3])
+            name = eligible[2]
+            self._running[name] = self._running.get(name, 0) + 1
+            self._running_total += 1
+            eligible[4].set_result(None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        depth: Dict[str, int] = {}
+        for entry in self._waiters:
+            if not entry[4].done():
+                depth[entry[2]] = depth.get(entry[2], 0) + 1
+        names = set(self.metrics) | set(depth) | set(self._running)
+        return {
+            "in_flight": self._running_total,
+            "global_limit": self.global_limit,
+            "request_tokens_available": None if self.requests.unlimited else round(self.requests.tokens, 2),
+            "tpm_tokens_available": None if self.tokens.unlimited else round(self.tokens.tokens, 2),
+            "by_name": {
+                name: {
+                    "queue_depth": depth.get(name, 0),
+                    "in_flight": self._running.get(name, 0),
+                    "limit": self.limits.get(name, 2),
+                    "priority": self.priorities.get(name, 5),
+                    **self._metric(name),
+                }
+                for name in sorted(names)
+            },
+        }
+
+
+_scheduler: LLMScheduler | None = None
+_scheduler_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler, _scheduler_loop
+    loop = asyncio.get_running_loop()
+    if _scheduler is None or _scheduler_loop is not loop:
+        _scheduler = LLMScheduler()
+        _scheduler_loop = loop
+    return _scheduler
+
+
+def scheduler_metrics() -> Dict[str, Any]:
+    if _scheduler is None:
+        return {"in_flight": 0, "by_name": {}}
+    return _scheduler.snapshot()
+
+
 def _nutrition_schema() -> Dict[str, Any]:
     return {
         "type": "object",
@@ -61,7 +294,6 @@ async def _call_openai_json(
     schema: Dict[str, Any],
     response_name: str,
 ) -> Dict[str, Any]:
-    client = _ensure_client()
     model = os.getenv("OPENAI_MODEL", "gpt-5.1")
     # Determinism controls via env
     try:
@@ -80,25 +312,40 @@ async def _call_openai_json(
         except ValueError:
             seed = None
 
+    request_payload = {
+        "model": model,
+        "input": messages,
+        "temperature": temperature,
+        "top_p": top_p,
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": response_name,
+                "schema": schema,
+                "strict": True,
+            }
+        },
+    }
+    if seed is not None:
+        request_payload["seed"] = seed
+    mode = llm_replay.replay_mode()
+
     def _request():
-        request_payload = {
-            "model": model,
-            "input": messages,
-            "temperature": temperature,
-            "top_p": top_p,
-            "text": {
-                "format": {
-                    "type": "json_schema",
-                    "name": response_name,
-                    "schema": schema,
-                    "strict": True,
-                }
-            },
-        }
-        if seed is not None:
-            request_payload["seed"] = seed
         _write_log({"direction": "request", "payload": request_payload})
-        resp = client.post("/responses", json=request_payload)
+        if mode == "replay":
+            recording = llm_replay.lookup(request_payload)
+            if recording is None:
+                raise llm_replay.ReplayMiss(f"No recorded {response_name} response matches this request")
+            llm_replay.simulate_latency(recording)
+            if not recording.ok:
+                raise RuntimeError(
+                    f"OpenAI request failed: {recording.status} {recording.body} (replayed)"
+                )
+            return recording.body
+        client = _ensure_client()
+        sent = time.perf_counter()
+        # The client already sends ``Content-Type: application/json``.
+        resp = client.post("/responses", content=json_codec.dumps_bytes(request_payload))
         if resp.status_code >= 400:
             try:
                 payload = resp.json()
@@ -111,16 +358,42 @@ async def _call_openai_json(
                     "error": payload,
                 }
             )
+            llm_replay.record(request_payload, resp.status_code, payload, time.perf_counter() - sent)
             raise RuntimeError(
                 f"OpenAI request failed: {resp.status_code} {payload}"
             )
-        data = resp.json()
+        data = json_codec.loads(resp.content)
         _write_log(
             {"direction": "response", "status": resp.status_code, "payload": data}
         )
+        llm_replay.record(request_payload, resp.status_code, data, time.perf_counter() - sent)
         return data
 
-    data = await asyncio.to_thread(_request)
+    cached = llm_replay.lookup(request_payload) if mode == "cache" else None
+    if mode == "cache":
+        metrics.record_cache(response_name, "replay", cached is not None and cached.ok)
+    if cached is not None and cached.ok:
+        # A recorded answer costs no provider capacity, so it skips admission.
+        data = cached.body
+    else:
+        scheduler = get_scheduler()
+        estimated_tokens = scheduler.estimate_tokens(
+            response_name, len(json.dumps(messages)) + len(json.dumps(schema))
+        )
+        waited = await scheduler.acquire(response_name, estimated_tokens)
+        metrics.record_llm_queue_wait(response_name, waited)
+        started = time.perf_counter()
+        try:
+            data = await asyncio.to_thread(profiling.thread_call(_request))
+        except Exception:
+            metrics.record_llm_call(response_name, time.perf_counter() - started, "error")
+            raise
+        finally:
+            scheduler.release(response_name)
+        metrics.record_llm_call(
+            response_name, time.perf_counter() - started, "ok", data.get("usage")
+        )
+        scheduler.reconcile(estimated_tokens, (data.get("usage") or {}).get("total_tokens"))
 
     output = data.get("output", [])
     if not output:
@@ -135,7 +408,7 @@ async def _call_openai_json(
         return item["json"]
     if "text" in item:
         raw = item["text"]
-        return json.loads(raw)
+        return json_codec.loads(raw)
 
     # Fallback – you probably won't hit this
     return item
@@ -181,8 +454,8 @@ async def complete_custom_recipe(messages: List[Dict[str, str]]) -> Dict[str, An
     return await _call_openai_json(messages, schema, "completed_recipe")
 
 
-async def generate_meal_suggestions(messages: List[Dict[str, str]]) -> Dict[str, Any]:
-    meal_schema = {
+def _suggested_meal_schema() -> Dict[str, Any]:
+    return {
         "type": "object",
         "properties": {
             "name": {"type": "string"},
@@ -213,6 +486,37 @@ async def generate_meal_suggestions(messages: List[Dict[str, str]]) -> Dict[str,
         "additionalProperties": False,
     }
 
+
+async def generate_meal_suggestions(
+    messages: List[Dict[str, str]], days: Optional[int] = None
+) -> Dict[str, Any]:
+    meal_schema = _suggested_meal_schema()
+    if days:
+        day_schema = {
+            "type": "object",
+            "properties": {
+                "date": {"type": "string", "description": "ISO date (YYYY-MM-DD)"},
+                "lunch": meal_schema,
+                "dinner": meal_schema,
+            },
+            "required": ["date", "lunch", "dinner"],
+            "additionalProperties": False,
+        }
+        schema = {
+            "type": "object",
+            "properties": {
+                "days": {
+                    "type": "array",
+                    "items": day_schema,
+                    "minItems": days,
+                    "maxItems": days,
+                },
+            },
+            "required": ["days"],
+            "additionalProperties": False,
+        }
+        return await _call_openai_json(messages, schema, "multi_day_meal_suggestions")
+
     schema = {
         "type": "object",
         "properties": {
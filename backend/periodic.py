@@ -0,0 +1,87 @@
+"""Background tasks that run a blocking job every few seconds.
+
+Backups, archival and change-log compaction each pass in their own job;
+it runs on a worker thread so the event loop keeps serving requests.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from .env import env_float
+
+logger = logging.getLogger("periodic")
+
+
+class PeriodicTask:
+    """Runs ``job`` every ``interval`` seconds on a worker thread.
+
+    ``summarize`` turns the job's return value into the ``last`` entry of
+    ``snapshot()``; by default the value is kept as is.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        interval: float,
+        job: Callable[[], Any],
+        summarize: Optional[Callable[[Any], Any]] = None,
+    ):
+        self.name = name
+        self._interval = interval
+        self._job = job
+        self._summarize = summarize
+        self._task: Optional[asyncio.Task] = None
+        self.last: Any = None
+        self.last_error: Optional[str] = None
+        self.runs = 0
+        self.failures = 0
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._task = loop.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                result = await asyncio.to_thread(self._job)
+                self.last = self._summarize(result) if self._summarize is not None else result
+                self.last_error = None
+                self.runs += 1
+            except Exception as exc:
+                self.failures += 1
+                self.last_error = str(exc)
+                logger.exception("Scheduled %s failed", self.name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self._interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last": self.last,
+        }
+
+
+def start_every(
+    setting: str,
+    default_minutes: float,
+    name: str,
+    job: Callable[[], Any],
+    loop: asyncio.AbstractEventLoop,
+    summarize: Optional[Callable[[Any], Any]] = None,
+) -> Optional[PeriodicTask]:
+    """Start ``job`` every ``setting`` minutes, or return ``None`` when that is zero or less."""
+    interval = env_float(setting, default_minutes) * 60
+    if interval <= 0:
+        return None
+    task = PeriodicTask(name, interval, job, summarize)
+    task.start(loop)
+    return task
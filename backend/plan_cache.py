@@ -0,0 +1,143 @@
+"""Shared lunch/dinner cache keyed by a quantized nutrient-deficit profile."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set, Tuple
+
+from . import metrics, shards
+from .database import (
+    add_plan_cache_variant,
+    get_plan_cache_variants,
+    mark_plan_cache_served,
+    plan_cache_summary,
+    prune_plan_cache,
+)
+from .env import env_float, env_int
+
+
+def cache_enabled() -> bool:
+    return os.getenv("PLAN_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "fills": 0}
+# Buckets with a background fill in flight, so concurrent hits start one.
+_filling: Set[str] = set()
+
+
+def _shared():
+    # One cache for every user shard: entries are keyed by a profile bucket,
+    # so they always live in ``DB_PATH``.
+    return shards.user_scope(None)
+
+
+def _variant_target() -> int:
+    return max(env_int("PLAN_CACHE_VARIANTS", 2), 1)
+
+
+def plan_signature(context: Dict[str, object]) -> str:
+    """Quantize focus ratios, calorie targets and restrictions into a bucket key.
+
+    Users whose remaining-nutrient ratios differ by less than one step land in
+    the same bucket, so their requests can share generated plans.
+    """
+    ratio_step = env_float("PLAN_CACHE_RATIO_STEP", 0.1) or 0.1
+    calorie_step = env_float("PLAN_CACHE_CALORIE_STEP", 50.0) or 50.0
+    ratios = context["remaining_ratios"]
+    focus = sorted(
+        (entry["key"], int(float(ratios.get(entry["key"], 0.0)) / ratio_step))
+        for entry in context["focus_details"]
+    )
+    restrictions = sorted(
+        {str(term).strip().lower() for term in context["restrictions"] if str(term).strip()}
+    )
+    blob = json.dumps(
+        {
+            "focus": focus,
+            "lunch": int(round(float(context["lunch_calories"]) / calorie_step)),
+            "dinner": int(round(float(context["dinner_calories"]) / calorie_step)),
+            "restrictions": restrictions,
+        },
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def _since() -> datetime:
+    return datetime.utcnow() - timedelta(hours=env_float("PLAN_CACHE_TTL_HOURS", 168.0))
+
+
+def lookup(signature: str) -> Optional[Tuple[Dict[str, object], Dict[str, object], bool]]:
+    """Serve the least-used variant as soon as the bucket holds one.
+
+    The flag is true while the bucket holds fewer than ``PLAN_CACHE_VARIANTS``
+    variants; the caller generates the next one in the background.
+    """
+    with _shared():
+        variants = get_plan_cache_variants(signature, _since())
+        if not variants:
+            with _stats_lock:
+                _stats["misses"] += 1
+            metrics.record_cache("meal_suggestions", "plan_cache", False)
+            return None
+        chosen = variants[0]
+        mark_plan_cache_served(chosen["id"])
+    with _stats_lock:
+        _stats["hits"] += 1
+    metrics.record_cache("meal_suggestions", "plan_cache", True)
+    return chosen["lunch"], chosen["dinner"], len(variants) < _variant_target()
+
+
+def begin_fill(signature: str) -> bool:
+    """Claim the background fill for ``signature``; false if one is running."""
+    with _stats_lock:
+        if signature in _filling:
+            return False
+        _filling.add(signature)
+        _stats["fills"] += 1
+        return True
+
+
+def end_fill(signature: str) -> None:
+    with _stats_lock:
+        _filling.discard(signature)
+
+
+def store(signature: str, lunch: Optional[Dict[str, object]], dinner: Optional[Dict[str, object]]) -> None:
+    if not lunch or not dinner:
+        return
+    with _shared():
+        variants = get_plan_cache_variants(signature, _since())
+        if len(variants) >= _variant_target():
+            return
+        add_plan_cache_variant(signature, lunch, dinner)
+
+
+def cache_stats() -> Dict[str, object]:
+    with _stats_lock:
+        hits = _stats["hits"]
+        misses = _stats["misses"]
+        fills = _stats["fills"]
+    lookups = hits + misses
+    with _shared():
+        summary = plan_cache_summary()
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "llm_calls_avoided": hits,
+        "background_fills": fills,
+        "lifetime_llm_calls_avoided": summary["served"],
+        "buckets": summary["buckets"],
+        "variants": summary["variants"],
+    }
+
+
+def prune_expired() -> int:
+    with _shared():
+        return prune_plan_cache(_since())
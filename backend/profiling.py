@@ -0,0 +1,350 @@
+"""Opt-in per-request profiling with optional allocation tracing.
+
+Profiling is off unless ``PROFILE_TOKEN`` is set. When it is off the
+middleware is not installed and route handlers are not wrapped, so requests
+run exactly as before.
+
+A request is profiled when it sends ``X-Profile-Token: <PROFILE_TOKEN>``, or
+when it is picked by ``PROFILE_SAMPLE_RATE`` (0 to 1, default 0). Adding
+``X-Profile-Alloc: 1`` (or setting ``PROFILE_TRACEMALLOC=1`` for sampled
+requests) also diffs tracemalloc snapshots taken around the request. The
+response carries ``X-Profile-Id``; the artifact is a ``.prof`` file (pstats
+format, readable by ``pstats`` or snakeviz) plus a ``.json`` summary in
+``PROFILE_DIR``, which keeps the newest ``PROFILE_MAX_ARTIFACTS`` profiles.
+
+cProfile is per thread. The event loop thread is profiled for the life of
+the request, which includes any other coroutines interleaved with it on a
+busy process. Sync route handlers and the OpenAI worker call run in thread
+pools and are profiled there separately, then merged into one artifact.
+Only one request is profiled at a time; others run unprofiled.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import functools
+import hmac
+import inspect
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from .env import env_float
+
+logger = logging.getLogger("profiling")
+
+TOKEN_HEADER = "x-profile-token"
+ALLOC_HEADER = "x-profile-alloc"
+ID_HEADER = b"x-profile-id"
+SKIPPED_HEADER = b"x-profile-skipped"
+DEFAULT_DIR = Path(__file__).resolve().parent / "logs" / "profiles"
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 25
+# Never profiled: the scrape endpoint and the profile readers, which send the
+# token header themselves.
+EXCLUDED_PREFIXES = ("/metrics", "/api/admin/profiles")
+
+T = TypeVar("T")
+
+
+TOKEN = os.getenv("PROFILE_TOKEN", "")
+ENABLED = bool(TOKEN)
+
+
+@dataclass
+class _Capture:
+    profile_id: str
+    trigger: str
+    alloc: bool
+    loop_profiler: cProfile.Profile = field(default_factory=cProfile.Profile)
+    thread_profilers: List[cProfile.Profile] = field(default_factory=list)
+    snapshot: Optional[tracemalloc.Snapshot] = None
+    started_tracemalloc: bool = False
+
+
+_capture: ContextVar[Optional[_Capture]] = ContextVar("profile_capture", default=None)
+_busy = threading.Lock()
+
+
+def profile_dir() -> Path:
+    return Path(os.getenv("PROFILE_DIR", str(DEFAULT_DIR)))
+
+
+def token_matches(candidate: Optional[str]) -> bool:
+    return ENABLED and candidate is not None and hmac.compare_digest(candidate, TOKEN)
+
+
+def thread_call(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wrap ``fn`` so it is profiled when it runs on behalf of a profiled request.
+
+    Thread pools copy the caller's context, so the capture is visible in the
+    worker thread. Returns ``fn`` itself when profiling is disabled.
+    """
+    if not ENABLED:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        capture = _capture.get()
+        if capture is None:
+            return fn(*args, **kwargs)
+        profiler = cProfile.Profile()
+        capture.thread_profilers.append(profiler)
+        return profiler.runcall(fn, *args, **kwargs)
+
+    return wrapper
+
+
+def instrument_routes(app) -> None:
+    """Profile sync route handlers, which FastAPI runs in its thread pool."""
+    if not ENABLED:
+        return
+    for route in app.routes:
+        dependant = getattr(route, "dependant", None)
+        if dependant is None or inspect.iscoroutinefunction(dependant.call):
+            continue
+        dependant.call = thread_call(dependant.call)
+
+
+def _function_label(func: tuple) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name
+    parts = Path(filename).parts
+    return f"{'/'.join(parts[-2:])}:{line}({name})"
+
+
+def _top_functions(stats: pstats.Stats, key: str) -> List[Dict[str, Any]]:
+    rows = []
+    for func, (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append(
+            {
+                "function": _function_label(func),
+                "calls": calls,
+                "self_ms": round(tottime * 1000, 3),
+                "cumulative_ms": round(cumtime * 1000, 3),
+            }
+        )
+    rows.sort(key=lambda row: row[key], reverse=True)
+    return rows[:TOP_FUNCTIONS]
+
+
+# Matched against the file path, or the name of C functions. Event loop time
+# spent in the selector is the loop waiting on worker threads or sockets.
+AREAS = (
+    ("loop_idle", ("select.epoll", "select.poll", "select.select", "select.kqueue")),
+    ("sqlite", ("sqlite3", "_MeteredCursor", "_MeteredConnection")),
+    ("json", ("json", "orjson", "msgspec")),
+    ("openai_http", ("httpx", "httpcore", "ssl", "socket")),
+    ("validation", ("pydantic",)),
+    ("framework", ("starlette", "fastapi", "anyio", "uvicorn")),
+    ("event_loop", ("asyncio", "selectors")),
+)
+BACKEND_DIR = str(Path(__file__).resolve().parent)
+
+
+def _area(func: tuple) -> str:
+    filename, _, name = func
+    where = name if filename == "~" else filename
+    if filename.startswith(BACKEND_DIR):
+        return "backend"
+    for area, markers in AREAS:
+        if any(marker in where for marker in markers):
+            return area
+    return "other"
+
+
+def _self_time_by_area(stats: pstats.Stats) -> Dict[str, float]:
+    """Self time rolled up by library, to tell SQLite from JSON from our code."""
+    totals: Dict[str, float] = {}
+    for func, (_, _, tottime, _, _) in stats.stats.items():
+        area = _area(func)
+        totals[area] = totals.get(area, 0.0) + tottime
+    return {area: round(seconds * 1000, 3) for area, seconds in sorted(totals.items(), key=lambda item: -item[1])}
+
+
+def _allocation_diff(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot) -> List[Dict[str, Any]]:
+    ignore = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    )
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    return [
+        {
+            "location": str(stat.traceback[0]),
+            "size_diff_bytes": stat.size_diff,
+            "count_diff": stat.count_diff,
+            "size_bytes": stat.size,
+        }
+        for stat in diff[:TOP_ALLOCATIONS]
+    ]
+
+
+def _prune(directory: Path, keep: int) -> None:
+    artifacts = sorted(directory.glob("*.json"), key=lambda path: path.stat().st_mtime, reverse=True)
+    for stale in artifacts[keep:]:
+        stale.unlink(missing_ok=True)
+        stale.with_suffix(".prof").unlink(missing_ok=True)
+
+
+def _write_artifact(capture: _Capture, meta: Dict[str, Any], after: Optional[tracemalloc.Snapshot]) -> None:
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    stats = pstats.Stats(capture.loop_profiler)
+    for profiler in capture.thread_profilers:
+        stats.add(profiler)
+    stats.dump_stats(directory / f"{capture.profile_id}.prof")
+    summary: Dict[str, Any] = {
+        **meta,
+        "threads": 1 + len(capture.thread_profilers),
+        "total_calls": stats.total_calls,
+        "self_ms_by_area": _self_time_by_area(stats),
+        "top_cumulative": _top_functions(stats, "cumulative_ms"),
+        "top_self": _top_functions(stats, "self_ms"),
+    }
+    if capture.snapshot is not None and after is not None:
+        summary["allocations"] = _allocation_diff(capture.snapshot, after)
+    (directory / f"{capture.profile_id}.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    _prune(directory, max(int(env_float("PROFILE_MAX_ARTIFACTS", 50)), 1))
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    directory = profile_dir()
+    if not directory.exists():
+        return []
+    profiles = []
+    for path in sorted(directory.glob("*.json"), key=lambda path: path.stat().st_mtime, reverse=True):
+        try:
+            summary = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            continue
+        profiles.append({key: value for key, value in summary.items() if not key.startswith(("top_", "allocations"))})
+    return profiles
+
+
+def artifact_path(profile_id: str, suffix: str) -> Optional[Path]:
+    # Ids are generated here; anything else (path separators included) is not ours.
+    if not profile_id.replace("-", "").isalnum():
+        return None
+    path = profile_dir() / f"{profile_id}{suffix}"
+    return path if path.exists() else None
+
+
+def _new_id() -> str:
+    return f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles selected requests end to end.
+
+    Streaming responses are profiled until the stream closes, so sampling
+    skips event streams and the token header is the way to profile one.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.sample_rate = min(max(env_float("PROFILE_SAMPLE_RATE", 0.0), 0.0), 1.0)
+        self.sample_alloc = os.getenv("PROFILE_TRACEMALLOC", "0").lower() in ("1", "true", "yes")
+
+    def _select(self, scope) -> tuple:
+        if scope["path"].startswith(EXCLUDED_PREFIXES):
+            return None, False, None
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        supplied = headers.get(TOKEN_HEADER)
+        if supplied is not None:
+            if not token_matches(supplied):
+                return None, False, "forbidden"
+            return "header", headers.get(ALLOC_HEADER, "").lower() in ("1", "true", "yes"), None
+        if (
+            self.sample_rate
+            and random.random() < self.sample_rate
+            and "text/event-stream" not in headers.get("accept", "")
+        ):
+            return "sample", self.sample_alloc, None
+        return None, False, None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger, alloc, skipped = self._select(scope)
+        if trigger is not None and not _busy.acquire(blocking=False):
+            trigger, skipped = None, "busy" if trigger == "header" else None
+        if trigger is None:
+            if skipped is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_skipped(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = [*message.get("headers", []), (SKIPPED_HEADER, skipped.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_skipped)
+            return
+
+        capture = _Capture(_new_id(), trigger, alloc)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (ID_HEADER, capture.profile_id.encode())]
+            await send(message)
+
+        token = _capture.set(capture)
+        try:
+            if alloc:
+                capture.started_tracemalloc = not tracemalloc.is_tracing()
+                if capture.started_tracemalloc:
+                    tracemalloc.start(int(env_float("PROFILE_TRACEMALLOC_FRAMES", 1)))
+                tracemalloc.reset_peak()
+                capture.snapshot = tracemalloc.take_snapshot()
+            started_at = datetime.utcnow()
+            started = time.perf_counter()
+            capture.loop_profiler.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                capture.loop_profiler.disable()
+                duration = time.perf_counter() - started
+                _capture.reset(token)
+                after, peak = None, None
+                if alloc:
+                    after = tracemalloc.take_snapshot()
+                    peak = tracemalloc.get_traced_memory()[1]
+                    if capture.started_tracemalloc:
+                        tracemalloc.stop()
+                route = scope.get("route")
+                meta = {
+                    "id": capture.profile_id,
+                    "trigger": trigger,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status,
+                    "started_at": started_at.isoformat(timespec="milliseconds"),
+                    "duration_ms": round(duration * 1000, 3),
+                    "alloc": alloc,
+                    "traced_peak_bytes": peak,
+                }
+                try:
+                    await asyncio.to_thread(_write_artifact, capture, meta, after)
+                except Exception:
+                    logger.exception("Failed to write profile %s", capture.profile_id)
+        finally:
+            _busy.release()
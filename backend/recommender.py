@@ -0,0 +1,264 @@
+"""Local ranking of stored custom meals against the remaining weekly nutrient gaps."""
+
+from __future__ import annotations
+
+import heapq
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+from . import meal_library, shards
+from .constants import NUTRIENT_METADATA, SCORING_NUTRIENTS
+from .database import list_custom_meals
+
+
+GAP_NUTRIENTS: List[str] = [
+    key
+    for key in SCORING_NUTRIENTS
+    if key != "calories" and not NUTRIENT_METADATA[key].get("is_limit")
+]
+LIMIT_NUTRIENTS: List[str] = [
+    key for key, meta in NUTRIENT_METADATA.items() if meta.get("is_limit")
+]
+LIMIT_PENALTY_WEIGHT = 0.6
+CALORIE_PENALTY_WEIGHT = 0.5
+COOKING_TIME_PENALTY_WEIGHT = 0.1
+
+
+def _as_float(value: object) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# A restriction starting with one of these names an ingredient to keep out
+# ("no pork", "without peanuts"); any other ("vegetarian", "gluten-free") is a
+# diet the recipe must be tagged with.
+BANNED_PREFIXES = ("no ", "without ", "avoid ", "exclude ", "allergic to ", "allergy to ")
+
+
+def _tag_key(value: object) -> str:
+    return "-".join(str(value or "").lower().replace("_", " ").replace("-", " ").split())
+
+
+def _ingredient_text(meal: Dict[str, object]) -> str:
+    parts = [str(meal.get("name") or "")]
+    parts.extend(str(item) for item in meal.get("ingredients") or [])
+    return " ".join(parts).lower()
+
+
+def _split_restrictions(terms: Iterable[object]) -> Tuple[List[str], List[str]]:
+    """``(required tags, banned ingredients)`` from the user's restriction strings."""
+    required: List[str] = []
+    banned: List[str] = []
+    for term in terms:
+        text = " ".join(str(term or "").lower().split())
+        for prefix in BANNED_PREFIXES:
+            if text.startswith(prefix):
+                ingredient = text[len(prefix):].strip()
+                if ingredient:
+                    # "peanuts" should also catch "peanut butter".
+                    banned.append(ingredient[:-1] if len(ingredient) > 3 and ingredient.endswith("s") else ingredient)
+                break
+        else:
+            if text:
+                required.append(_tag_key(text))
+    return required, banned
+
+
+class LibraryIndex:
+    """Nutrient vectors for every stored custom meal, rebuilt when the table changes."""
+
+    def __init__(self, version: Tuple[int, int], meals: List[Dict[str, object]]):
+        self.version = version
+        self.meals = meals
+        self.gap_vectors: List[Tuple[float, ...]] = []
+        self.limit_vectors: List[Tuple[float, ...]] = []
+        self.calories: List[float] = []
+        self.cooking_times: List[float] = []
+        self.tags: List[FrozenSet[str]] = []
+        self.ingredient_text: List[str] = []
+        for meal in meals:
+            nutrition = meal.get("nutrition") or {}
+            self.gap_vectors.append(
+                tuple(_as_float(nutrition.get(key)) for key in GAP_NUTRIENTS)
+            )
+            self.limit_vectors.append(
+                tuple(_as_float(nutrition.get(key)) for key in LIMIT_NUTRIENTS)
+            )
+            self.calories.append(_as_float(nutrition.get("calories")))
+            self.cooking_times.append(_as_float(meal.get("cooking_time")))
+            self.tags.append(frozenset(_tag_key(tag) for tag in meal.get("tags") or []))
+            self.ingredient_text.append(_ingredient_text(meal))
+
+    def __len__(self) -> int:
+        return len(self.meals)
+
+
+# One index per user shard, least recently used first.
+_indexes: "OrderedDict[Optional[str], LibraryIndex]" = OrderedDict()
+_index_lock = threading.Lock()
+MAX_INDEXES = 32
+
+
+def get_library_index() -> LibraryIndex:
+    version, meals = meal_library.snapshot()
+    user_id = shards.current_user()
+    with _index_lock:
+        index = _indexes.get(user_id)
+        if index is None or index.version != version:
+            index = LibraryIndex(version, meals if meals is not None else list_custom_meals(limit=None))
+            _indexes[user_id] = index
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+        return index
+
+
+def _meal_share(context: Dict[str, object], calorie_target: float) -> float:
+    remaining_calories = _as_float(context["remaining"].get("calories"))
+    return calorie_target / max(remaining_calories, calorie_target, 1.0)
+
+
+def score_library(
+    index: LibraryIndex,
+    context: Dict[str, object],
+    calorie_target: float,
+    meal_type: Optional[str] = None,
+    exclude_ids: Iterable[int] = (),
+) -> List[Tuple[float, int]]:
+    """Score each eligible meal; returns ``(score, position)`` pairs in index order."""
+    remaining = context["remaining"]
+    ratios = context["remaining_ratios"]
+    share = _meal_share(context, calorie_target)
+
+    needs = [_as_float(remaining.get(key)) * share for key in GAP_NUTRIENTS]
+    weights = [max(_as_float(ratios.get(key)), 0.0) for key in GAP_NUTRIENTS]
+    weight_total = sum(weight for weight, need in zip(weights, needs) if need > 0)
+    limits = {item["key"]: item for item in context["limit_guidance"]}
+    budgets = []
+    scales = []
+    for key in LIMIT_NUTRIENTS:
+        item = limits.get(key, {})
+        budget = _as_float(item.get("remaining_buffer")) * share
+        budgets.append(budget)
+        scales.append(max(budget, _as_float(item.get("max")) / 14, 1e-6))
+    preferred_time = _as_float(context.get("cooking_time_preference"))
+    required, banned = _split_restrictions(context.get("restrictions") or [])
+    excluded = set(exclude_ids)
+
+    scored: List[Tuple[float, int]] = []
+    for position, meal in enumerate(index.meals):
+        if meal.get("id") in excluded:
+            continue
+        if meal_type and meal.get("meal_type") not in (meal_type, "meal", None):
+            continue
+        if required and not index.tags[position].issuperset(required):
+            continue
+        if banned and any(term in index.ingredient_text[position] for term in banned):
+            continue
+        coverage = 0.0
+        if weight_total:
+            for value, need, weight in zip(index.gap_vectors[position], needs, weights):
+                if need > 0 and weight:
+                    coverage += weight * min(value / need, 1.0)
+            coverage /= weight_total
+        limit_penalty = 0.0
+        for value, budget, scale in zip(index.limit_vectors[position], budgets, scales):
+            if value > budget:
+                limit_penalty += (value - budget) / scale
+        calorie_penalty = abs(index.calories[position] - calorie_target) / max(calorie_target, 1.0)
+        score = (
+            coverage
+            - LIMIT_PENALTY_WEIGHT * limit_penalty
+            - CALORIE_PENALTY_WEIGHT * calorie_penalty
+        )
+        if preferred_time and index.cooking_times[position] > preferred_time:
+            score -= COOKING_TIME_PENALTY_WEIGHT * (
+                (index.cooking_times[position] - preferred_time) / preferred_time
+            )
+        scored.append((score, position))
+    return scored
+
+
+def top_meals(
+    context: Dict[str, object],
+    calorie_target: float,
+    limit: int = 5,
+    meal_type: Optional[str] = None,
+    exclude_ids: Iterable[int] = (),
+    index: Optional[LibraryIndex] = None,
+) -> List[Dict[str, object]]:
+    index = index or get_library_index()
+    scored = score_library(index, context, calorie_target, meal_type, exclude_ids)
+    best = heapq.nlargest(limit, scored)
+    return [dict(index.meals[position], score=round(score, 4)) for score, position in best]
+
+
+def as_suggestion(meal: Dict[str, object]) -> Dict[str, object]:
+    nutrition = meal.get("nutrition") or {}
+    return {
+        "name": meal.get("name"),
+        "description": meal.get("description", ""),
+        "meal_type": meal.get("meal_type"),
+        "calories": _as_float(nutrition.get("calories")),
+        "prepTime": meal.get("cooking_time"),
+        "ingredients": meal.get("ingredients", []),
+        "instructions": meal.get("instructions", []),
+        "nutrition": nutrition,
+        "library_id": meal.get("id"),
+        "score": meal.get("score"),
+    }
+
+
+def _min_library_score() -> float:
+    try:
+        return float(os.getenv("RECOMMENDER_MIN_SCORE", "0.35"))
+    except ValueError:
+        return 0.35
+
+
+def recommend_plan(
+    context: Dict[str, object], min_score: Optional[float] = None
+) -> Optional[Tuple[Dict[str, object], Dict[str, object]]]:
+    """Pick a lunch/dinner pair from the library, or ``None`` when nothing scores well enough."""
+    threshold = _min_library_score() if min_score is None else min_score
+    index = get_library_index()
+    if len(index) < 2:
+        return None
+    lunch = top_meals(context, context["lunch_calories"], 1, "lunch", index=index)
+    if not lunch or lunch[0]["score"] < threshold:
+        return None
+    dinner = top_meals(
+        context,
+        context["dinner_calories"],
+        1,
+        "dinner",
+        exclude_ids=[lunch[0]["id"]],
+        index=index,
+    )
+    if not dinner or dinner[0]["score"] < threshold:
+        return None
+    return as_suggestion(lunch[0]), as_suggestion(dinner[0])
+
+
+def rank_for_slots(
+    context: Dict[str, object], limit: int, meal_types: Sequence[str]
+) -> Dict[str, List[Dict[str, object]]]:
+    index = get_library_index()
+    targets = {
+        "lunch": context["lunch_calories"],
+        "dinner": context["dinner_calories"],
+    }
+    return {
+        meal_type: top_meals(
+            context,
+            targets.get(meal_type, context["dinner_calories"]),
+            limit,
+            meal_type,
+            index=index,
+        )
+        for meal_type in meal_types
+    }
@@ -30,6 +30,23 @@ class MealGenerationRequest(BaseModel):
     weekly_progress: Optional[Dict[str, Any]] = None
     preferences: List[str] = Field(default_factory=list)
     restrictions: List[str] = Field(default_factory=list)
+    prefer_library: bool = Field(
+        default=False,
+        description="Serve a plan from the saved recipe library when it covers today's gaps.",
+    )
+    days: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=7,
+        description="Plan this many days (starting today) in one call; capped at the end of the week.",
+    )
+
+
+class WeekPlanRequest(BaseModel):
+    restrictions: List[str] = Field(default_factory=list)
+    beam_width: int = Field(default=8, ge=1, le=64)
+    candidates_per_slot: int = Field(default=24, ge=1, le=200)
+    time_budget_ms: float = Field(default=250.0, gt=0, le=5000)
 
 
 class ManualMealRequest(BaseModel):
@@ -61,3 +78,7 @@ class CustomMealRequest(BaseModel):
         description="Specific nutrients or goals this meal should emphasize.",
     )
     dietary_notes: Optional[str] = None
+    force: bool = Field(
+        default=False,
+        description="Generate a new recipe even if a near-duplicate is already saved.",
+    )
@@ -0,0 +1,91 @@
+"""Full-text search over meal history and saved recipes (SQLite FTS5)."""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .database import SEARCH_INDEXES, search_custom_meals, search_meal_logs
+
+SCOPES = ("all", "logs", "recipes")
+MAX_TERMS = 8
+
+# Column weights mirror what matters to a reader: names first, then
+# ingredients/tags, then free text.
+LOG_COLUMNS = {"meal_name": 4.0, "notes": 1.0}
+RECIPE_COLUMNS = {"name": 4.0, "description": 1.0, "ingredients": 2.0, "tags": 2.0}
+
+_TOKEN = re.compile(r"[^\W_]+", re.UNICODE)
+
+Term = Tuple[str, bool]
+
+
+def _fold(text: str) -> str:
+    # Same folding as the FTS5 ``unicode61 remove_diacritics`` tokenizer.
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _text(value: object) -> str:
+    if not value:
+        return ""
+    if isinstance(value, (list, tuple)):
+        value = " ".join(str(item) for item in value)
+    return _fold(str(value))
+
+
+def _tokens(value: object) -> List[str]:
+    return _TOKEN.findall(_text(value))
+
+
+def parse_terms(text: str, prefix: bool = True) -> List[Term]:
+    """Split free text into terms; the last one is a prefix for type-ahead."""
+    words = _tokens(text)[:MAX_TERMS]
+    return [(word, prefix and position == len(words) - 1) for position, word in enumerate(words)]
+
+
+def _term_expression(term: Term) -> str:
+    # Quoting keeps user input from being read as FTS5 operators.
+    word, is_prefix = term
+    return f'"{word}"*' if is_prefix else f'"{word}"'
+
+
+def match_expression(terms: Sequence[Term]) -> Optional[str]:
+    if not terms:
+        return None
+    return " ".join(_term_expression(term) for term in terms)
+
+
+def _weights(index: str, columns: Dict[str, float]) -> List[float]:
+    # bm25() takes one weight per indexed column, in index order.
+    return [columns[column] for column in SEARCH_INDEXES[index]["columns"]]
+
+
+def search(
+    query: str,
+    scope: str = "all",
+    limit: int = 20,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    meal_type: Optional[str] = None,
+) -> Dict[str, List[Dict[str, object]]]:
+    """Prefix search; the best ``limit`` matches by FTS5 ``bm25()`` for each scope."""
+    terms = parse_terms(query)
+    match = match_expression(terms)
+    results: Dict[str, List[Dict[str, object]]] = {"logs": [], "recipes": []}
+    if match is None:
+        return results
+    if scope in ("all", "logs"):
+        weights = _weights("meal_logs_fts", LOG_COLUMNS)
+        for row in search_meal_logs(match, limit, weights, start_date, end_date, meal_type):
+            results["logs"].append({**row, "score": -row.pop("rank")})
+    if scope in ("all", "recipes"):
+        weights = _weights("user_meals_fts", RECIPE_COLUMNS)
+        for row in search_custom_meals(match, limit, weights, meal_type):
+            row.pop("ingredients", None)
+            results["recipes"].append({**row, "score": -row.pop("rank")})
+    return results
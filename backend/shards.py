@@ -0,0 +1,98 @@
+"""Per-user database shards.
+
+With ``USER_SHARDS=1`` a request carrying ``X-User-Id`` reads and writes its
+own SQLite file, ``<db name>-users/<user id>.db`` next to ``DB_PATH``, with
+the full schema. Users then never share a writer lock, and each shard's
+meal logs, preferences, goals, saved recipes, jobs and idempotency keys
+stay separate. Requests without the header keep using ``DB_PATH``.
+
+The scope is a context variable, so ``database.py`` functions pick it up
+without a ``user_id`` argument in every call, and it follows the request
+into thread-pool handlers and ``asyncio.to_thread`` calls. Background work
+for a user (queued jobs, admin jobs over every shard) enters the same
+scope with ``user_scope``.
+
+The header names a user but proves nothing. Run this behind a proxy that
+authenticates users and sets it, and set ``SHARD_PROXY_TOKEN`` to a secret
+that proxy also sends as ``X-Shard-Proxy-Token``; requests naming a user
+without it are then refused.
+"""
+
+from __future__ import annotations
+
+import hmac
+import os
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+ENABLED = os.getenv("USER_SHARDS", "0").lower() in ("1", "true", "yes")
+HEADER = b"x-user-id"
+PROXY_TOKEN_HEADER = b"x-shard-proxy-token"
+# Shard file names come straight from the id, so keep them path-safe.
+_VALID_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_current_user: ContextVar[Optional[str]] = ContextVar("shard_user", default=None)
+
+
+def valid_user_id(user_id: str) -> bool:
+    return bool(_VALID_ID.match(user_id))
+
+
+def current_user() -> Optional[str]:
+    """The user whose shard ``database.py`` uses, or ``None`` for ``DB_PATH``."""
+    return _current_user.get()
+
+
+@contextmanager
+def user_scope(user_id: Optional[str]) -> Iterator[None]:
+    if user_id is not None and not valid_user_id(user_id):
+        raise ValueError(f"Invalid user id: {user_id!r}")
+    token = _current_user.set(user_id)
+    try:
+        yield
+    finally:
+        _current_user.reset(token)
+
+
+def _from_trusted_proxy(scope: Scope) -> bool:
+    expected = os.getenv("SHARD_PROXY_TOKEN", "")
+    if not expected:
+        return True
+    token = dict(scope["headers"]).get(PROXY_TOKEN_HEADER)
+    return token is not None and hmac.compare_digest(token, expected.encode("latin-1"))
+
+
+class ShardMiddleware:
+    """Scopes each HTTP request to the shard named by its ``X-User-Id`` header."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        raw = dict(scope["headers"]).get(HEADER)
+        if raw is None:
+            await self.app(scope, receive, send)
+            return
+        if not _from_trusted_proxy(scope):
+            response = JSONResponse(
+                {"detail": "X-User-Id is only accepted from the trusted proxy"}, status_code=403
+            )
+            await response(scope, receive, send)
+            return
+        user_id = raw.decode("latin-1")
+        if not valid_user_id(user_id):
+            response = JSONResponse(
+                {"detail": "X-User-Id must be 1-64 letters, digits, '-' or '_'"}, status_code=400
+            )
+            await response(scope, receive, send)
+            return
+        with user_scope(user_id):
+            await self.app(scope, receive, send)
@@ -0,0 +1,203 @@
+"""Debounced background pre-generation of the next meal plan."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from . import metrics
+from .env import env_float
+
+logger = logging.getLogger("speculation")
+
+PrepareFn = Callable[[], Tuple[str, Dict[str, Any]]]
+ComputeFn = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+MAX_RESULTS = 4
+
+
+def speculation_enabled() -> bool:
+    if os.getenv("SPECULATION_ENABLED", "1").lower() in ("0", "false", "no"):
+        return False
+    return bool(os.getenv("OPENAI_API_KEY"))
+
+
+class SpeculativeScheduler:
+    """Precompute a result whenever inputs change, keyed by an input fingerprint.
+
+    ``notify`` is thread-safe and may be called from the sync route handlers.
+    Each notification re-arms a debounce timer; when it fires, any in-flight
+    speculation for an older fingerprint is cancelled and a new one starts.
+    A provider call that is already running cannot be aborted, so it keeps its
+    concurrency slot until it settles and its result is still cached under its
+    own fingerprint.
+    """
+
+    def __init__(
+        self,
+        prepare: PrepareFn,
+        compute: ComputeFn,
+        debounce_seconds: float,
+        max_concurrency: int,
+    ):
+        self._prepare = prepare
+        self._compute = compute
+        self._debounce = debounce_seconds
+        self._semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[str] = None
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.stats = {
+            "scheduled": 0,
+            "started": 0,
+            "completed": 0,
+            "cancelled": 0,
+            "failed": 0,
+            "hits": 0,
+            "misses": 0,
+        }
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def stop(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._loop = None
+
+    def notify(self, *_: Any) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._arm)
+
+    def lookup(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        result = self._results.get(fingerprint)
+        metrics.record_cache("meal_suggestions", "speculation", result is not None)
+        if result is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return result
+
+    def remember(self, fingerprint: str, result: Dict[str, Any]) -> None:
+        self._store(fingerprint, result)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "inflight": self._inflight is not None,
+            "cached": len(self._results),
+        }
+
+    def _arm(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self.stats["scheduled"] += 1
+        self._timer = self._loop.call_later(self._debounce, self._fire)
+
+    def _fire(self) -> None:
+        self._timer = None
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            self.stats["cancelled"] += 1
+        self._task = self._loop.create_task(self._speculate())
+
+    async def _speculate(self) -> None:
+        try:
+            fingerprint, context = await asyncio.to_thread(self._prepare)
+        except Exception:
+            logger.exception("Speculative context preparation failed")
+            self.stats["failed"] += 1
+            return
+        if fingerprint in self._results:
+            return
+        async with self._semaphore:
+            self._inflight = fingerprint
+            self.stats["started"] += 1
+            call = asyncio.ensure_future(self._compute(context))
+            try:
+                result = await asyncio.shield(call)
+            except asyncio.CancelledError:
+                await asyncio.wait([call])
+                self._store_settled(fingerprint, call)
+                raise
+            except Exception:
+                logger.exception("Speculative generation failed")
+                self.stats["failed"] += 1
+                return
+            finally:
+                if self._inflight == fingerprint:
+                    self._inflight = None
+        self._store(fingerprint, result)
+        self.stats["completed"] += 1
+
+    def _store_settled(self, fingerprint: str, call: asyncio.Future) -> None:
+        if call.cancelled() or call.exception() is not None:
+            return
+        self._store(fingerprint, call.result())
+
+    def _store(self, fingerprint: str, result: Dict[str, Any]) -> None:
+        self._results[fingerprint] = result
+        self._results.move_to_end(fingerprint)
+        while len(self._results) > MAX_RESULTS:
+            self._results.popitem(last=False)
+
+
+_scheduler: Optional[SpeculativeScheduler] = None
+
+
+def start(loop: asyncio.AbstractEventLoop, prepare: PrepareFn, compute: ComputeFn) -> bool:
+    global _scheduler
+    if not speculation_enabled():
+        return False
+    _scheduler = SpeculativeScheduler(
+        prepare,
+        compute,
+        debounce_seconds=env_float("SPECULATION_DEBOUNCE_MS", 1500.0) / 1000,
+        max_concurrency=int(env_float("SPECULATION_MAX_CONCURRENCY", 1)),
+    )
+    _scheduler.start(loop)
+    return True
+
+
+def stop() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+    _scheduler = None
+
+
+def active() -> bool:
+    return _scheduler is not None
+
+
+def notify_change(event: str, payload: Dict[str, Any]) -> None:
+    # Only the default database is tracked; user shards have no background copy.
+    if _scheduler is not None and payload.get("user_id") is None:
+        _scheduler.notify(event, payload)
+
+
+def remember(fingerprint: str, result: Dict[str, Any]) -> None:
+    if _scheduler is not None:
+        _scheduler.remember(fingerprint, result)
+
+
+def lookup(fingerprint: str) -> Optional[Dict[str, Any]]:
+    if _scheduler is None:
+        return None
+    return _scheduler.lookup(fingerprint)
+
+
+def stats() -> Dict[str, Any]:
+    if _scheduler is None:
+        return {"enabled": False}
+    return {"enabled": True, **_scheduler.snapshot()}
@@ -0,0 +1,141 @@
+"""Change feed for offline-first clients.
+
+Triggers on ``meal_logs``, ``user_preferences`` and ``user_meals`` append a
+row to ``change_log`` in the same transaction as every insert, update and
+delete, and edits or deletes of archived logs record theirs explicitly.
+``GET /api/sync?since=<seq>`` returns each record changed after ``seq``
+once, with its current state or a tombstone, so a client that was offline
+downloads what changed instead of whole pages of history.
+
+Compaction keeps the log proportional to recent changes: entries that a
+later change to the same record supersedes are always dropped, and entries
+older than ``CHANGE_LOG_RETENTION_DAYS`` (default 30) are dropped too. A
+client whose cursor predates the retained history gets ``reset: true`` and
+reloads. ``CHANGE_LOG_COMPACT_INTERVAL_MINUTES`` (default 60, 0 disables)
+compacts ``DB_PATH`` and every user shard inside the app; the CLI covers
+cron jobs::
+
+    python -m backend.sync compact [--retention-days 30] [--user ID | --all-shards]
+    python -m backend.sync changes --since SEQ [--user ID]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import database, shards
+from .env import env_float
+from .periodic import PeriodicTask, start_every
+
+logger = logging.getLogger("sync")
+
+# A client offline for less than this always syncs incrementally.
+MIN_RETENTION_DAYS = 1
+
+
+def retention_days() -> float:
+    return max(env_float("CHANGE_LOG_RETENTION_DAYS", 30), MIN_RETENTION_DAYS)
+
+
+def compact(retention: Optional[float] = None) -> Dict[str, Any]:
+    """Compact the current database's change log, keeping ``retention`` days."""
+    days = max(retention if retention is not None else retention_days(), MIN_RETENTION_DAYS)
+    started = time.perf_counter()
+    result = database.compact_change_log(
+        (datetime.utcnow() - timedelta(days=days)).isoformat(),
+        pause_seconds=env_float("CHANGE_LOG_COMPACT_PAUSE_MS", 5.0) / 1000,
+    )
+    result["retention_days"] = days
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    if result["superseded"] or result["expired"]:
+        logger.info(
+            "Compacted change log: %s superseded and %s expired entries",
+            result["superseded"],
+            result["expired"],
+        )
+    return result
+
+
+def compact_all_shards(retention: Optional[float] = None) -> List[Dict[str, Any]]:
+    """``compact`` against ``DB_PATH`` and then each user shard in turn."""
+    results = []
+    for user_id, result in database.for_each_shard(lambda: compact(retention)):
+        results.append({"user_id": user_id, **result})
+    return results
+
+
+def _summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "shards": len(results),
+        "superseded": sum(result["superseded"] for result in results),
+        "expired": sum(result["expired"] for result in results),
+        "seconds": round(sum(result["seconds"] for result in results), 3),
+    }
+
+
+_scheduler: Optional[PeriodicTask] = None
+
+
+def start(loop: asyncio.AbstractEventLoop) -> bool:
+    global _scheduler
+    _scheduler = start_every(
+        "CHANGE_LOG_COMPACT_INTERVAL_MINUTES",
+        60.0,
+        "change log compaction",
+        compact_all_shards,
+        loop,
+        summarize=_summarize,
+    )
+    return _scheduler is not None
+
+
+def stop() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+    _scheduler = None
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "scheduled": _scheduler.snapshot() if _scheduler is not None else None,
+        "retention_days": retention_days(),
+        **database.change_log_summary(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", type=Path, help="database file (default: DB_PATH)")
+    parser.add_argument("--user", help="use this user's shard instead")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact_parser = commands.add_parser("compact", help="compact the change log now")
+    compact_parser.add_argument("--retention-days", type=float)
+    compact_parser.add_argument("--all-shards", action="store_true", help="DB_PATH and every user shard")
+    changes_parser = commands.add_parser("changes", help="print the changes after a sequence number")
+    changes_parser.add_argument("--since", type=int, required=True)
+    changes_parser.add_argument("--limit", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.db:
+        database.DB_PATH = args.db
+    with shards.user_scope(args.user):
+        database.init_db()
+        if args.command == "compact" and args.all_shards:
+            result: Any = compact_all_shards(args.retention_days)
+        elif args.command == "compact":
+            result = compact(args.retention_days)
+        else:
+            result = database.get_changes(args.since, args.limit)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from backend import database, write_queue
+
+
+@pytest.fixture
+def db(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """A fresh ``DB_PATH`` under ``tmp_path`` with the full schema."""
+    path = tmp_path / "nutrition.db"
+    monkeypatch.setattr(database, "DB_PATH", path)
+    database.init_db()
+    yield path
+    write_queue.stop()
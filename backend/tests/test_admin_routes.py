@@ -0,0 +1,25 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import app
+
+ROUTES = ["/api/db/writer/stats", "/api/db/backups", "/api/db/shards", "/api/db/archive"]
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_db_routes_are_disabled_without_a_token(client, monkeypatch, route):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert client.get(route).status_code == 404
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_db_routes_need_the_admin_token(client, monkeypatch, route):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    assert client.get(route).status_code == 403
+    assert client.get(route, headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get(route, headers={"X-Admin-Token": "secret"}).status_code == 200
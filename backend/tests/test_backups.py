@@ -0,0 +1,68 @@
+from datetime import date, timedelta
+
+import pytest
+
+from backend import archive, backups, database
+from backend.schemas import MealLogRequest
+
+
+def _log(name, days_ago):
+    return database.log_meal(
+        MealLogRequest(
+            meal_name=name,
+            meal_type="lunch",
+            calories=500,
+            meal_date=date.today() - timedelta(days=days_ago),
+        )
+    )
+
+
+@pytest.fixture
+def archived(db):
+    old = _log("Lentil soup", 400)
+    _log("Lentil salad", 1)
+    archive.run(horizon=180)
+    return old
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_snapshots_include_archive_partitions(archived, tmp_path, compress):
+    manifest = backups.create_snapshot(tmp_path / "backups", compress=compress)
+    [partition] = manifest["partitions"]
+    assert partition["row_counts"] == {"meal_logs": 1}
+    snapshot = tmp_path / "backups" / manifest["snapshot"]
+    assert backups.verify_snapshot(snapshot)["partitions"] == 1
+
+    assert database.delete_meal_log(archived)
+    assert database.fetch_meal_log_by_id(archived) is None
+    result = backups.restore_snapshot(snapshot)
+    assert result["partitions"] == 1
+    assert database.fetch_meal_log_by_id(archived)["meal_name"] == "Lentil soup"
+
+
+def test_verify_rejects_a_damaged_partition(archived, tmp_path):
+    manifest = backups.create_snapshot(tmp_path / "backups")
+    stored = tmp_path / "backups" / manifest["archive"] / manifest["partitions"][0]["snapshot"]
+    stored.write_bytes(stored.read_bytes()[:-1] + b"\0")
+    with pytest.raises(backups.BackupError):
+        backups.verify_snapshot(tmp_path / "backups" / manifest["snapshot"])
+
+
+def test_restore_removes_partitions_the_snapshot_does_not_have(db, tmp_path):
+    manifest = backups.create_snapshot(tmp_path / "backups")
+    assert "partitions" not in manifest
+    _log("Lentil soup", 400)
+    archive.run(horizon=180)
+    assert list(database.archive_dir().glob("*.db"))
+
+    backups.restore_snapshot(tmp_path / "backups" / manifest["snapshot"])
+    assert list(database.archive_dir().glob("*.db")) == []
+    assert database.list_meal_log_partitions() == []
+
+
+def test_prune_removes_archive_copies(archived, tmp_path):
+    directory = tmp_path / "backups"
+    first = backups.create_snapshot(directory)
+    backups.create_snapshot(directory)
+    assert backups.prune(directory, 1) == 1
+    assert not (directory / first["archive"]).exists()
@@ -0,0 +1,53 @@
+import sqlite3
+
+from backend import database
+from backend.benchmarks.suite import compare
+from backend.benchmarks.synthetic import DatasetSpec, parse_sizes, populate
+
+
+def _rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(
+            """
+            SELECT meal_name, meal_type, calories, nutrition, meal_date, meal_time
+            FROM meal_logs
+            ORDER BY id
+            """
+        ).fetchall()
+
+
+def test_the_same_spec_generates_the_same_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", database.DB_PATH)
+    spec = DatasetSpec.scaled(500, seed=11)
+    populate(tmp_path / "a.db", spec)
+    populate(tmp_path / "b.db", spec)
+    populate(tmp_path / "c.db", DatasetSpec.scaled(500, seed=12))
+
+    assert len(_rows(tmp_path / "a.db")) == 500
+    assert _rows(tmp_path / "a.db") == _rows(tmp_path / "b.db")
+    assert _rows(tmp_path / "a.db") != _rows(tmp_path / "c.db")
+
+
+def _results(**timings):
+    return {
+        "results": [
+            {"scenario": name, "size": 1000, "params": {}, "p50_ms": value}
+            for name, value in timings.items()
+        ]
+    }
+
+
+def test_compare_flags_only_slowdowns_past_both_thresholds():
+    base = _results(history=10.0, dashboard=0.2, search=8.0, recommend=5.0)
+    head = _results(history=14.0, dashboard=0.4, search=8.2, recommend=3.0)
+    rows = {row["scenario"]: row for row in compare(base, head, 0.1, 1.0, "p50_ms")}
+
+    assert rows["history"]["regression"]
+    # Twice as slow, but by less than min_delta_ms.
+    assert not rows["dashboard"]["regression"]
+    assert not rows["search"]["regression"]
+    assert rows["recommend"]["improvement"]
+
+
+def test_sizes_accept_powers_of_ten():
+    assert parse_sizes(["1000", "1e5,10^6"]) == [1_000, 100_000, 1_000_000]
@@ -0,0 +1,53 @@
+from datetime import date, timedelta
+
+from backend import archive, database
+from backend.schemas import MealLogRequest
+
+
+def _log(name, days_ago):
+    return database.log_meal(
+        MealLogRequest(
+            meal_name=name,
+            meal_type="dinner",
+            calories=600,
+            meal_date=date.today() - timedelta(days=days_ago),
+        )
+    )
+
+
+def _trace_reads(monkeypatch):
+    statements = []
+    connect = database._get_read_connection
+
+    def traced():
+        conn = connect()
+        conn.set_trace_callback(lambda sql: statements.append((conn.in_transaction, sql)))
+        return conn
+
+    monkeypatch.setattr(database, "_get_read_connection", traced)
+    return statements
+
+
+def test_snapshot_reads_archived_logs_in_its_own_transaction(db, monkeypatch):
+    archived = _log("Bean chili", 300)
+    recent = _log("Bean tacos", 1)
+    archive.run(horizon=180)
+    assert database.list_meal_log_partitions()
+
+    statements = _trace_reads(monkeypatch)
+    snapshot = database.get_dashboard_snapshot(limit=10, days=400)
+    assert [meal["id"] for meal in snapshot["recent_meals"]] == [recent, archived]
+    partition_reads = [
+        in_transaction for in_transaction, sql in statements if "partition_0.meal_logs" in sql
+    ]
+    assert partition_reads and all(partition_reads)
+
+
+def test_snapshot_pages_past_the_attached_partitions(db):
+    logged = [_log(f"Meal {month}", 200 + 31 * month) for month in range(10)]
+    archive.run(horizon=180)
+    assert len(database.list_meal_log_partitions()) > database.MAX_ATTACHED_PARTITIONS
+
+    snapshot = database.get_dashboard_snapshot(limit=20, days=600)
+    assert [meal["id"] for meal in snapshot["recent_meals"]] == logged
+    assert snapshot["logs"] == []
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from backend import meal_logic
+from backend.schemas import MealGenerationRequest
+
+PLAN = {"lunch": {"name": "Lentil salad"}, "dinner": {"name": "Bean chili"}}
+
+
+@pytest.fixture
+def slow_model(monkeypatch):
+    calls = []
+
+    async def generate(messages, days=None):
+        calls.append(messages)
+        await asyncio.sleep(0.2)
+        return PLAN
+
+    monkeypatch.setattr(meal_logic, "generate_meal_suggestions", generate)
+    return calls
+
+
+def test_a_missed_deadline_serves_the_fallback_and_caches_the_late_plan(db, slow_model, monkeypatch):
+    monkeypatch.setenv("PLAN_CACHE_VARIANTS", "1")
+
+    async def scenario():
+        missed = await meal_logic.generate_meal_plan(MealGenerationRequest(), deadline_ms=20)
+        await asyncio.gather(*meal_logic._background_generations)
+        again = await meal_logic.generate_meal_plan(MealGenerationRequest(), deadline_ms=20)
+        return missed, again
+
+    missed, again = asyncio.run(scenario())
+    assert missed["source"] == "fallback"
+    assert missed["lunch"] and missed["dinner"]
+    assert again["source"] == "cache"
+    assert again["lunch"] == PLAN["lunch"]
+    assert len(slow_model) == 1
+
+
+def test_a_plan_within_the_deadline_is_served_as_generated(db, slow_model, monkeypatch):
+    monkeypatch.setenv("PLAN_CACHE_ENABLED", "0")
+    plan = asyncio.run(meal_logic.generate_meal_plan(MealGenerationRequest(), deadline_ms=2000))
+    assert plan["source"] == "openai"
+    assert plan["dinner"] == PLAN["dinner"]
@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+import pytest
+
+from backend import database, dedupe
+from backend.schemas import CustomMealRequest
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch):
+    monkeypatch.setattr(dedupe, "_indexes", OrderedDict())
+
+
+def _save(name, ingredients, tags=()):
+    recipe = {"name": name, "ingredients": list(ingredients), "tags": list(tags)}
+    return database.save_custom_meal(recipe, {"name": name, "meal_type": "dinner"})["id"]
+
+
+def _request(name, ingredients=(), **extra):
+    return CustomMealRequest(name=name, preferred_ingredients=list(ingredients), **extra)
+
+
+@pytest.fixture
+def curry(db):
+    return _save(
+        "Chickpea spinach curry",
+        ["400 g chickpeas", "200 g spinach", "1 onion, diced", "2 tbsp curry paste", "coconut milk"],
+        ["vegan"],
+    )
+
+
+def test_a_reworded_request_matches_the_saved_recipe(curry):
+    match = dedupe.find_duplicate(_request("Easy spinach & chickpea curry", ["chickpeas", "spinach"]))
+    assert match is not None
+    meal, score = match
+    assert meal["id"] == curry
+    assert score >= 0.8
+
+
+def test_a_different_dish_sharing_a_word_is_not_a_duplicate(curry):
+    assert dedupe.find_duplicate(_request("Chicken curry", ["chicken thighs", "yoghurt"])) is None
+
+
+def test_the_threshold_and_force_flag_are_respected(curry, monkeypatch):
+    request = _request("Chickpea spinach curry", ["chickpeas", "spinach"])
+    assert dedupe.find_duplicate(request) is not None
+    assert dedupe.find_duplicate(_request("Chickpea spinach curry", ["chickpeas"], force=True)) is None
+
+    monkeypatch.setenv("CUSTOM_MEAL_DUPLICATE_THRESHOLD", "1.01")
+    assert dedupe.find_duplicate(request) is None
+
+
+def test_similarity_is_containment_of_the_request_in_the_recipe():
+    recipe = dedupe.fingerprint_meal(
+        {"name": "Tofu stir fry", "ingredients": ["tofu", "broccoli", "soy sauce", "rice", "ginger"]}
+    )
+    request = dedupe.fingerprint_request(_request("Tofu stir fry", ["tofu", "broccoli"]))
+    assert dedupe.similarity(request, recipe) >= 0.9
+    assert dedupe.similarity(request, request) == 1.0
@@ -0,0 +1,45 @@
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app import app
+
+MEAL = {"meal_name": "Bean tacos", "meal_type": "dinner", "calories": 650}
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(app)
+
+
+def _logged(db):
+    with sqlite3.connect(db) as conn:
+        return conn.execute("SELECT COUNT(*) FROM meal_logs").fetchone()[0]
+
+
+def test_a_retried_post_replays_the_first_response(client, db):
+    headers = {"Idempotency-Key": "log-1"}
+    first = client.post("/api/meals/log", json=MEAL, headers=headers)
+    retry = client.post("/api/meals/log", json=MEAL, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert _logged(db) == 1
+
+
+def test_reusing_a_key_for_a_different_body_is_rejected(client, db):
+    headers = {"Idempotency-Key": "log-1"}
+    assert client.post("/api/meals/log", json=MEAL, headers=headers).status_code == 200
+
+    other = client.post("/api/meals/log", json={**MEAL, "calories": 700}, headers=headers)
+    assert other.status_code == 422
+    assert _logged(db) == 1
+
+
+def test_posts_without_a_key_are_not_deduplicated(client, db):
+    client.post("/api/meals/log", json=MEAL)
+    client.post("/api/meals/log", json=MEAL)
+    assert _logged(db) == 2
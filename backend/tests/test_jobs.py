@@ -0,0 +1,13 @@
+from backend import database
+
+
+def test_an_expired_lease_on_the_last_attempt_fails_the_job(db):
+    database.enqueue_job("job-1", "generate", {})
+    assert database.claim_job("worker-a", 0, max_attempts=2)["attempts"] == 1
+    # The first worker died holding the lease; the second attempt is allowed.
+    assert database.claim_job("worker-b", 0, max_attempts=2)["attempts"] == 2
+
+    assert database.claim_job("worker-c", 0, max_attempts=2) is None
+    job = database.get_job("job-1")
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
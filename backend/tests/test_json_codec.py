@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from backend import json_codec
+
+
+def _installed():
+    names = []
+    for name, factory in json_codec.BACKENDS.items():
+        try:
+            factory()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+BLOB = {"calories": 512.5, "name": "Crème brûlée", "tags": ["dessert"], "ok": True, "note": None}
+
+
+@pytest.mark.parametrize("name", _installed())
+def test_every_codec_writes_json_the_others_read(name):
+    encode, decode = json_codec.BACKENDS[name]()
+
+    encoded = encode(BLOB)
+
+    assert json.loads(encoded) == BLOB
+    assert decode(json.dumps(BLOB)) == BLOB
+    assert decode(encoded.decode("utf-8")) == BLOB
+
+
+@pytest.mark.parametrize("name", _installed())
+def test_decode_errors_are_json_decode_errors(name):
+    _, decode = json_codec.BACKENDS[name]()
+
+    with pytest.raises(json.JSONDecodeError):
+        decode(b"{not json")
+
+
+def test_integer_keys_are_written_as_strings():
+    assert json_codec.loads(json_codec.dumps({1: "a"})) == {"1": "a"}
+
+
+def test_unavailable_codecs_fall_back(monkeypatch):
+    def missing():
+        raise ImportError("not installed")
+
+    monkeypatch.setitem(json_codec.BACKENDS, "msgspec", missing)
+
+    assert json_codec._select("msgspec")[0] != "msgspec"
+    assert json_codec._select("simdjson")[0] in json_codec.BACKENDS
+    assert json_codec._select("json")[0] == "json"
@@ -0,0 +1,102 @@
+import asyncio
+import json
+from datetime import date
+
+import pytest
+
+from backend import live_progress
+
+WEEK = date(2026, 10, 19)
+
+
+@pytest.fixture
+def progress(monkeypatch):
+    current = {"protein": {"current": 20.0, "target": 100.0}}
+
+    def build():
+        return json.loads(json.dumps(current)), {}, {}, [], WEEK
+
+    monkeypatch.setattr(live_progress, "build_weekly_progress", build)
+    return current
+
+
+def _parse(frame):
+    fields = dict(line.split(": ", 1) for line in frame.strip().splitlines())
+    return fields["event"], fields["id"], json.loads(fields["data"])
+
+
+async def _next(subscriber):
+    return _parse(await asyncio.wait_for(subscriber.queue.get(), 1))
+
+
+async def _log(broker, progress, protein):
+    progress["protein"]["current"] = protein
+    broker.notify("meal_logged", {"meal_date": WEEK.isoformat()})
+    await asyncio.sleep(0)
+
+
+def test_subscribers_get_a_snapshot_then_only_changed_fields(progress):
+    async def scenario():
+        broker = live_progress.ProgressBroker(queue_size=8, history_size=8)
+        broker.start(asyncio.get_running_loop())
+        subscriber = broker.subscribe()
+        first = await _next(subscriber)
+        await _log(broker, progress, 45.0)
+        second = await _next(subscriber)
+        broker.stop()
+        return first, second
+
+    (event, _, data), (delta, _, changes) = asyncio.run(scenario())
+    assert event == "snapshot"
+    assert data["progress"]["protein"]["current"] == 20.0
+    assert delta == "delta"
+    assert changes["changes"] == {"protein": {"current": 45.0}}
+
+
+def test_a_reconnect_replays_missed_deltas_or_falls_back_to_a_snapshot(progress):
+    async def scenario():
+        broker = live_progress.ProgressBroker(queue_size=8, history_size=8)
+        broker.start(asyncio.get_running_loop())
+        subscriber = broker.subscribe()
+        _, token, _ = await _next(subscriber)
+        broker.unsubscribe(subscriber)
+        # Keep one listener so the broker keeps its baseline and history.
+        watcher = broker.subscribe()
+        await _next(watcher)
+        await _log(broker, progress, 30.0)
+        await _next(watcher)
+        await _log(broker, progress, 40.0)
+        await _next(watcher)
+
+        resumed = broker.subscribe(token)
+        replayed = [await _next(resumed), await _next(resumed)]
+        stranger = broker.subscribe("other-epoch-3")
+        fresh = await _next(stranger)
+        broker.stop()
+        return replayed, fresh
+
+    replayed, fresh = asyncio.run(scenario())
+    assert [event for event, _, _ in replayed] == ["delta", "delta"]
+    assert [data["changes"]["protein"]["current"] for _, _, data in replayed] == [30.0, 40.0]
+    assert fresh[0] == "snapshot"
+    assert fresh[2]["progress"]["protein"]["current"] == 40.0
+
+
+def test_a_slow_subscriber_is_resynced_with_a_snapshot(progress):
+    async def scenario():
+        broker = live_progress.ProgressBroker(queue_size=1, history_size=8)
+        broker.start(asyncio.get_running_loop())
+        subscriber = broker.subscribe()
+        await asyncio.sleep(0.05)
+        for protein in (30.0, 40.0, 50.0):
+            await _log(broker, progress, protein)
+            await asyncio.sleep(0.05)
+        frame = await _next(subscriber)
+        stats = dict(broker.stats)
+        broker.stop()
+        return frame, stats
+
+    (event, _, data), stats = asyncio.run(scenario())
+    assert event == "snapshot"
+    assert data["progress"]["protein"]["current"] == 50.0
+    assert stats["resyncs"] >= 1
@@ -0,0 +1,69 @@
+import json
+
+from backend import llm_replay
+from backend.llm_replay import Recording, ReplayStore, parse_log, request_key
+
+
+def _request(name, text, **extra):
+    return {
+        "model": "gpt-test",
+        "input": [{"role": "user", "content": text}],
+        "text": {"format": {"type": "json_schema", "name": name, "schema": {"type": "object"}}},
+        **extra,
+    }
+
+
+def _line(timestamp, direction, payload, prefix="INFO openai "):
+    return prefix + json.dumps({"timestamp": timestamp, "direction": direction, "payload": payload})
+
+
+def test_a_recorded_cassette_replays_the_same_exchange(tmp_path, monkeypatch):
+    cassette = tmp_path / "cassette.jsonl"
+    monkeypatch.setenv("OPENAI_REPLAY", "record")
+    monkeypatch.setenv("OPENAI_CASSETTE", str(cassette))
+    request = _request("meal_suggestions", "plan my lunch")
+    llm_replay.record(request, 200, {"output_text": "{}"}, 1.5)
+
+    [recording] = parse_log(cassette)
+    assert recording.name == "meal_suggestions"
+    assert recording.request == request
+    assert recording.body == {"output_text": "{}"}
+    assert round(recording.latency, 3) == 1.5
+
+
+def test_application_log_lines_pair_first_in_first_out_per_schema(tmp_path):
+    log = tmp_path / "openai.log"
+    lunch = _request("meal_suggestions", "lunch")
+    estimate = _request("manual_meal_nutrition", "toast")
+    dinner = _request("meal_suggestions", "dinner")
+    reply = {"text": {"format": {"name": "meal_suggestions"}}}
+    estimate_reply = {"text": {"format": {"name": "manual_meal_nutrition"}}}
+    log.write_text(
+        "\n".join(
+            [
+                _line("2026-10-19T12:00:00", "request", lunch),
+                _line("2026-10-19T12:00:01", "request", estimate),
+                _line("2026-10-19T12:00:02", "request", dinner),
+                "not json at all",
+                _line("2026-10-19T12:00:04", "response", estimate_reply),
+                _line("2026-10-19T12:00:05", "response", reply),
+                _line("2026-10-19T12:00:09", "response", reply),
+            ]
+        )
+    )
+
+    recordings = list(parse_log(log))
+    assert [recording.request for recording in recordings] == [estimate, lunch, dinner]
+    assert [recording.latency for recording in recordings] == [3.0, 5.0, 7.0]
+
+
+def test_lookups_ignore_sampling_settings_and_keep_successes_over_errors():
+    store = ReplayStore(max_entries=10)
+    request = _request("meal_suggestions", "lunch", temperature=0.2)
+    store.add(Recording("meal_suggestions", request, 200, {"ok": True}, 1.0))
+    store.add(Recording("meal_suggestions", request, 500, {"error": "boom"}, 1.0))
+
+    assert request_key(request) == request_key(_request("meal_suggestions", "lunch", temperature=0.9))
+    assert store.lookup(_request("meal_suggestions", "lunch")).body == {"ok": True}
+    assert store.lookup(_request("meal_suggestions", "dinner")) is None
+    assert store.stats["hits"] == 1 and store.stats["misses"] == 1
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from backend.openai_utils import LLMQueueTimeout, LLMScheduler
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setenv("OPENAI_PRIORITIES", "interactive=0,batch=9")
+    monkeypatch.setenv("OPENAI_CONCURRENCY", "interactive=4,batch=4,narrow=1")
+    monkeypatch.setenv("OPENAI_MAX_CONCURRENCY", "4")
+    monkeypatch.delenv("OPENAI_RPM", raising=False)
+    monkeypatch.delenv("OPENAI_TPM", raising=False)
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_higher_priority_waiters_are_admitted_first(monkeypatch):
+    monkeypatch.setenv("OPENAI_MAX_CONCURRENCY", "1")
+
+    async def scenario():
+        scheduler = LLMScheduler()
+        await scheduler.acquire("batch", 100)
+        admitted = []
+
+        async def call(name):
+            await scheduler.acquire(name, 100)
+            admitted.append(name)
+
+        waiters = [asyncio.create_task(call("batch")), asyncio.create_task(call("interactive"))]
+        await _settle()
+        assert admitted == []
+        scheduler.release("batch")
+        await _settle()
+        scheduler.release(admitted[0])
+        await asyncio.gather(*waiters)
+        return admitted
+
+    assert asyncio.run(scenario()) == ["interactive", "batch"]
+
+
+def test_a_name_at_its_cap_does_not_block_other_names():
+    async def scenario():
+        scheduler = LLMScheduler()
+        await scheduler.acquire("narrow", 100)
+        blocked = asyncio.create_task(scheduler.acquire("narrow", 100))
+        await asyncio.wait_for(scheduler.acquire("batch", 100), 1)
+        await _settle()
+        assert not blocked.done()
+        scheduler.release("narrow")
+        await asyncio.wait_for(blocked, 1)
+        return scheduler.snapshot()["by_name"]["narrow"]
+
+    assert asyncio.run(scenario())["admitted"] == 2
+
+
+def test_a_call_over_the_request_rate_times_out_in_the_queue(monkeypatch):
+    monkeypatch.setenv("OPENAI_RPM", "1")
+    monkeypatch.setenv("OPENAI_QUEUE_TIMEOUT_SECONDS", "0.05")
+
+    async def scenario():
+        scheduler = LLMScheduler()
+        await scheduler.acquire("interactive", 100)
+        with pytest.raises(LLMQueueTimeout):
+            await scheduler.acquire("interactive", 100)
+        return scheduler.snapshot()["by_name"]["interactive"]
+
+    stats = asyncio.run(scenario())
+    assert stats["admitted"] == 1
+    assert stats["timed_out"] == 1
@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+from backend import database, meal_library
+
+
+@pytest.fixture(autouse=True)
+def fresh_libraries(monkeypatch):
+    monkeypatch.setattr(meal_library, "_libraries", type(meal_library._libraries)())
+    monkeypatch.setattr(meal_library, "_counters", dict.fromkeys(meal_library._counters, 0))
+
+
+def _save(name):
+    recipe = {"name": name, "ingredients": [f"1 {name.lower()}"], "tags": ["quick"]}
+    return database.save_custom_meal(recipe, {"name": name, "meal_type": "dinner"})["id"]
+
+
+def _names(meals):
+    return [meal["name"] for meal in meals]
+
+
+def test_saved_recipes_show_up_without_reloading_the_library(db):
+    _save("Lentil soup")
+    _save("Bean chili")
+    assert _names(meal_library.list_meals()) == ["Bean chili", "Lentil soup"]
+
+    _save("Tofu stir fry")
+
+    assert meal_library.list_meals() == database.list_custom_meals()
+    assert _names(meal_library.list_meals(limit=1)) == ["Tofu stir fry"]
+    stats = meal_library.stats()
+    assert stats["loads"] == 1
+    assert stats["rows_decoded"] == 3
+
+
+def test_callers_cannot_modify_the_cached_recipes(db):
+    _save("Lentil soup")
+
+    meal_library.list_meals()[0]["name"] = "Changed"
+
+    assert _names(meal_library.list_meals()) == ["Lentil soup"]
+
+
+def test_pages_past_the_cache_fall_back_to_sqlite(db, monkeypatch):
+    monkeypatch.setenv("MEAL_LIBRARY_CACHE_SIZE", "2")
+    for name in ("Lentil soup", "Bean chili", "Tofu stir fry"):
+        _save(name)
+
+    total, cached = meal_library.page(limit=2)
+    _, beyond = meal_library.page(limit=2, offset=2)
+
+    assert total == 3
+    assert _names(cached) == ["Tofu stir fry", "Bean chili"]
+    assert _names(beyond) == ["Lentil soup"]
+    assert meal_library.snapshot()[1] is None
+    assert meal_library.stats()["hits"] == 1
+
+
+def test_a_restored_older_database_rebuilds_the_library(db):
+    _save("Lentil soup")
+    _save("Bean chili")
+    meal_library.list_meals()
+
+    with sqlite3.connect(db) as conn:
+        conn.execute("DELETE FROM user_meals WHERE name = 'Bean chili'")
+
+    assert _names(meal_library.list_meals()) == ["Lentil soup"]
+    assert meal_library.stats()["loads"] == 2
@@ -0,0 +1,17 @@
+from backend import metrics
+
+
+def test_only_calls_from_a_rerun_job_attempt_count_as_reattempts(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    monkeypatch.setattr(metrics.LLM_JOB_REATTEMPTS, "_values", {})
+
+    metrics.record_llm_call("meal_suggestions", 0.1, "ok")
+    token = metrics.job_attempt.set(2)
+    try:
+        metrics.record_llm_call("meal_suggestions", 0.1, "ok")
+    finally:
+        metrics.job_attempt.reset(token)
+
+    assert metrics.LLM_JOB_REATTEMPTS.render()[-1] == (
+        'llm_job_reattempt_calls_total{response_name="meal_suggestions"} 1'
+    )
@@ -0,0 +1,40 @@
+import asyncio
+
+from backend import meal_logic, plan_cache, shards
+
+LUNCH = {"name": "Lentil salad"}
+DINNER = {"name": "Bean chili"}
+
+
+def test_users_share_the_cache_and_are_served_the_first_variant(db, monkeypatch):
+    monkeypatch.setenv("PLAN_CACHE_VARIANTS", "2")
+    with shards.user_scope("alice"):
+        assert plan_cache.lookup("bucket") is None
+        plan_cache.store("bucket", LUNCH, DINNER)
+    with shards.user_scope("bob"):
+        assert plan_cache.lookup("bucket") == (LUNCH, DINNER, True)
+        plan_cache.store("bucket", {"name": "Tofu wrap"}, DINNER)
+        assert plan_cache.lookup("bucket")[2] is False
+    assert plan_cache.cache_stats()["variants"] == 2
+
+
+def test_a_short_bucket_is_filled_once_in_the_background(db, monkeypatch):
+    calls = []
+
+    async def generate(messages):
+        calls.append(messages)
+        await asyncio.sleep(0)
+        return {"lunch": {"name": "Tofu wrap"}, "dinner": DINNER}
+
+    monkeypatch.setattr(meal_logic, "generate_meal_suggestions", generate)
+    monkeypatch.setattr(meal_logic, "_build_generation_messages", lambda context: [])
+    plan_cache.store("bucket", LUNCH, DINNER)
+
+    async def hit_twice():
+        meal_logic._fill_plan_cache({}, "bucket")
+        meal_logic._fill_plan_cache({}, "bucket")
+        await asyncio.gather(*meal_logic._background_generations)
+
+    asyncio.run(hit_twice())
+    assert len(calls) == 1
+    assert plan_cache.lookup("bucket") == (LUNCH, DINNER, False)
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+from backend import profiling
+
+
+def _work(n):
+    return sum(i * i for i in range(n))
+
+
+async def _app(scope, receive, send):
+    await asyncio.to_thread(profiling.thread_call(_work), 1000)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def _call(headers):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/meals",
+        "headers": [(key.encode(), value.encode()) for key, value in headers.items()],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(profiling.ProfilingMiddleware(_app)(scope, receive, send))
+    return dict(messages[0]["headers"])
+
+
+def _enable(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "TOKEN", "secret")
+    monkeypatch.setattr(profiling, "ENABLED", True)
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+
+
+def test_token_requests_write_a_merged_artifact(monkeypatch, tmp_path):
+    _enable(monkeypatch, tmp_path)
+
+    headers = _call({"x-profile-token": "secret", "x-profile-alloc": "1"})
+
+    profile_id = headers[profiling.ID_HEADER].decode()
+    summary = json.loads(profiling.artifact_path(profile_id, ".json").read_text())
+    assert summary["trigger"] == "header"
+    assert summary["status"] == 200
+    assert summary["threads"] == 2
+    assert "allocations" in summary
+    assert any("_work" in row["function"] for row in summary["top_cumulative"])
+    assert profiling.artifact_path(profile_id, ".prof") is not None
+    assert [profile["id"] for profile in profiling.list_profiles()] == [profile_id]
+
+
+def test_wrong_token_is_reported_and_not_profiled(monkeypatch, tmp_path):
+    _enable(monkeypatch, tmp_path)
+
+    headers = _call({"x-profile-token": "guess"})
+
+    assert headers[profiling.SKIPPED_HEADER] == b"forbidden"
+    assert profiling.ID_HEADER not in headers
+    assert profiling.list_profiles() == []
+
+
+def test_old_artifacts_are_pruned_and_foreign_ids_rejected(monkeypatch, tmp_path):
+    _enable(monkeypatch, tmp_path)
+    monkeypatch.setenv("PROFILE_MAX_ARTIFACTS", "1")
+
+    _call({"x-profile-token": "secret"})
+    latest = _call({"x-profile-token": "secret"})[profiling.ID_HEADER].decode()
+
+    assert [profile["id"] for profile in profiling.list_profiles()] == [latest]
+    assert len(list(tmp_path.glob("*.prof"))) == 1
+    assert profiling.artifact_path("../" + latest, ".json") is None
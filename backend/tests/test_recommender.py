@@ -0,0 +1,46 @@
+from backend.recommender import LibraryIndex, score_library
+
+
+def _meal(meal_id, name, ingredients, tags):
+    return {
+        "id": meal_id,
+        "name": name,
+        "meal_type": "dinner",
+        "cooking_time": 20,
+        "ingredients": ingredients,
+        "tags": tags,
+        "nutrition": {"calories": 600, "protein": 30},
+    }
+
+
+MEALS = [
+    _meal(1, "Lentil curry", ["200 g lentils", "1 onion"], ["vegetarian", "Gluten Free"]),
+    _meal(2, "Chicken stir fry", ["200 g chicken", "50 g peanuts"], ["high-protein"]),
+    _meal(3, "Tofu satay", ["150 g tofu", "2 tbsp peanut butter"], ["vegetarian"]),
+]
+
+
+def _eligible(restrictions):
+    context = {
+        "remaining": {"calories": 1200, "protein": 60},
+        "remaining_ratios": {"protein": 0.5},
+        "limit_guidance": [],
+        "cooking_time_preference": 30,
+        "restrictions": restrictions,
+    }
+    index = LibraryIndex((len(MEALS), 3), MEALS)
+    return sorted(MEALS[position]["id"] for _, position in score_library(index, context, 600))
+
+
+def test_diet_restrictions_keep_recipes_tagged_with_them():
+    assert _eligible(["Vegetarian"]) == [1, 3]
+    assert _eligible(["vegetarian", "gluten-free"]) == [1]
+
+
+def test_banned_ingredients_exclude_recipes_containing_them():
+    assert _eligible(["no peanuts"]) == [1]
+    assert _eligible(["without chicken"]) == [1, 3]
+
+
+def test_no_restrictions_keep_everything():
+    assert _eligible([]) == [1, 2, 3]
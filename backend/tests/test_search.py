@@ -0,0 +1,80 @@
+import sqlite3
+from datetime import date, timedelta
+
+from backend import archive, database, search
+from backend.schemas import MealLogRequest
+
+
+def _log(name, days_ago, notes=None):
+    return database.log_meal(
+        MealLogRequest(
+            meal_name=name,
+            meal_type="breakfast",
+            calories=400,
+            meal_date=date.today() - timedelta(days=days_ago),
+            notes=notes,
+        )
+    )
+
+
+def _found(query, **filters):
+    return [row["id"] for row in search.search(query, scope="logs", **filters)["logs"]]
+
+
+def test_archived_logs_stay_searchable(db):
+    archived = _log("Blueberry porridge", 400)
+    recent = _log("Blueberry smoothie", 1)
+    assert archive.run(horizon=180)["rows"] == 1
+    assert database.list_meal_log_partitions()[0]["rows"] == 1
+
+    assert sorted(_found("blueber")) == [archived, recent]
+    assert _found("porridge") == [archived]
+    old = date.today() - timedelta(days=400)
+    assert _found("blueberry", start_date=old, end_date=old) == [archived]
+
+
+def test_archived_index_follows_later_archiving_and_deletes(db):
+    first = _log("Plain toast", 400)
+    archive.run(horizon=180)
+    # Back-dated into the month already archived.
+    second = _log("Buttered toast", 400)
+    archive.run(horizon=180)
+    assert database.list_meal_log_partitions()[0]["rows"] == 2
+    assert sorted(_found("toast")) == [first, second]
+
+    assert database.delete_meal_log(first)
+    assert _found("toast") == [second]
+    assert _found("plain") == []
+
+
+def test_partitions_without_an_index_get_one_on_the_next_run(db, monkeypatch):
+    archived = _log("Oat pancakes", 400)
+    archive.run(horizon=180)
+    partition = database.archive_dir() / database.list_meal_log_partitions()[0]["file"]
+    with sqlite3.connect(partition) as conn:
+        for name in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER meal_logs_fts_{name}")
+        conn.execute("DROP TABLE meal_logs_fts")
+    monkeypatch.setattr(database, "_indexed_partitions", set())
+    assert _found("pancakes") == []
+
+    archive.run(horizon=180)
+    assert _found("pancakes") == [archived]
+
+
+def test_matches_are_ranked_by_bm25_before_the_limit(db):
+    named = _log("Lentil soup", 30)
+    # Newer logs that only mention the term in their notes.
+    noted = [_log("Rice bowl", days, notes="Lentil leftovers") for days in range(1, 4)]
+
+    found = search.search("lentil", scope="logs", limit=2)["logs"]
+    assert [row["id"] for row in found] == [named, noted[-1]]
+    assert found[0]["score"] > found[1]["score"] > 0
+
+
+def test_archived_matches_are_merged_by_rank(db):
+    archived = _log("Miso ramen", 400)
+    recent = _log("Noodle soup", 1, notes="Miso broth")
+    archive.run(horizon=180)
+
+    assert _found("miso") == [archived, recent]
@@ -0,0 +1,33 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import shards
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/whoami")
+    def whoami() -> dict:
+        return {"user": shards.current_user()}
+
+    app.add_middleware(shards.ShardMiddleware)
+    return TestClient(app)
+
+
+def test_user_header_is_taken_as_sent_without_a_proxy_token(client, monkeypatch):
+    monkeypatch.delenv("SHARD_PROXY_TOKEN", raising=False)
+    assert client.get("/whoami", headers={"X-User-Id": "alice"}).json() == {"user": "alice"}
+
+
+def test_user_header_needs_the_proxy_token_when_one_is_set(client, monkeypatch):
+    monkeypatch.setenv("SHARD_PROXY_TOKEN", "secret")
+    assert client.get("/whoami", headers={"X-User-Id": "alice"}).status_code == 403
+    forged = {"X-User-Id": "alice", "X-Shard-Proxy-Token": "guess"}
+    assert client.get("/whoami", headers=forged).status_code == 403
+
+    proxied = {"X-User-Id": "alice", "X-Shard-Proxy-Token": "secret"}
+    assert client.get("/whoami", headers=proxied).json() == {"user": "alice"}
+    assert client.get("/whoami").json() == {"user": None}
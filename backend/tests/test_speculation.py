@@ -0,0 +1,69 @@
+import asyncio
+
+from backend.speculation import SpeculativeScheduler
+
+
+def test_a_newer_change_cancels_the_running_speculation():
+    async def scenario():
+        inputs = iter(["first", "second"])
+        started = []
+        release = asyncio.Event()
+
+        def prepare():
+            fingerprint = next(inputs)
+            return fingerprint, {"fingerprint": fingerprint}
+
+        async def compute(context):
+            started.append(context["fingerprint"])
+            await release.wait()
+            return {"plan": context["fingerprint"]}
+
+        scheduler = SpeculativeScheduler(prepare, compute, debounce_seconds=0, max_concurrency=1)
+        scheduler.start(asyncio.get_running_loop())
+        try:
+            scheduler.notify("meal_logged", {})
+            while not started:
+                await asyncio.sleep(0.01)
+            scheduler.notify("meal_logged", {})
+            while scheduler.stats["cancelled"] == 0:
+                await asyncio.sleep(0.01)
+            release.set()
+            while scheduler.stats["completed"] == 0:
+                await asyncio.sleep(0.01)
+        finally:
+            scheduler.stop()
+        return scheduler, started
+
+    scheduler, started = asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert started == ["first", "second"]
+    assert scheduler.stats["cancelled"] == 1
+    # The provider call already in flight still lands under its own inputs.
+    assert scheduler.lookup("first") == {"plan": "first"}
+    assert scheduler.lookup("second") == {"plan": "second"}
+
+
+def test_changes_within_the_debounce_window_start_one_speculation():
+    async def scenario():
+        calls = []
+
+        async def compute(context):
+            calls.append(context)
+            return {}
+
+        scheduler = SpeculativeScheduler(
+            lambda: ("inputs", {}), compute, debounce_seconds=0.05, max_concurrency=1
+        )
+        scheduler.start(asyncio.get_running_loop())
+        try:
+            for _ in range(3):
+                scheduler.notify("meal_logged", {})
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.2)
+        finally:
+            scheduler.stop()
+        return scheduler, calls
+
+    scheduler, calls = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert scheduler.stats["scheduled"] == 3
+    assert scheduler.stats["cancelled"] == 0
@@ -0,0 +1,88 @@
+from datetime import date, datetime, timedelta
+
+from backend import archive, database
+from backend.schemas import MealLogRequest
+
+
+def _log(name, days_ago=0):
+    return database.log_meal(
+        MealLogRequest(
+            meal_name=name,
+            meal_type="lunch",
+            calories=500,
+            meal_date=date.today() - timedelta(days=days_ago),
+        )
+    )
+
+
+def _cursor():
+    feed = database.get_changes(0)
+    assert feed["reset"] and feed["changes"] == []
+    return feed["next"]
+
+
+def _ops(feed):
+    return [(change["entity"], change["id"], change["op"]) for change in feed["changes"]]
+
+
+def test_each_changed_record_is_sent_once_with_its_latest_state(db):
+    kept = _log("Lentil soup")
+    gone = _log("Toast")
+    cursor = _cursor()
+
+    database.update_meal_override(kept, {"calories": 420})
+    database.delete_meal_log(gone)
+    added = _log("Bean chili")
+    feed = database.get_changes(cursor)
+
+    assert _ops(feed) == [
+        ("meal_log", kept, "upsert"),
+        ("meal_log", gone, "delete"),
+        ("meal_log", added, "upsert"),
+    ]
+    assert feed["changes"][0]["data"]["override_nutrition"] == {"calories": 420}
+    assert feed["changes"][1]["data"] is None
+    assert database.get_changes(feed["next"])["changes"] == []
+
+
+def test_pages_resume_from_next(db):
+    cursor = _cursor()
+    first, second = _log("Lentil soup"), _log("Bean chili")
+
+    page = database.get_changes(cursor, limit=1)
+    rest = database.get_changes(page["next"], limit=1)
+
+    assert page["more"] and _ops(page) == [("meal_log", first, "upsert")]
+    assert not rest["more"] and _ops(rest) == [("meal_log", second, "upsert")]
+
+
+def test_archiving_is_not_a_delete_but_archived_edits_are_changes(db):
+    archived = _log("Plain toast", days_ago=400)
+    cursor = _cursor()
+
+    assert archive.run(horizon=180)["rows"] == 1
+    assert database.get_changes(cursor)["changes"] == []
+
+    database.update_meal_override(archived, {"calories": 300})
+    assert _ops(database.get_changes(cursor)) == [("meal_log", archived, "upsert")]
+    database.delete_meal_log(archived)
+    assert _ops(database.get_changes(cursor)) == [("meal_log", archived, "delete")]
+
+
+def test_compaction_keeps_recent_cursors_and_resets_older_ones(db):
+    old_cursor = _cursor()
+    meal = _log("Lentil soup")
+    for calories in (410, 420, 430):
+        database.update_meal_override(meal, {"calories": calories})
+    before = database.get_changes(old_cursor)
+
+    hour_ago = (datetime.utcnow() - timedelta(hours=1)).isoformat()
+    result = database.compact_change_log(hour_ago, batch_size=2)
+    assert result["superseded"] == 3 and result["expired"] == 0
+    assert database.get_changes(old_cursor) == before
+
+    cursor = database.get_changes(old_cursor)["next"]
+    expired = database.compact_change_log((datetime.utcnow() + timedelta(seconds=1)).isoformat())
+    assert expired["expired"] == 1 and expired["floor"] == cursor
+    assert database.get_changes(old_cursor)["reset"]
+    assert not database.get_changes(cursor)["reset"]
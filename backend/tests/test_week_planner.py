@@ -0,0 +1,37 @@
+from datetime import date, timedelta
+
+from backend.recommender import LibraryIndex
+from backend.week_planner import optimize_week
+
+
+def _meal(meal_id, name, meal_type):
+    return {
+        "id": meal_id,
+        "name": name,
+        "meal_type": meal_type,
+        "cooking_time": 20,
+        "ingredients": [],
+        "tags": [],
+        "nutrition": {"calories": 600, "protein": 30},
+    }
+
+
+CONTEXT = {
+    "remaining": {"calories": 3600, "protein": 180},
+    "remaining_ratios": {"protein": 0.5},
+    "limit_guidance": [],
+    "cooking_time_preference": 30,
+    "restrictions": [],
+    "lunch_calories": 600,
+    "dinner_calories": 600,
+}
+
+
+def test_a_slot_with_no_candidates_is_left_empty():
+    meals = [_meal(1, "Lentil curry", "dinner"), _meal(2, "Bean chili", "dinner")]
+    days = [date(2026, 10, 19) + timedelta(days=offset) for offset in range(3)]
+    plan = optimize_week(CONTEXT, days, LibraryIndex((len(meals), 2), meals))
+
+    assert [day["lunch"] for day in plan["days"]] == [None, None, None]
+    assert all(day["dinner"] for day in plan["days"])
+    assert plan["stats"]["filled_slots"] == 3
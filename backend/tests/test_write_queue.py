@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+from backend.write_queue import GroupCommitWriter
+
+
+@pytest.fixture
+def writer():
+    writer = GroupCommitWriter(max_group=8, delay_seconds=0.0, max_connections=1)
+    yield writer
+    writer.stop()
+
+
+def _connect(path):
+    return lambda: sqlite3.connect(path, check_same_thread=False)
+
+
+def _create(writer, path):
+    writer.submit(str(path), _connect(path), "CREATE TABLE t (x INTEGER)", ()).result(5)
+
+
+def test_task_connection_survives_eviction(writer, tmp_path):
+    first, second = tmp_path / "first.db", tmp_path / "second.db"
+    _create(writer, first)
+    _create(writer, second)
+
+    def task(conn, pump):
+        # Over the one-connection limit: the pumped write must not close ``conn``.
+        pending = writer.submit(str(second), _connect(second), "INSERT INTO t VALUES (1)", ())
+        pump(0.1)
+        assert pending.done()
+        return conn.execute("SELECT count(*) FROM t").fetchone()[0]
+
+    assert writer.submit_task(str(first), _connect(first), task).result(5) == 0
+    assert writer.snapshot()["connections"] == 1
+
+
+def test_task_connection_survives_failed_write(writer, tmp_path):
+    path = tmp_path / "nutrition.db"
+    _create(writer, path)
+
+    def task(conn, pump):
+        conn.execute("BEGIN")
+        # BEGIN IMMEDIATE fails inside the task's transaction.
+        pending = writer.submit(str(path), _connect(path), "INSERT INTO t VALUES (1)", ())
+        pump(0.1)
+        with pytest.raises(sqlite3.OperationalError):
+            pending.result(0)
+        conn.execute("INSERT INTO t VALUES (2)")
+        conn.execute("COMMIT")
+        return conn
+
+    used = writer.submit_task(str(path), _connect(path), task).result(5)
+    # Closed once the task returned, and reopened for the next write.
+    with pytest.raises(sqlite3.ProgrammingError):
+        used.execute("SELECT 1")
+    writer.submit(str(path), _connect(path), "INSERT INTO t VALUES (3)", ()).result(5)
+    with sqlite3.connect(path) as conn:
+        assert [row[0] for row in conn.execute("SELECT x FROM t ORDER BY x")] == [2, 3]
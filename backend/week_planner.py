@@ -0,0 +1,238 @@
+"""Deterministic rest-of-week meal planning over the saved recipe library."""
+
+from __future__ import annotations
+
+import heapq
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .recommender import (
+    CALORIE_PENALTY_WEIGHT,
+    GAP_NUTRIENTS,
+    LIMIT_NUTRIENTS,
+    LIMIT_PENALTY_WEIGHT,
+    LibraryIndex,
+    as_suggestion,
+    get_library_index,
+    score_library,
+)
+
+
+SLOT_TYPES = ("lunch", "dinner")
+DEFAULT_BEAM_WIDTH = 8
+DEFAULT_CANDIDATES_PER_SLOT = 24
+DEFAULT_TIME_BUDGET_MS = 250.0
+DEFAULT_MAX_REPEATS = 2
+REPEAT_PENALTY = 0.03
+
+
+def plan_days(week_start: date, today: Optional[date] = None) -> List[date]:
+    today = today or date.today()
+    week_end = week_start + timedelta(days=6)
+    start = min(max(today, week_start), week_end)
+    return [start + timedelta(days=offset) for offset in range((week_end - start).days + 1)]
+
+
+class _Objective:
+    """Whole-plan score: weighted gap coverage minus limit overflow and calorie drift."""
+
+    def __init__(self, context: Dict[str, object], slot_count: int):
+        remaining = context["remaining"]
+        ratios = context["remaining_ratios"]
+        planned_calories = (
+            float(context["lunch_calories"]) + float(context["dinner_calories"])
+        ) * (slot_count / 2)
+        remaining_calories = float(remaining.get("calories") or 0)
+        share = planned_calories / max(remaining_calories, planned_calories, 1.0)
+        self.needs = [float(remaining.get(key) or 0) * share for key in GAP_NUTRIENTS]
+        self.weights = [
+            max(float(ratios.get(key) or 0), 0.0) if need > 0 else 0.0
+            for key, need in zip(GAP_NUTRIENTS, self.needs)
+        ]
+        self.weight_total = sum(self.weights) or 1.0
+        limits = {item["key"]: item for item in context["limit_guidance"]}
+        self.budgets = []
+        self.scales = []
+        for key in LIMIT_NUTRIENTS:
+            item = limits.get(key, {})
+            budget = float(item.get("remaining_buffer") or 0) * share
+            self.budgets.append(budget)
+            self.scales.append(
+                max(budget, float(item.get("max") or 0) / 14 * slot_count, 1e-6)
+            )
+        self.slot_count = max(slot_count, 1)
+
+    def coverage(self, gap_totals: Sequence[float]) -> float:
+        covered = 0.0
+        for total, need, weight in zip(gap_totals, self.needs, self.weights):
+            if weight:
+                covered += weight * min(total / need, 1.0)
+        return covered / self.weight_total
+
+    def limit_penalty(self, limit_totals: Sequence[float]) -> float:
+        penalty = 0.0
+        for total, budget, scale in zip(limit_totals, self.budgets, self.scales):
+            if total > budget:
+                penalty += (total - budget) / scale
+        return penalty
+
+    def score(
+        self,
+        gap_totals: Sequence[float],
+        limit_totals: Sequence[float],
+        calorie_drift: float,
+        repeats: int,
+    ) -> float:
+        return (
+            self.coverage(gap_totals)
+            - LIMIT_PENALTY_WEIGHT * self.limit_penalty(limit_totals)
+            - CALORIE_PENALTY_WEIGHT * calorie_drift / self.slot_count
+            - REPEAT_PENALTY * repeats
+        )
+
+
+class _BeamState:
+    __slots__ = ("score", "picks", "gap_totals", "limit_totals", "calorie_drift", "uses", "repeats")
+
+    def __init__(self, score, picks, gap_totals, limit_totals, calorie_drift, uses, repeats):
+        self.score = score
+        self.picks = picks
+        self.gap_totals = gap_totals
+        self.limit_totals = limit_totals
+        self.calorie_drift = calorie_drift
+        self.uses = uses
+        self.repeats = repeats
+
+
+def _candidate_pool(
+    index: LibraryIndex,
+    context: Dict[str, object],
+    meal_type: str,
+    calorie_target: float,
+    size: int,
+) -> List[int]:
+    scored = score_library(index, context, calorie_target, meal_type)
+    return [position for _, position in heapq.nlargest(size, scored)]
+
+
+def optimize_week(
+    context: Dict[str, object],
+    days: Sequence[date],
+    index: Optional[LibraryIndex] = None,
+    beam_width: int = DEFAULT_BEAM_WIDTH,
+    candidates_per_slot: int = DEFAULT_CANDIDATES_PER_SLOT,
+    time_budget_ms: float = DEFAULT_TIME_BUDGET_MS,
+    max_repeats: int = DEFAULT_MAX_REPEATS,
+) -> Dict[str, object]:
+    """Beam search over (day, slot) picks.
+
+    Work is bounded by ``len(days) * 2 * beam_width * candidates_per_slot`` state
+    expansions; once ``time_budget_ms`` is spent the remaining slots are filled
+    greedily (beam width 1) so the call always terminates promptly.
+    """
+    started = time.perf_counter()
+    index = index or get_library_index()
+    slots: List[Tuple[date, str]] = [(day, slot) for day in days for slot in SLOT_TYPES]
+    calorie_targets = {
+        "lunch": float(context["lunch_calories"]),
+        "dinner": float(context["dinner_calories"]),
+    }
+    pool_size = candidates_per_slot + len(days)
+    pools = {
+        slot: _candidate_pool(index, context, slot, calorie_targets[slot], pool_size)
+        for slot in SLOT_TYPES
+    }
+    objective = _Objective(context, len(slots))
+    empty_gap = tuple(0.0 for _ in GAP_NUTRIENTS)
+    empty_limit = tuple(0.0 for _ in LIMIT_NUTRIENTS)
+    beam = [_BeamState(0.0, (), empty_gap, empty_limit, 0.0, {}, 0)]
+    truncated = False
+
+    for slot_number, (day, slot) in enumerate(slots):
+        width = beam_width
+        if (time.perf_counter() - started) * 1000 > time_budget_ms:
+            truncated = True
+            width = 1
+        target = calorie_targets[slot]
+        expansions: List[_BeamState] = []
+        for state in beam:
+            same_day = (
+                {state.picks[-1]} if slot_number % 2 == 1 and state.picks else set()
+            )
+            taken = 0
+            for position in pools[slot]:
+                if position in same_day:
+                    continue
+                used = state.uses.get(position, 0)
+                if used >= max_repeats:
+                    continue
+                gap_totals = tuple(
+                    total + value
+                    for total, value in zip(state.gap_totals, index.gap_vectors[position])
+                )
+                limit_totals = tuple(
+                    total + value
+                    for total, value in zip(state.limit_totals, index.limit_vectors[position])
+                )
+                calorie_drift = state.calorie_drift + abs(
+                    index.calories[position] - target
+                ) / max(target, 1.0)
+                repeats = state.repeats + (1 if used else 0)
+                uses = dict(state.uses)
+                uses[position] = used + 1
+                expansions.append(
+                    _BeamState(
+                        objective.score(gap_totals, limit_totals, calorie_drift, repeats),
+                        state.picks + (position,),
+                        gap_totals,
+                        limit_totals,
+                        calorie_drift,
+                        uses,
+                        repeats,
+                    )
+                )
+                taken += 1
+                if taken >= candidates_per_slot:
+                    break
+        if not expansions:
+            # Nothing fits this slot (an empty pool, or every candidate used
+            # up): leave it empty and keep planning the slots after it.
+            for state in beam:
+                state.picks += (None,)
+            continue
+        beam = heapq.nlargest(width, expansions, key=lambda state: state.score)
+
+    best = beam[0]
+    plan_days_out: List[Dict[str, object]] = []
+    for offset, day in enumerate(days):
+        entry: Dict[str, object] = {"date": day.isoformat(), "day": day.strftime("%a")}
+        for slot_offset, slot in enumerate(SLOT_TYPES):
+            pick_index = offset * 2 + slot_offset
+            pick = best.picks[pick_index] if pick_index < len(best.picks) else None
+            entry[slot] = as_suggestion(index.meals[pick]) if pick is not None else None
+        plan_days_out.append(entry)
+
+    coverage = {
+        key: round(min(total / need, 1.0), 3) if need > 0 else 1.0
+        for key, total, need in zip(GAP_NUTRIENTS, best.gap_totals, objective.needs)
+    }
+    limit_usage = {
+        key: {"planned": round(total, 2), "budget": round(budget, 2)}
+        for key, total, budget in zip(LIMIT_NUTRIENTS, best.limit_totals, objective.budgets)
+    }
+    return {
+        "days": plan_days_out,
+        "score": round(best.score, 4),
+        "coverage": coverage,
+        "limits": limit_usage,
+        "stats": {
+            "library_size": len(index),
+            "slots": len(slots),
+            "filled_slots": sum(pick is not None for pick in best.picks),
+            "beam_width": beam_width,
+            "candidates_per_slot": candidates_per_slot,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "truncated": truncated,
+        },
+    }
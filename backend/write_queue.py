@@ -0,0 +1,402 @@
+"""Single writer thread that group-commits small SQLite writes.
+
+Callers hand over one statement each and block on a future. The writer
+drains whatever is queued and, when the previous group had more than one
+write, waits up to ``WRITE_GROUP_DELAY_MS`` for more (up to
+``WRITE_GROUP_MAX`` statements). It then commits the lot in one
+transaction, so a burst of meal logs costs one journal sync instead of one
+each and never contends for the database lock with itself.
+
+Each statement runs under its own savepoint: one that fails is rolled back
+and its caller gets the exception, while the rest of the group still
+commits. If the commit itself fails, every caller in the group gets the
+error and nothing was written.
+
+Each database file is served by one of ``WRITE_QUEUE_THREADS`` writer
+threads, picked by hashing its path, so per-user shards commit in parallel
+while every file still has exactly one writer. A writer keeps its
+connections in an LRU of at most ``WRITE_MAX_CONNECTIONS`` and closes those
+idle for ``WRITE_CONNECTION_IDLE_SECONDS``. A running task's connection is
+neither evicted nor closed until the task returns.
+
+``WRITE_QUEUE_ENABLED=0`` makes ``database.py`` write on its own connection
+per call instead, as it did before.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from .env import env_float
+
+logger = logging.getLogger("write_queue")
+
+Connect = Callable[[], sqlite3.Connection]
+# A task gets the writer's connection and a ``pump(seconds)`` callback that
+# commits queued writes for up to that long.
+Task = Callable[[sqlite3.Connection, Callable[[float], None]], Any]
+
+
+ENABLED = os.getenv("WRITE_QUEUE_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+@dataclass
+class WriteResult:
+    lastrowid: Optional[int]
+    rowcount: int
+
+
+@dataclass
+class _Write:
+    target: Any
+    connect: Connect
+    sql: str
+    params: Sequence[Any]
+    future: "Future[WriteResult]" = field(default_factory=Future)
+    queued: float = field(default_factory=time.perf_counter)
+
+
+@dataclass
+class _Task:
+    target: Any
+    connect: Connect
+    fn: Task
+    future: "Future[Any]" = field(default_factory=Future)
+
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Owns one connection per database file and commits queued writes in groups."""
+
+    def __init__(
+        self,
+        max_group: int,
+        delay_seconds: float,
+        max_connections: int = 64,
+        idle_seconds: float = 300.0,
+        name: str = "sqlite-writer",
+    ):
+        self._max_group = max(max_group, 1)
+        self._delay = max(delay_seconds, 0.0)
+        self._max_connections = max(max_connections, 1)
+        self._idle = idle_seconds
+        self._name = name
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        # Least recently used first; values are (connection, last used).
+        self._connections: "OrderedDict[Any, Tuple[sqlite3.Connection, float]]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._last_group = 0
+        # Items taken off the queue out of turn, served before the queue.
+        self._held: Deque[Any] = deque()
+        # The running task's target: its connection stays open until the task
+        # returns, even if it is the LRU entry or a write through it fails.
+        self._pinned: Any = None
+        self._broken = False
+        self._stats = {
+            "writes": 0,
+            "failed_writes": 0,
+            "groups": 0,
+            "largest_group": 0,
+            "commit_seconds": 0.0,
+            "queue_wait_seconds": 0.0,
+            "evictions": 0,
+        }
+
+    def submit(self, target: Any, connect: Connect, sql: str, params: Sequence[Any]) -> "Future[WriteResult]":
+        self._ensure_thread()
+        write = _Write(target, connect, sql, params)
+        self._queue.put(write)
+        return write.future
+
+    def submit_task(self, target: Any, connect: Connect, fn: Task) -> "Future[Any]":
+        self._ensure_thread()
+        task = _Task(target, connect, fn)
+        self._queue.put(task)
+        return task.future
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _collect(self, first: _Write, linger: bool) -> List[_Write]:
+        group = [first]
+        # Lingering only pays off under concurrent load; a lone write goes now.
+        delay = self._delay if linger and self._last_group > 1 else 0.0
+        deadline = time.perf_counter() + delay
+        while len(group) < self._max_group:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if not isinstance(item, _Write):
+                self._held.append(item)
+                break
+            group.append(item)
+        self._last_group = len(group)
+        return group
+
+    def _commit_group(self, group: List[_Write]) -> None:
+        # One transaction per database file; each file's writes keep their order.
+        by_target: Dict[Any, List[_Write]] = {}
+        for write in group:
+            by_target.setdefault(write.target, []).append(write)
+        for writes in by_target.values():
+            self._commit(writes)
+
+    def _next(self) -> Any:
+        if self._held:
+            return self._held.popleft()
+        while True:
+            if not self._connections or self._idle <= 0:
+                return self._queue.get()
+            try:
+                return self._queue.get(timeout=self._idle)
+            except queue.Empty:
+                self._close_idle()
+
+    def _run(self) -> None:
+        while True:
+            item = self._next()
+            if item is _STOP:
+                break
+            if isinstance(item, _Task):
+                self._run_task(item)
+                continue
+            self._commit_group(self._collect(item, linger=True))
+        for connection, _ in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+    def _close_idle(self) -> None:
+        cutoff = time.monotonic() - self._idle
+        for target, (connection, used) in list(self._connections.items()):
+            if used > cutoff:
+                break
+            if target == self._pinned:
+                continue
+            del self._connections[target]
+            connection.close()
+            self._stats["evictions"] += 1
+
+    def _run_task(self, task: _Task) -> None:
+        self._pinned, self._broken = task.target, False
+        try:
+            result = task.fn(self._connection(task), self._pump)
+        except BaseException as exc:
+            self._unpin(task.target)
+            task.future.set_exception(exc)
+        else:
+            self._unpin(task.target)
+            task.future.set_result(result)
+
+    def _unpin(self, target: Any) -> None:
+        self._pinned = None
+        entry = self._connections.pop(target, None)
+        if entry is not None and self._broken:
+            entry[0].close()
+        elif entry is not None:
+            self._connections[target] = (entry[0], time.monotonic())
+        self._evict(self._max_connections)
+
+    def _pump(self, seconds: float) -> None:
+        """Commit queued writes for ``seconds`` while a task is paused."""
+        deadline = time.perf_counter() + seconds
+        while not self._held:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if not isinstance(item, _Write):
+                # Another task, or stop, waits for the running task to finish.
+                self._held.append(item)
+                return
+            self._commit_group(self._collect(item, linger=False))
+            if remaining <= 0:
+                return
+
+    def _connection(self, item: Any) -> sqlite3.Connection:
+        entry = self._connections.pop(item.target, None)
+        if entry is None:
+            self._evict(self._max_connections - 1)
+            conn = item.connect()
+            conn.isolation_level = None
+        else:
+            conn = entry[0]
+        self._connections[item.target] = (conn, time.monotonic())
+        return conn
+
+    def _evict(self, keep: int) -> None:
+        """Close least recently used connections until at most ``keep`` are open.
+
+        The running task's connection is never closed, so while a task runs
+        the writer may hold one connection over the limit.
+        """
+        while len(self._connections) > keep:
+            victim = next((target for target in self._connections if target != self._pinned), None)
+            if victim is None:
+                return
+            oldest, _ = self._connections.pop(victim)
+            oldest.close()
+            self._stats["evictions"] += 1
+
+    def _commit(self, group: List[_Write]) -> None:
+        started = time.perf_counter()
+        done: List[Tuple[_Write, WriteResult]] = []
+        try:
+            conn = self._connection(group[0])
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as exc:
+            self._fail(group, exc)
+            return
+        for write in group:
+            try:
+                conn.execute("SAVEPOINT queued_write")
+                cursor = conn.execute(write.sql, write.params)
+                conn.execute("RELEASE queued_write")
+            except sqlite3.Error as exc:
+                conn.execute("ROLLBACK TO queued_write")
+                conn.execute("RELEASE queued_write")
+                self._stats["failed_writes"] += 1
+                write.future.set_exception(exc)
+                continue
+            done.append((write, WriteResult(cursor.lastrowid, cursor.rowcount)))
+        try:
+            conn.execute("COMMIT")
+        except sqlite3.Error as exc:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._fail([write for write, _ in done], exc)
+            return
+        finished = time.perf_counter()
+        self._stats["groups"] += 1
+        self._stats["writes"] += len(done)
+        self._stats["largest_group"] = max(self._stats["largest_group"], len(group))
+        self._stats["commit_seconds"] += finished - started
+        for write, result in done:
+            self._stats["queue_wait_seconds"] += started - write.queued
+            write.future.set_result(result)
+
+    def _fail(self, writes: List[_Write], exc: Exception) -> None:
+        logger.warning("Group commit of %s writes failed: %s", len(writes), exc)
+        self._stats["failed_writes"] += len(writes)
+        for write in writes:
+            write.future.set_exception(exc)
+        # A broken connection is reopened for the next group, or once the task
+        # using it returns.
+        if not writes:
+            return
+        if writes[0].target == self._pinned:
+            self._broken = True
+            return
+        entry = self._connections.pop(writes[0].target, None)
+        if entry is not None:
+            entry[0].close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        groups = stats["groups"] or 1
+        writes = stats["writes"] or 1
+        return {
+            "enabled": ENABLED,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "queued": self._queue.qsize() + len(self._held),
+            "connections": len(self._connections),
+            "evictions": stats["evictions"],
+            "max_group": self._max_group,
+            "delay_ms": self._delay * 1000,
+            "writes": stats["writes"],
+            "failed_writes": stats["failed_writes"],
+            "groups": stats["groups"],
+            "largest_group": stats["largest_group"],
+            "avg_group": round(stats["writes"] / groups, 2),
+            "avg_commit_ms": round(stats["commit_seconds"] / groups * 1000, 3),
+            "avg_queue_wait_ms": round(stats["queue_wait_seconds"] / writes * 1000, 3),
+        }
+
+
+_writers = [
+    GroupCommitWriter(
+        max_group=int(env_float("WRITE_GROUP_MAX", 64)),
+        delay_seconds=env_float("WRITE_GROUP_DELAY_MS", 2.0) / 1000,
+        max_connections=int(env_float("WRITE_MAX_CONNECTIONS", 64)),
+        idle_seconds=env_float("WRITE_CONNECTION_IDLE_SECONDS", 300.0),
+        name=f"sqlite-writer-{number}",
+    )
+    for number in range(max(int(env_float("WRITE_QUEUE_THREADS", 4)), 1))
+]
+
+
+def _writer_for(target: Any) -> GroupCommitWriter:
+    # ``hash`` of a str/Path is salted per process, which is fine: the
+    # mapping only has to be stable while the process runs.
+    return _writers[hash(target) % len(_writers)]
+
+
+def execute(target: Any, connect: Connect, sql: str, params: Sequence[Any] = ()) -> WriteResult:
+    """Queue one statement for ``target``'s database and wait for its commit."""
+    return _writer_for(target).submit(target, connect, sql, params).result()
+
+
+def run(target: Any, connect: Connect, fn: Task) -> Any:
+    """Run ``fn`` on the writer thread with ``target``'s connection and wait for it.
+
+    Writes queue up while ``fn`` runs unless it calls ``pump``. Work that
+    has to see the database from the writer's own connection, like an
+    online backup, goes through here.
+    """
+    return _writer_for(target).submit_task(target, connect, fn).result()
+
+
+def stop() -> None:
+    for writer in _writers:
+        writer.stop()
+
+
+def stats() -> Dict[str, Any]:
+    snapshots = [writer.snapshot() for writer in _writers]
+    totals = {
+        key: sum(snapshot[key] for snapshot in snapshots)
+        for key in ("queued", "connections", "evictions", "writes", "failed_writes", "groups")
+    }
+    return {
+        **totals,
+        "enabled": ENABLED,
+        "threads": len(_writers),
+        "largest_group": max(snapshot["largest_group"] for snapshot in snapshots),
+        "avg_group": round(totals["writes"] / (totals["groups"] or 1), 2),
+        "avg_commit_ms": round(
+            sum(snapshot["avg_commit_ms"] * snapshot["groups"] for snapshot in snapshots) / (totals["groups"] or 1), 3
+        ),
+        "writers": snapshots,
+    }